@@ -1,6 +1,9 @@
 from allauth.account.adapter import DefaultAccountAdapter
+from django import forms
 from django.conf import settings
 
+from .hashing import HashingBusy
+
 
 class CustomAccountAdapter(DefaultAccountAdapter):
     """Custom account adapter to handle role assignment during signup"""
@@ -25,3 +28,14 @@ class CustomAccountAdapter(DefaultAccountAdapter):
             user.save()
         
         return user
+
+    def authenticate(self, request, **credentials):
+        """Turn a full password-hashing queue into a login form error"""
+        try:
+            return super().authenticate(request, **credentials)
+        except HashingBusy as busy:
+            # HashingBusyMiddleware answers 429 with Retry-After
+            request.hashing_retry_after = busy.retry_after
+            raise forms.ValidationError(
+                f'Too many people are signing in right now. Please try again in {busy.retry_after} seconds.'
+            )
@@ -1,9 +1,30 @@
+from django.conf import settings
 from django.contrib.auth.backends import ModelBackend
 from django.contrib.auth import get_user_model
-from django.db.models import Q
+from django.core.cache import cache
+from django.db.models import Q, Value
+from django.db.models.functions import Lower
+
+from .hashing import check_user_password, run_dummy_hash
 
 User = get_user_model()
 
+# Resolving request.user hits the cache instead of the database. Saves and
+# deletes invalidate the entry (see accounts/signals.py); the TTL bounds how
+# long a queryset .update() that skips those signals can go unnoticed. That
+# only holds for a cache shared by every process; set the timeout to 0 otherwise.
+USER_CACHE_TIMEOUT = getattr(settings, 'ACCOUNTS_USER_CACHE_TIMEOUT', 60)
+
+
+def user_cache_key(user_id):
+    return f'accounts:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    if USER_CACHE_TIMEOUT:
+        cache.delete(user_cache_key(user_id))
+
+
 class EmailOrUsernameModelBackend(ModelBackend):
     """
     Custom authentication backend that allows users to login with either
@@ -16,21 +37,31 @@ class EmailOrUsernameModelBackend(ModelBackend):
         if username is None or password is None:
             return
         try:
-            # Try to find user by username or email
-            user = User.objects.get(
-                Q(username__iexact=username) | Q(email__iexact=username)
-            )
+            # Try to find user by username or email, case-insensitively.
+            # Matching on lower() uses the functional indexes on both columns.
+            login = Lower(Value(username))
+            user = User.objects.alias(
+                username_lower=Lower('username'), email_lower=Lower('email')
+            ).get(Q(username_lower=login) | Q(email_lower=login))
         except User.DoesNotExist:
             # Run the default password hasher once to reduce the timing
             # difference between an existing and a non-existing user
-            User().set_password(password)
+            run_dummy_hash(password)
         else:
-            if user.check_password(password) and self.user_can_authenticate(user):
+            # Hashes run in the bounded pool (accounts/hashing.py), which may
+            # refuse with HashingBusy when a login storm fills its queue.
+            if check_user_password(user, password) and self.user_can_authenticate(user):
                 return user
 
     def get_user(self, user_id):
-        try:
-            user = User.objects.get(pk=user_id)
-        except User.DoesNotExist:
-            return None
+        if not USER_CACHE_TIMEOUT:
+            return super().get_user(user_id)
+        key = user_cache_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            try:
+                user = User.objects.get(pk=user_id)
+            except User.DoesNotExist:
+                return None
+            cache.set(key, user, USER_CACHE_TIMEOUT)
         return user if self.user_can_authenticate(user) else None
@@ -0,0 +1,184 @@
+"""
+Bounded password hashing for logins.
+
+Checking a password is a deliberately slow hash (PBKDF2 by default). When an
+exam opens and thousands of examinees log in at once, hashing inline lets
+logins occupy every worker. Instead, each web process sends its login hashes
+to a small process pool, and at most ``HASH_QUEUE_LIMIT`` logins on the host
+are admitted at a time (running or waiting). A login beyond that is refused
+straight away with ``HashingBusy``, which
+``accounts.middleware.HashingBusyMiddleware`` turns into a 429 with
+``Retry-After``. The examinee retries a few seconds later instead of the
+request timing out.
+
+The limit is shared by all web processes through lock files (``HashSlots``),
+so it holds under sync workers too, where every login occupies a whole
+worker: there, a limit below the number of workers keeps some of them free
+for examinees already in an exam.
+"""
+import math
+import multiprocessing
+import os
+import random
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from django.conf import settings
+from django.contrib.auth.hashers import check_password, make_password
+
+from config.metrics import observe_histogram, store
+
+HASH_WORKERS = getattr(settings, 'ACCOUNTS_HASH_WORKERS', 2)
+HASH_QUEUE_LIMIT = getattr(settings, 'ACCOUNTS_HASH_QUEUE_LIMIT', HASH_WORKERS * 8)
+# Give up on a hash that waited this long; keep it below the gunicorn timeout.
+HASH_TIMEOUT = getattr(settings, 'ACCOUNTS_HASH_TIMEOUT', 20)
+HASH_LOCK_DIR = getattr(settings, 'ACCOUNTS_HASH_LOCK_DIR', tempfile.gettempdir())
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows development machines
+    fcntl = None
+
+
+class HashingBusy(Exception):
+    """The hashing queue is full; the login should be retried after ``retry_after`` seconds."""
+
+    def __init__(self, retry_after):
+        super().__init__(f'Password hashing queue is full; retry after {retry_after}s')
+        self.retry_after = retry_after
+
+
+def _init_worker():
+    import django
+    django.setup()
+
+
+def _verify(raw_password, encoded, submitted_at):
+    """Runs in a pool process. Returns ``(valid, new_encoded, queue_seconds, hash_seconds)``."""
+    started_at = time.time()
+    new_encoded = None
+
+    def setter(raw_password):
+        nonlocal new_encoded
+        new_encoded = make_password(raw_password)
+
+    # check_password calls setter when the hasher or its parameters changed.
+    valid = check_password(raw_password, encoded, setter)
+    return valid, new_encoded, started_at - submitted_at, time.time() - started_at
+
+
+def _make_password(raw_password, submitted_at):
+    started_at = time.time()
+    make_password(raw_password)
+    return False, None, started_at - submitted_at, time.time() - started_at
+
+
+class HashSlots:
+    """
+    ``limit`` admission slots shared by every process on the host: slot ``n``
+    is held with an exclusive ``flock`` on its own lock file. The kernel drops
+    the lock when its process dies, so a killed worker never leaks a slot.
+    Without ``fcntl`` the slots are per process.
+    """
+
+    def __init__(self, directory, limit):
+        self.paths = [os.path.join(directory, f'mcq-exam-login-hash-{number}.lock') for number in range(limit)]
+        self.local = threading.BoundedSemaphore(limit)
+
+    def acquire(self):
+        """Take a free slot and return its handle, or None when all are taken."""
+        if fcntl is None:
+            return True if self.local.acquire(blocking=False) else None
+        # Start anywhere so concurrent logins do not all probe the same files first
+        start = random.randrange(len(self.paths))
+        for path in self.paths[start:] + self.paths[:start]:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+            else:
+                return fd
+        return None
+
+    def release(self, handle):
+        if fcntl is None:
+            self.local.release()
+        else:
+            os.close(handle)
+
+
+class HashingPool:
+    """A process pool that admits at most ``queue_limit`` hashes at a time across the host."""
+
+    def __init__(self, workers, queue_limit, timeout, lock_dir=HASH_LOCK_DIR):
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+        self.slots = HashSlots(lock_dir, queue_limit)
+        self.lock = threading.Lock()
+        self.executor = None
+        self.pid = None
+        # Moving average of one hash, for Retry-After
+        self.hash_seconds = 0.5
+
+    def _executor(self):
+        with self.lock:
+            # A pool inherited through fork (gunicorn preload_app) belongs to the parent.
+            if self.executor is None or self.pid != os.getpid():
+                self.executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                )
+                self.pid = os.getpid()
+            return self.executor
+
+    def retry_after(self):
+        return max(1, math.ceil(self.queue_limit / self.workers * self.hash_seconds))
+
+    def run(self, func, raw_password, *args):
+        slot = self.slots.acquire()
+        if slot is None:
+            store.inc('password_hash_rejected_total', {})
+            raise HashingBusy(self.retry_after())
+        try:
+            future = self._executor().submit(func, raw_password, *args, time.time())
+            try:
+                result = future.result(timeout=self.timeout)
+            except TimeoutError:
+                future.cancel()
+                store.inc('password_hash_rejected_total', {})
+                raise HashingBusy(self.retry_after())
+        finally:
+            self.slots.release(slot)
+
+        queue_seconds, hash_seconds = result[2], result[3]
+        self.hash_seconds = 0.8 * self.hash_seconds + 0.2 * hash_seconds
+        observe_histogram('password_hash_queue_seconds', {}, max(queue_seconds, 0))
+        observe_histogram('password_hash_seconds', {}, hash_seconds)
+        return result
+
+
+pool = HashingPool(HASH_WORKERS, HASH_QUEUE_LIMIT, HASH_TIMEOUT)
+
+
+def check_user_password(user, raw_password):
+    """
+    ``user.check_password`` through the bounded pool.
+
+    When the hasher or its parameters changed since the password was stored,
+    the new hash (computed in the pool) is saved. Raises ``HashingBusy``.
+    """
+    valid, new_encoded, _, _ = pool.run(_verify, raw_password, user.password)
+    if valid and new_encoded:
+        user.password = new_encoded
+        user.save(update_fields=['password'])
+    return valid
+
+
+def run_dummy_hash(raw_password):
+    """Hash once for an unknown user, so its timing matches an existing one. Raises ``HashingBusy``."""
+    pool.run(_make_password, raw_password)
@@ -0,0 +1,29 @@
+from django.http import HttpResponse
+from django.utils.deprecation import MiddlewareMixin
+
+from .hashing import HashingBusy
+
+
+class HashingBusyMiddleware(MiddlewareMixin):
+    """
+    Answer logins refused by the full password-hashing queue with 429 and
+    ``Retry-After``: the login form with its error (see the account adapter),
+    or a plain 429 for any other caller of ``authenticate``.
+    """
+
+    def process_response(self, request, response):
+        retry_after = getattr(request, 'hashing_retry_after', None)
+        if retry_after is not None:
+            response.status_code = 429
+            response['Retry-After'] = str(retry_after)
+        return response
+
+    def process_exception(self, request, exception):
+        if not isinstance(exception, HashingBusy):
+            return None
+        response = HttpResponse(
+            'Too many people are signing in right now. Please try again shortly.',
+            content_type='text/plain', status=429,
+        )
+        response['Retry-After'] = str(exception.retry_after)
+        return response
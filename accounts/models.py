@@ -1,5 +1,6 @@
 ﻿from django.contrib.auth.models import AbstractUser
 from django.db import models
+from django.db.models.functions import Lower
 
 
 class User(AbstractUser):
@@ -24,6 +25,13 @@ class User(AbstractUser):
         },
     )
 
+    class Meta(AbstractUser.Meta):
+        indexes = [
+            # Case-insensitive login by username or email (accounts/backends.py)
+            models.Index(Lower("username"), name="user_username_lower_idx"),
+            models.Index(Lower("email"), name="user_email_lower_idx"),
+        ]
+
     def is_admin(self):
         return self.role == self.Role.ADMIN or self.is_superuser
 
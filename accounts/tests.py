@@ -1,3 +1,47 @@
+import tempfile
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
 from django.test import TestCase
+from django.urls import reverse
+
+from .backends import EmailOrUsernameModelBackend
+from .hashing import HashingBusy, HashingPool, _make_password
+
+User = get_user_model()
+
+
+class LoginHashingTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('alice', 'alice@example.com', 's3cret-pass', role=User.Role.EXAMINEE)
+
+    def test_full_queue_answers_429(self):
+        with mock.patch('accounts.backends.check_user_password', side_effect=HashingBusy(7)):
+            response = self.client.post(reverse('account_login'), {'login': 'alice', 'password': 's3cret-pass'})
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertContains(response, 'Please try again in 7 seconds', status_code=429)
+
+    def test_full_queue_refuses_at_once(self):
+        with tempfile.TemporaryDirectory() as lock_dir:
+            pool = HashingPool(workers=1, queue_limit=1, timeout=5, lock_dir=lock_dir)
+            # Another process holding the only slot looks the same: its lock file is taken
+            slot = HashingPool(workers=1, queue_limit=1, timeout=5, lock_dir=lock_dir).slots.acquire()
+            with self.assertRaises(HashingBusy) as busy:
+                pool.run(_make_password, 'pw')
+            self.assertGreaterEqual(busy.exception.retry_after, 1)
+            pool.slots.release(slot)
+            self.assertIsNotNone(pool.slots.acquire())
+
+    def test_wrong_password_is_not_an_error(self):
+        self.assertIsNone(EmailOrUsernameModelBackend().authenticate(None, username='alice', password='wrong'))
 
-# Create your tests here.
+    def test_outdated_hash_is_upgraded_on_login(self):
+        User.objects.filter(pk=self.user.pk).update(password=make_password('s3cret-pass', hasher='pbkdf2_sha1'))
+        user = EmailOrUsernameModelBackend().authenticate(None, username='ALICE', password='s3cret-pass')
+        self.assertEqual(user.pk, self.user.pk)
+        user.refresh_from_db()
+        self.assertTrue(user.password.startswith('pbkdf2_sha256$'))
+        self.assertTrue(user.check_password('s3cret-pass'))
@@ -0,0 +1,258 @@
+"""
+Per-view request metrics in Prometheus text format.
+
+``MetricsMiddleware`` times every request, counts its SQL queries and their
+total duration through ``connection.execute_wrapper`` and adds a
+``Server-Timing`` header. Samples are buffered in process and merged every
+``METRICS_FLUSH_INTERVAL`` seconds into a small SQLite file shared by all
+gunicorn workers on the host, so ``/metrics`` reports totals across workers
+(at most one flush interval behind) rather than whichever worker answered.
+"""
+import atexit
+import hmac
+import json
+import logging
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import PermissionDenied
+from django.db import connection
+from django.http import HttpResponse
+
+logger = logging.getLogger(__name__)
+
+METRICS_DB_PATH = getattr(
+    settings, 'METRICS_DB_PATH', os.path.join(tempfile.gettempdir(), 'mcq-exam-metrics.sqlite3')
+)
+METRICS_FLUSH_INTERVAL = getattr(settings, 'METRICS_FLUSH_INTERVAL', 5)
+METRICS_ALLOWED_IPS = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1', '::1'])
+METRICS_TOKEN = getattr(settings, 'METRICS_TOKEN', '')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+METRICS = {
+    'http_requests_total': ('counter', 'Requests handled, by view, method and status class.'),
+    'http_request_duration_seconds': ('histogram', 'Request latency by view.'),
+    'http_request_db_queries_total': ('counter', 'SQL queries executed, by view.'),
+    'http_request_db_duration_seconds_total': ('counter', 'Time spent in SQL queries, by view.'),
+    'password_hash_queue_seconds': ('histogram', 'Time login password checks waited for a hashing process.'),
+    'password_hash_seconds': ('histogram', 'Time spent hashing login passwords.'),
+    'password_hash_rejected_total': ('counter', 'Logins turned away because the hashing queue was full.'),
+}
+
+
+class MetricsStore:
+    """Counters buffered per process and merged into a SQLite file shared by all workers."""
+
+    def __init__(self, path, flush_interval):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.last_flush = time.monotonic()
+        self.local = threading.local()
+
+    def _connect(self):
+        db = getattr(self.local, 'db', None)
+        if db is None:
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode=WAL')
+            db.execute(
+                'CREATE TABLE IF NOT EXISTS metrics '
+                '(name TEXT NOT NULL, labels TEXT NOT NULL, value REAL NOT NULL, PRIMARY KEY (name, labels))'
+            )
+            self.local.db = db
+        return db
+
+    def inc(self, name, labels, amount=1):
+        key = (name, json.dumps(sorted(labels.items())))
+        with self.lock:
+            self.pending[key] = self.pending.get(key, 0) + amount
+
+    def flush_due(self):
+        return time.monotonic() - self.last_flush >= self.flush_interval
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+            self.last_flush = time.monotonic()
+        if not pending:
+            return
+        try:
+            db = self._connect()
+            with db:
+                db.execute('BEGIN IMMEDIATE')
+                db.executemany(
+                    'INSERT INTO metrics (name, labels, value) VALUES (?, ?, ?) '
+                    'ON CONFLICT (name, labels) DO UPDATE SET value = value + excluded.value',
+                    [(name, labels, value) for (name, labels), value in pending.items()],
+                )
+        except sqlite3.Error:
+            logger.exception("Metrics flush failed; keeping samples for the next one")
+            with self.lock:
+                for key, value in pending.items():
+                    self.pending[key] = self.pending.get(key, 0) + value
+
+    def read(self):
+        """Return ``{(name, labels_json): value}`` aggregated across all workers."""
+        self.flush()
+        rows = self._connect().execute('SELECT name, labels, value FROM metrics ORDER BY name, labels')
+        return {(name, labels): value for name, labels, value in rows}
+
+
+store = MetricsStore(METRICS_DB_PATH, METRICS_FLUSH_INTERVAL)
+atexit.register(store.flush)
+
+
+def observe(view, method, status, duration, queries, db_duration):
+    """Record one request. Does not flush; see ``MetricsStore.flush_due``."""
+    status_class = f'{status // 100}xx'
+    store.inc('http_requests_total', {'view': view, 'method': method, 'status': status_class})
+    observe_histogram('http_request_duration_seconds', {'view': view}, duration)
+    store.inc('http_request_db_queries_total', {'view': view}, queries)
+    store.inc('http_request_db_duration_seconds_total', {'view': view}, db_duration)
+
+
+def observe_histogram(name, labels, value):
+    """Record one sample of a histogram family declared in ``METRICS``."""
+    bucket = next((str(bound) for bound in LATENCY_BUCKETS if value <= bound), '+Inf')
+    store.inc(f'{name}_bucket', {**labels, 'le': bucket})
+    store.inc(f'{name}_sum', labels, value)
+    store.inc(f'{name}_count', labels)
+
+
+class QueryTimer:
+    """``execute_wrapper`` hook counting queries and their total duration."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class MetricsMiddleware:
+    """Record per-view request metrics and add a ``Server-Timing`` header."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        timer = QueryTimer()
+        started = time.perf_counter()
+        with connection.execute_wrapper(timer):
+            response = self.get_response(request)
+        self.finish(request, response, timer, time.perf_counter() - started)
+        if store.flush_due():
+            store.flush()
+        return response
+
+    async def __acall__(self, request):
+        timer = QueryTimer()
+        started = time.perf_counter()
+        # Connections belong to the thread running the ORM calls, not to the event loop.
+        await sync_to_async(_add_execute_wrapper)(timer)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(_remove_execute_wrapper)(timer)
+        self.finish(request, response, timer, time.perf_counter() - started)
+        if store.flush_due():
+            await sync_to_async(store.flush, thread_sensitive=False)()
+        return response
+
+    def finish(self, request, response, timer, duration):
+        match = getattr(request, 'resolver_match', None)
+        # Unresolved paths share one label to keep the series count bounded.
+        view = (match.view_name if match else None) or '<unresolved>'
+        observe(view, request.method, response.status_code, duration, timer.count, timer.duration)
+        response['Server-Timing'] = (
+            f'db;dur={timer.duration * 1000:.1f};desc="{timer.count} queries", '
+            f'total;dur={duration * 1000:.1f}'
+        )
+
+
+def _add_execute_wrapper(wrapper):
+    connection.execute_wrappers.append(wrapper)
+
+
+def _remove_execute_wrapper(wrapper):
+    connection.execute_wrappers.remove(wrapper)
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    pairs = []
+    for key, value in labels:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{key}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+def _format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def render_metrics(samples):
+    """Render aggregated samples in the Prometheus text exposition format."""
+    series = {}
+    for (name, labels), value in samples.items():
+        series.setdefault(name, []).append((json.loads(labels), value))
+
+    lines = []
+    for family, (kind, help_text) in METRICS.items():
+        lines.append(f'# HELP {family} {help_text}')
+        lines.append(f'# TYPE {family} {kind}')
+        if kind != 'histogram':
+            for labels, value in series.get(family, []):
+                lines.append(f'{family}{_format_labels(labels)} {_format_value(value)}')
+            continue
+
+        # Buckets are stored per interval; the exposition format wants them cumulative.
+        buckets = {}
+        for labels, value in series.get(f'{family}_bucket', []):
+            labels = dict(labels)
+            bound = labels.pop('le')
+            buckets.setdefault(tuple(sorted(labels.items())), {})[bound] = value
+        sums = {tuple(map(tuple, labels)): value for labels, value in series.get(f'{family}_sum', [])}
+        counts = {tuple(map(tuple, labels)): value for labels, value in series.get(f'{family}_count', [])}
+        for labels in sorted(buckets):
+            cumulative = 0
+            for bound in [str(bound) for bound in LATENCY_BUCKETS] + ['+Inf']:
+                cumulative += buckets[labels].get(bound, 0)
+                lines.append(f'{family}_bucket{_format_labels(labels + (("le", bound),))} {_format_value(cumulative)}')
+            lines.append(f'{family}_sum{_format_labels(labels)} {_format_value(sums.get(labels, 0))}')
+            lines.append(f'{family}_count{_format_labels(labels)} {_format_value(counts.get(labels, 0))}')
+    return '\n'.join(lines) + '\n'
+
+
+def metrics_view(request):
+    """Prometheus scrape endpoint: admins, allowed IPs or the bearer token only."""
+    token = request.headers.get('Authorization', '')
+    allowed = (
+        request.META.get('REMOTE_ADDR') in METRICS_ALLOWED_IPS
+        or (METRICS_TOKEN and hmac.compare_digest(token, f'Bearer {METRICS_TOKEN}'))
+        or (request.user.is_authenticated and request.user.is_admin())
+    )
+    if not allowed:
+        raise PermissionDenied("You don't have permission to view metrics.")
+    return HttpResponse(render_metrics(store.read()), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,124 @@
+"""
+Cache-first sessions that write to the database only when they must.
+
+``SESSION_ENGINE = 'config.sessions'``. The whole session lives in the cache
+(Redis in production) and requests read it from there. The database row
+holds only the keys that must survive losing the cache entry: who is logged
+in and the session expiry (``DURABLE_KEYS``). It is written when one of
+those changes, which means at login and logout, and when the session's expiry
+has moved more than ``SESSION_DURABLE_REFRESH`` seconds (an hour by default)
+past the row's ``expire_date``, so a session read back from the database after
+its cache entry is evicted ends at most that much early. Everything else, such
+as ``pending_exam`` or allauth's flow state, is cache-only. A save that
+changes nothing is skipped entirely.
+
+Compared with ``cached_db``, which writes the database on every save, an
+examinee's session costs one INSERT at login and then at most one UPDATE
+per refresh interval while the cache holds it.
+
+All workers must share the cache; with a per-process cache (LocMem) keys
+outside ``DURABLE_KEYS`` would only be visible to the worker that set them.
+"""
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY
+from django.contrib.sessions.backends.base import CreateError
+from django.contrib.sessions.backends.cached_db import SessionStore as CachedDBStore
+from django.db import IntegrityError, router, transaction
+
+KEY_PREFIX = 'config.sessions'
+DURABLE_REFRESH = getattr(settings, 'SESSION_DURABLE_REFRESH', 60 * 60)
+# Cache-only: when the database row expires, as a timestamp
+DURABLE_EXPIRY_KEY = '_session_durable_expiry'
+
+DURABLE_KEYS = frozenset(getattr(settings, 'SESSION_DURABLE_KEYS', ())) | {
+    SESSION_KEY, BACKEND_SESSION_KEY, HASH_SESSION_KEY, '_session_expiry',
+}
+
+
+class SessionStore(CachedDBStore):
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        super().__init__(session_key)
+        # Serialized (whole session, durable part) as last loaded or saved
+        self._saved_state = (None, None)
+
+    def _state(self, data):
+        dumps = self.serializer().dumps
+        durable = {key: value for key, value in data.items() if key in DURABLE_KEYS}
+        return dumps(data), dumps(durable) if durable else None
+
+    def load(self):
+        # Cache first; on a miss the durable part is read from the database.
+        data = super().load()
+        self._saved_state = self._state(data)
+        return data
+
+    def exists(self, session_key):
+        # Only asked for fresh random keys; a clash still fails cache.add()
+        # or the INSERT in save(), so the database is not consulted here.
+        return (self.cache_key_prefix + session_key) in self._cache
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        state = self._state(data)
+        if not must_create and state == self._saved_state:
+            return
+
+        durable = state[1]
+        expiry = self.get_expiry_date().timestamp()
+        if durable is not None and (
+            must_create or durable != self._saved_state[1]
+            or data.get(DURABLE_EXPIRY_KEY, 0) < expiry - DURABLE_REFRESH
+        ):
+            # No durable keys so far means no row yet: INSERT rather than UPDATE first.
+            self._save_durable(data, must_create, insert=must_create or self._saved_state[1] is None)
+            data[DURABLE_EXPIRY_KEY] = expiry
+            state = self._state(data)
+        elif durable is None and self._saved_state[1] is not None:
+            self._delete_durable(self.session_key)
+
+        if must_create and durable is None:
+            if not self._cache.add(self.cache_key, data, self.get_expiry_age()):
+                raise CreateError
+        else:
+            self._cache.set(self.cache_key, data, self.get_expiry_age())
+        self._saved_state = state
+
+    def _save_durable(self, data, must_create, insert):
+        obj = self.create_model_instance({key: value for key, value in data.items() if key in DURABLE_KEYS})
+        using = router.db_for_write(self.model, instance=obj)
+        try:
+            with transaction.atomic(using=using):
+                obj.save(force_insert=insert, using=using)
+        except IntegrityError:
+            if must_create:
+                raise CreateError
+            if not insert:
+                raise
+            obj.save(force_update=True, using=using)
+
+    def _delete_durable(self, session_key):
+        self.model.objects.filter(session_key=session_key).delete()
+
+    def cycle_key(self):
+        data = self._session
+        key = self.session_key
+        in_db = self._saved_state[1] is not None
+        self.create()
+        self._session_cache = data
+        if key:
+            # A session that never held durable keys has no row to delete.
+            self._cache.delete(self.cache_key_prefix + key)
+            if in_db:
+                self._delete_durable(key)
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        self._cache.delete(self.cache_key_prefix + session_key)
+        self._delete_durable(session_key)
@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -46,12 +47,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',  # First, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'accounts.middleware.HashingBusyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -88,6 +91,50 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+# Holds exam papers, answer keys and the autosave answer buffer. Local memory
+# is per process, which is fine for runserver; production uses Redis so every
+# worker sees the same buffer.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'OPTIONS': {
+            'MAX_ENTRIES': 100000,
+        },
+    }
+}
+
+# Sessions are read from the cache; the database only keeps who is logged in
+# and is written at login and logout, and at most hourly to move the expiry
+# forward (SESSION_DURABLE_REFRESH, config/sessions.py).
+SESSION_ENGINE = 'config.sessions'
+
+# The test runner starts no background threads; tests flush and sweep explicitly
+TESTING = sys.argv[1:2] == ['test']
+
+# Autosaved answers are flushed from the cache to the database in the background
+EXAM_ANSWER_BUFFER_FLUSH_INTERVAL = 5  # seconds
+EXAM_ANSWER_BUFFER_FLUSH_IN_PROCESS = not TESTING
+
+# Sessions whose time ran out are auto-submitted by a background sweeper
+EXAM_SWEEP_INTERVAL = 60  # seconds
+EXAM_SWEEP_IN_PROCESS = not TESTING
+
+# Minutes before start_time that scheduled exams are pre-warmed (`manage.py prewarm_exams`)
+EXAM_PREWARM_MINUTES = 15
+
+# Request metrics (config/metrics.py), shared by all worker processes through a SQLite
+# file (METRICS_DB_PATH, default in the temp directory). /metrics is served to admins,
+# METRICS_ALLOWED_IPS and requests bearing METRICS_TOKEN.
+METRICS_FLUSH_INTERVAL = 5  # seconds
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+# Score (percent) at or above which a submission counts as passed in exam statistics
+EXAM_PASS_MARK = 70
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
@@ -135,6 +182,14 @@ ACCOUNT_SIGNUP_PASSWORD_ENTER_TWICE = True
 ACCOUNT_UNIQUE_EMAIL = True
 ACCOUNT_USERNAME_MIN_LENGTH = 3
 ACCOUNT_USERNAME_BLACKLIST = ['admin', 'administrator', 'root', 'user', 'test']
+# Whole exam halls log in from one NAT address, so the per-IP limits are raised well above
+# allauth's defaults (30 logins, 10 failures a minute) rather than removed: one address still
+# cannot try passwords against any number of accounts. The password-hashing queue
+# (accounts/hashing.py) bounds the load.
+ACCOUNT_RATE_LIMITS = {
+    'login': '600/m/ip',
+    'login_failed': '60/m/ip,5/5m/key',
+}
 
 # Custom signup form and adapter
 ACCOUNT_FORMS = {
@@ -148,6 +203,14 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',      # Default Django backend
     'allauth.account.auth_backends.AuthenticationBackend',  # Django Allauth backend
 ]
+# Seconds request.user is resolved from the cache; 0 disables it. Saves invalidate the
+# cached user, so the cache must be shared by every process (runserver has one).
+ACCOUNTS_USER_CACHE_TIMEOUT = 60
+
+# Login password hashes run in a per-process pool; logins beyond the queue limit (shared by
+# every process on the host, through lock files in the temp directory) get a 429.
+ACCOUNTS_HASH_WORKERS = 2
+ACCOUNTS_HASH_QUEUE_LIMIT = 16
 
 USE_I18N = True
 
@@ -36,12 +36,14 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'config.metrics.MetricsMiddleware',  # First, so it times the whole stack
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'allauth.account.middleware.AccountMiddleware',
+    'accounts.middleware.HashingBusyMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -78,6 +80,59 @@ DATABASES = {
     }
 }
 
+# Cache
+# Exam papers, answer keys and the autosave answer buffer live here. Set
+# REDIS_URL so all gunicorn workers share them; without it each worker keeps
+# its own copy, sessions stay on the default database engine and autosaves
+# are written straight to the database.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+    # Sessions are read from Redis; the database only keeps who is logged in
+    # and is written at login and logout, and at most hourly to move the expiry
+    # forward (SESSION_DURABLE_REFRESH, config/sessions.py).
+    SESSION_ENGINE = 'config.sessions'
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'OPTIONS': {
+                'MAX_ENTRIES': 100000,
+            },
+        }
+    }
+    # A worker's own buffer is invisible to the others (and lost with it)
+    EXAM_ANSWER_BUFFER_ENABLED = False
+
+# Autosaved answers are flushed from the cache to the database in the background.
+# Set EXAM_ANSWER_BUFFER_FLUSH_IN_PROCESS=False when running
+# `python manage.py flush_answer_buffer --loop` as a separate service instead.
+EXAM_ANSWER_BUFFER_FLUSH_INTERVAL = int(os.getenv('EXAM_ANSWER_BUFFER_FLUSH_INTERVAL', 5))
+EXAM_ANSWER_BUFFER_FLUSH_IN_PROCESS = os.getenv('EXAM_ANSWER_BUFFER_FLUSH_IN_PROCESS', 'True').lower() == 'true'
+
+# Expired exam sessions are auto-submitted in batches. Set EXAM_SWEEP_IN_PROCESS=False
+# when running `python manage.py sweep_expired_sessions --loop` as a separate service.
+EXAM_SWEEP_INTERVAL = int(os.getenv('EXAM_SWEEP_INTERVAL', 60))
+EXAM_SWEEP_IN_PROCESS = os.getenv('EXAM_SWEEP_IN_PROCESS', 'True').lower() == 'true'
+
+# Scheduled exams are pre-warmed (caches filled, sessions pre-created) this many
+# minutes before start_time by a scheduler thread in every gunicorn worker.
+EXAM_PREWARM_MINUTES = int(os.getenv('EXAM_PREWARM_MINUTES', 15))
+EXAM_PREWARM_INTERVAL = int(os.getenv('EXAM_PREWARM_INTERVAL', 60))
+EXAM_PREWARM_IN_PROCESS = os.getenv('EXAM_PREWARM_IN_PROCESS', 'True').lower() == 'true'
+
+# Request metrics, merged across gunicorn workers in a SQLite file on local disk.
+# Behind nginx every request comes from 127.0.0.1, so scrapers authenticate with
+# `Authorization: Bearer $METRICS_TOKEN` unless METRICS_ALLOWED_IPS is set.
+METRICS_DB_PATH = os.getenv('METRICS_DB_PATH', '/var/run/gunicorn/mcq-exam-metrics.sqlite3')
+METRICS_FLUSH_INTERVAL = int(os.getenv('METRICS_FLUSH_INTERVAL', 5))
+METRICS_ALLOWED_IPS = [ip for ip in os.getenv('METRICS_ALLOWED_IPS', '').split(',') if ip]
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', '')
+
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -135,6 +190,14 @@ ACCOUNT_SIGNUP_PASSWORD_ENTER_TWICE = True
 ACCOUNT_UNIQUE_EMAIL = True
 ACCOUNT_USERNAME_MIN_LENGTH = 3
 ACCOUNT_USERNAME_BLACKLIST = ['admin', 'administrator', 'root', 'user', 'test']
+# Whole exam halls log in from one NAT address, so the per-IP limits are raised well above
+# allauth's defaults (30 logins, 10 failures a minute) rather than removed: one address still
+# cannot try passwords against any number of accounts. The password-hashing queue
+# (accounts/hashing.py) bounds the load.
+ACCOUNT_RATE_LIMITS = {
+    'login': '600/m/ip',
+    'login_failed': '60/m/ip,5/5m/key',
+}
 
 # Custom authentication backends
 AUTHENTICATION_BACKENDS = [
@@ -142,6 +205,20 @@ AUTHENTICATION_BACKENDS = [
     'django.contrib.auth.backends.ModelBackend',
     'allauth.account.auth_backends.AuthenticationBackend',
 ]
+# request.user is resolved from the cache; saves invalidate it, the TTL bounds anything else.
+# Only with Redis: a save would drop the copy of one LocMem worker and leave the others stale.
+ACCOUNTS_USER_CACHE_TIMEOUT = int(os.getenv('ACCOUNTS_USER_CACHE_TIMEOUT', 60)) if os.getenv('REDIS_URL') else 0
+
+# Login password hashes run in a per-process pool. At most ACCOUNTS_HASH_QUEUE_LIMIT logins
+# on the host are admitted at a time (lock files in ACCOUNTS_HASH_LOCK_DIR); the rest get a
+# 429 with Retry-After. A sync worker is held for a whole login, so with sync workers the
+# default keeps one worker free of logins. Size the pool to the cores left over by the web workers.
+ACCOUNTS_HASH_WORKERS = int(os.getenv('ACCOUNTS_HASH_WORKERS', 2))
+if os.getenv('GUNICORN_WORKER_CLASS', 'sync') == 'sync':
+    ACCOUNTS_HASH_QUEUE_LIMIT = int(os.getenv('ACCOUNTS_HASH_QUEUE_LIMIT', max(int(os.getenv('GUNICORN_WORKERS', 3)) - 1, 1)))
+else:
+    ACCOUNTS_HASH_QUEUE_LIMIT = int(os.getenv('ACCOUNTS_HASH_QUEUE_LIMIT', 16))
+ACCOUNTS_HASH_LOCK_DIR = os.getenv('ACCOUNTS_HASH_LOCK_DIR', '/var/run/gunicorn')
 
 # Email configuration
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
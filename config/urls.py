@@ -19,8 +19,11 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from config.metrics import metrics_view
+
 urlpatterns = [
     path('admin/', admin.site.urls),
+    path('metrics', metrics_view, name='metrics'),
     path('accounts/', include('accounts.urls')),  # Custom accounts URLs first
     path('accounts/', include('allauth.urls')),   # Allauth URLs second
     path('', include('exams.urls')),
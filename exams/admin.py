@@ -1,5 +1,7 @@
 from django.contrib import admin
-from .models import Exam, Question, Choice, ExamSession, Answer
+from .models import (
+    Exam, Question, Choice, ExamSession, ExamRegistration, Answer, ExamStatistics, UserSummary, QuestionBank, Tag,
+)
 
 
 class ChoiceInline(admin.TabularInline):
@@ -23,10 +25,24 @@ class ExamAdmin(admin.ModelAdmin):
 
 @admin.register(Question)
 class QuestionAdmin(admin.ModelAdmin):
-    list_display = ("exam", "order", "text")
+    list_display = ("exam", "bank", "order", "difficulty", "text")
+    list_filter = ("difficulty",)
+    raw_id_fields = ("exam", "bank")
+    filter_horizontal = ("tags",)
     inlines = [ChoiceInline]
 
 
+@admin.register(QuestionBank)
+class QuestionBankAdmin(admin.ModelAdmin):
+    list_display = ("name", "owner", "created_at")
+    search_fields = ("name", "owner__username")
+
+
+@admin.register(Tag)
+class TagAdmin(admin.ModelAdmin):
+    search_fields = ("name",)
+
+
 @admin.register(Choice)
 class ChoiceAdmin(admin.ModelAdmin):
     list_display = ("question", "text", "is_correct")
@@ -34,11 +50,31 @@ class ChoiceAdmin(admin.ModelAdmin):
 
 @admin.register(ExamSession)
 class ExamSessionAdmin(admin.ModelAdmin):
-    list_display = ("exam", "examinee", "started_at", "completed_at", "is_submitted", "score")
+    list_display = ("exam", "examinee", "started_at", "completed_at", "is_submitted", "provisioned", "score")
+
+
+@admin.register(ExamRegistration)
+class ExamRegistrationAdmin(admin.ModelAdmin):
+    list_display = ("exam", "examinee", "registered_at")
+    search_fields = ("exam__code", "examinee__username")
 
 
 @admin.register(Answer)
 class AnswerAdmin(admin.ModelAdmin):
     list_display = ("session", "question", "chosen_choice", "is_correct", "answered_at")
 
+
+@admin.register(ExamStatistics)
+class ExamStatisticsAdmin(admin.ModelAdmin):
+    list_display = ("exam", "session_count", "count", "mean", "min_score", "max_score", "pass_count", "updated_at")
+    readonly_fields = ("updated_at",)
+
+
+@admin.register(UserSummary)
+class UserSummaryAdmin(admin.ModelAdmin):
+    list_display = (
+        "user", "exams_taken", "exams_completed", "exams_created", "exams_published", "last_activity_at",
+    )
+    search_fields = ("user__username",)
+
 # Register your models here.
@@ -0,0 +1,195 @@
+"""
+Item analysis for exams: per-question difficulty, point-biserial
+discrimination, distractor frequencies and KR-20 reliability.
+
+The submitted answers are streamed from one query into a sessions x questions
+response matrix and every statistic is computed with vectorized NumPy
+operations. For exams drawn from banks the questions are those of every
+drawn paper, and each statistic only counts the sessions given the question.
+NumPy is an optional dependency; ``AVAILABLE`` is False without it.
+"""
+from itertools import islice
+
+from django.core.cache import cache
+
+from .cache import PAPER_CACHE_TIMEOUT, exam_cache_key
+from .models import Answer, ExamSession
+from .sampling import draw_question_ids, get_results_paper
+from .stats import get_exam_statistics
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy is listed in requirements-dev.txt
+    np = None
+
+AVAILABLE = np is not None
+FETCH_CHUNK_SIZE = 10000
+
+
+def _fetch_array(queryset, columns):
+    """Stream ``values_list`` rows of integers into an ``(n, columns)`` array."""
+    rows = queryset.iterator(chunk_size=FETCH_CHUNK_SIZE)
+    chunks = []
+    while True:
+        chunk = list(islice(rows, FETCH_CHUNK_SIZE))
+        if not chunk:
+            break
+        chunks.append(np.array(chunk, dtype=np.int64).reshape(-1, columns))
+    return np.concatenate(chunks) if chunks else np.empty((0, columns), dtype=np.int64)
+
+
+def submitted_session_ids(exam):
+    """The ids of an exam's submitted sessions, sorted."""
+    sessions = ExamSession.objects.filter(exam=exam, is_submitted=True)
+    return np.sort(_fetch_array(sessions.values_list('id'), 1)[:, 0])
+
+
+def build_response_matrix(exam, paper, session_ids):
+    """
+    Build the response matrix of an exam's submitted sessions (``session_ids``, sorted).
+
+    Returns ``(chosen, key, presented)``: ``chosen[s, q]`` is the position of
+    the choice session ``s`` picked for question ``q`` (-1 if unanswered),
+    ``key[q, c]`` is True when choice position ``c`` of question ``q`` is
+    correct, and ``presented[s, q]`` is True when question ``q`` was on the
+    paper of session ``s`` (always, unless the exam draws from banks).
+    """
+    max_choices = max((len(question['choices']) for question in paper), default=0)
+    key = np.zeros((len(paper), max(max_choices, 1)), dtype=bool)
+    choice_ids, choice_questions, choice_positions = [], [], []
+    for q, question in enumerate(paper):
+        for c, choice in enumerate(question['choices']):
+            key[q, c] = choice['is_correct']
+            choice_ids.append(choice['id'])
+            choice_questions.append(q)
+            choice_positions.append(c)
+
+    chosen = np.full((len(session_ids), len(paper)), -1, dtype=np.int16)
+    presented = np.ones(chosen.shape, dtype=bool)
+    if exam.draws_from_bank:
+        presented[:] = False
+        columns = {question['id']: q for q, question in enumerate(paper)}
+        for s, session_id in enumerate(session_ids.tolist()):
+            presented[s, [columns[i] for i in draw_question_ids(exam, session_id) if i in columns]] = True
+    if not len(session_ids) or not choice_ids:
+        return chosen, key, presented
+
+    answers = _fetch_array(
+        Answer.objects.filter(session__exam=exam, session__is_submitted=True)
+        .exclude(chosen_choice=None)
+        .values_list('session_id', 'chosen_choice_id'),
+        2,
+    )
+    choice_ids = np.array(choice_ids, dtype=np.int64)
+    order = np.argsort(choice_ids)
+    sorted_choice_ids = choice_ids[order]
+
+    # Drop choices no longer on the paper and sessions submitted after the first query
+    found = np.searchsorted(sorted_choice_ids, answers[:, 1]).clip(0, len(sorted_choice_ids) - 1)
+    rows = np.searchsorted(session_ids, answers[:, 0]).clip(0, len(session_ids) - 1)
+    valid = (sorted_choice_ids[found] == answers[:, 1]) & (session_ids[rows] == answers[:, 0])
+    choice_index = order[found[valid]]
+    chosen[rows[valid], np.array(choice_questions)[choice_index]] = np.array(choice_positions)[choice_index]
+    return chosen, key, presented
+
+
+def analyze_responses(chosen, key, presented=None):
+    """
+    Compute item statistics from a response matrix (see ``build_response_matrix``).
+
+    Each item's statistics count only the sessions it was ``presented`` to
+    (every session by default); KR-20 needs one paper for all and is None otherwise.
+    """
+    num_sessions, num_questions = chosen.shape
+    if presented is None:
+        presented = np.ones(chosen.shape, dtype=bool)
+    answered = chosen >= 0
+    rows, cols = np.nonzero(answered)
+    scored = np.zeros(chosen.shape, dtype=np.float64)
+    scored[rows, cols] = key[cols, chosen[rows, cols]]
+
+    totals = scored.sum(axis=1)
+    weights = presented.astype(np.float64)
+    given = weights.sum(axis=0)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        difficulty = np.where(given > 0, scored.sum(axis=0) / given, 0.0)
+
+        # Point-biserial correlation of each item with the rest of the test
+        rest = totals[:, None] - scored
+        item_dev = (scored - difficulty) * weights
+        rest_dev = (rest - (rest * weights).sum(axis=0) / given) * weights
+        discrimination = (item_dev * rest_dev).sum(axis=0) / np.sqrt(
+            (item_dev ** 2).sum(axis=0) * (rest_dev ** 2).sum(axis=0)
+        )
+
+    total_variance = totals.var() if num_sessions else 0.0
+    if num_questions > 1 and total_variance > 0 and presented.all():
+        kr20 = num_questions / (num_questions - 1) * (1 - (difficulty * (1 - difficulty)).sum() / total_variance)
+    else:
+        kr20 = None
+
+    max_choices = key.shape[1]
+    frequencies = np.bincount(
+        cols * max_choices + chosen[rows, cols], minlength=num_questions * max_choices
+    ).reshape(num_questions, max_choices)
+    omitted = given.astype(np.int64) - answered.sum(axis=0)
+
+    return {
+        'sessions': num_sessions,
+        'kr20': None if kr20 is None else float(kr20),
+        'mean_score': float(totals.mean()) if num_sessions else 0.0,
+        'difficulty': difficulty,
+        'discrimination': discrimination,
+        'frequencies': frequencies,
+        'given': given.astype(np.int64),
+        'omitted': omitted,
+    }
+
+
+def get_item_analysis(exam):
+    """
+    Return the item analysis of an exam, cached until the paper or the
+    submissions change.
+    """
+    stats = get_exam_statistics(exam)
+    updated = int(stats.updated_at.timestamp()) if stats.updated_at else 0
+    key = exam_cache_key(exam, f'item-analysis:{stats.count}:{updated}')
+    analysis = cache.get(key)
+    if analysis is not None:
+        return analysis
+
+    session_ids = submitted_session_ids(exam)
+    paper = get_results_paper(exam, session_ids.tolist())
+    result = analyze_responses(*build_response_matrix(exam, paper, session_ids))
+    items = []
+    for q, question in enumerate(paper):
+        discrimination = result['discrimination'][q]
+        given = int(result['given'][q])
+        items.append({
+            'number': q + 1,
+            'id': question['id'],
+            'text': question['text'],
+            'difficulty': float(result['difficulty'][q]),
+            'discrimination': None if np.isnan(discrimination) else float(discrimination),
+            'sessions': given,
+            'omitted': int(result['omitted'][q]),
+            'choices': [
+                {
+                    'text': choice['text'],
+                    'is_correct': choice['is_correct'],
+                    'count': int(result['frequencies'][q, c]),
+                    'percent': float(result['frequencies'][q, c] / given * 100) if given else 0,
+                }
+                for c, choice in enumerate(question['choices'])
+            ],
+        })
+    analysis = {
+        'sessions': result['sessions'],
+        # Questions per paper, out of which the mean score is
+        'paper_length': exam.num_questions if exam.draws_from_bank else len(paper),
+        'kr20': result['kr20'],
+        'mean_score': result['mean_score'],
+        'items': items,
+    }
+    cache.set(key, analysis, PAPER_CACHE_TIMEOUT)
+    return analysis
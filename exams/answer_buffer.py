@@ -0,0 +1,284 @@
+"""
+Write-behind buffer for autosaved answers.
+
+Autosaves never touch the ``Answer`` table directly. Each session's latest
+answers are kept in the cache (LocMem in development, Redis in production)
+and a background flusher upserts them into ``Answer`` in large batches, so the
+``(session, question)`` unique index sees a few bulk statements per interval
+instead of one write per click.
+
+Every answer has its own cache key, so concurrent autosaves of one session
+(two tabs, a retried request) each write their own questions and never undo
+each other; reading a session's buffer takes the question ids from its answer
+key. Which sessions need flushing is tracked with an append-only log in the
+cache: the first delta after a flush adds the session to the log, and the
+flusher walks the log from its cursor. Reads merge the buffer over the
+database, and ``submit_exam`` grades from that merged view inside its own
+transaction, so a submission is always exact whatever the flusher has done.
+
+The buffer needs a cache shared by every worker. With
+``EXAM_ANSWER_BUFFER_ENABLED = False`` autosaves are written straight to
+``Answer`` instead.
+
+The ``a``-prefixed functions are the async equivalents used by the ASGI views.
+"""
+import logging
+import threading
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+
+from .grading import answer_rows, grade_answers, upsert_answers
+from .models import Exam, ExamSession
+from .sampling import get_answer_keys
+
+logger = logging.getLogger(__name__)
+
+BUFFER_TIMEOUT = getattr(settings, 'EXAM_ANSWER_BUFFER_TIMEOUT', 60 * 60 * 24)
+FLUSH_INTERVAL = getattr(settings, 'EXAM_ANSWER_BUFFER_FLUSH_INTERVAL', 5)
+FLUSH_BATCH_SIZE = getattr(settings, 'EXAM_ANSWER_BUFFER_BATCH_SIZE', 1000)
+FLUSH_IN_PROCESS = getattr(settings, 'EXAM_ANSWER_BUFFER_FLUSH_IN_PROCESS', True)
+ENABLED = getattr(settings, 'EXAM_ANSWER_BUFFER_ENABLED', True)
+# A dirty flag that outlives this is re-logged, in case its log entry was lost.
+DIRTY_TIMEOUT = FLUSH_INTERVAL * 12
+
+KEY_PREFIX = 'exams:answer-buffer'
+LOG_SEQ_KEY = f'{KEY_PREFIX}:log:seq'
+LOG_CURSOR_KEY = f'{KEY_PREFIX}:log:cursor'
+FLUSH_LOCK_KEY = f'{KEY_PREFIX}:flush-lock'
+
+
+def _answer_key(session_id, question_id):
+    return f'{KEY_PREFIX}:{session_id}:{question_id}'
+
+
+def _answer_keys(session_id, answer_key):
+    return {_answer_key(session_id, question_id): question_id for question_id in answer_key}
+
+
+def _dirty_key(session_id):
+    return f'{KEY_PREFIX}:{session_id}:dirty'
+
+
+def _log_key(position):
+    return f'{KEY_PREFIX}:log:{position}'
+
+
+def _buffered(session_id, graded):
+    return {
+        _answer_key(session_id, question_id): choice_id for question_id, (choice_id, _) in graded.items()
+    }
+
+
+def buffer_answers(session, answers, answer_key):
+    """
+    Record answer deltas for a session without writing to the database.
+
+    Invalid pairs are dropped. Returns the number of accepted deltas.
+    """
+    graded = grade_answers(answer_key, answers)
+    if not graded:
+        return 0
+    if not ENABLED:
+        _write_through(session.pk, graded)
+        return len(graded)
+
+    cache.set_many(_buffered(session.pk, graded), BUFFER_TIMEOUT)
+    _mark_dirty(session)
+    ensure_flusher()
+    return len(graded)
+
+
+async def abuffer_answers(session, answers, answer_key):
+    """Async ``buffer_answers`` for the ASGI autosave view."""
+    graded = grade_answers(answer_key, answers)
+    if not graded:
+        return 0
+    if not ENABLED:
+        await sync_to_async(_write_through)(session.pk, graded)
+        return len(graded)
+
+    await cache.aset_many(_buffered(session.pk, graded), BUFFER_TIMEOUT)
+    await _amark_dirty(session)
+    ensure_flusher()
+    return len(graded)
+
+
+def _write_through(session_id, graded):
+    with transaction.atomic():
+        # As in flush_sessions: a concurrent submit must not be overwritten
+        if ExamSession.objects.select_for_update().filter(pk=session_id, is_submitted=False).values_list('pk'):
+            upsert_answers(answer_rows(session_id, graded))
+
+
+def _mark_dirty(session):
+    if cache.add(_dirty_key(session.pk), True, DIRTY_TIMEOUT):
+        cache.add(LOG_SEQ_KEY, 0, None)
+        position = cache.incr(LOG_SEQ_KEY)
+        cache.set(_log_key(position), (session.pk, session.exam_id), BUFFER_TIMEOUT)
+
+
+async def _amark_dirty(session):
+    if await cache.aadd(_dirty_key(session.pk), True, DIRTY_TIMEOUT):
+        await cache.aadd(LOG_SEQ_KEY, 0, None)
+        position = await cache.aincr(LOG_SEQ_KEY)
+        await cache.aset(_log_key(position), (session.pk, session.exam_id), BUFFER_TIMEOUT)
+
+
+def get_buffered_answers(session_id, answer_key):
+    """Return the buffered ``{question_id: choice_id}`` of a session, for the questions of ``answer_key``."""
+    return get_buffered_answers_many({session_id: answer_key}).get(session_id, {})
+
+
+async def aget_buffered_answers(session_id, answer_key):
+    if not ENABLED:
+        return {}
+    keys = _answer_keys(session_id, answer_key)
+    return {keys[key]: choice_id for key, choice_id in (await cache.aget_many(keys)).items()}
+
+
+def get_buffered_answers_many(answer_keys):
+    """
+    Return ``{session_id: {question_id: choice_id}}`` for the buffered sessions
+    among ``answer_keys`` (``{session_id: answer_key}``), with one cache call.
+    """
+    if not ENABLED:
+        return {}
+    keys = {
+        key: (session_id, question_id)
+        for session_id, answer_key in answer_keys.items()
+        for key, question_id in _answer_keys(session_id, answer_key).items()
+    }
+    buffered = {}
+    for key, choice_id in cache.get_many(keys).items():
+        session_id, question_id = keys[key]
+        buffered.setdefault(session_id, {})[question_id] = choice_id
+    return buffered
+
+
+def get_saved_answers(session, answer_key):
+    """Return ``{question_id: choice_id}`` for a session: stored answers overlaid with the buffer."""
+    answers = dict(session.answers.exclude(chosen_choice=None).values_list('question_id', 'chosen_choice_id'))
+    answers.update(get_buffered_answers(session.pk, answer_key))
+    return answers
+
+
+async def aget_saved_answers(session, answer_key):
+    answers = {
+        question_id: choice_id
+        async for question_id, choice_id
+        in session.answers.exclude(chosen_choice=None).values_list('question_id', 'chosen_choice_id')
+    }
+    answers.update(await aget_buffered_answers(session.pk, answer_key))
+    return answers
+
+
+def _buffer_keys(answer_keys):
+    return [
+        key
+        for session_id, answer_key in answer_keys.items()
+        for key in [_dirty_key(session_id), *_answer_keys(session_id, answer_key)]
+    ]
+
+
+def discard(session_id, answer_key):
+    """Drop the buffer of a session once its answers are final."""
+    discard_many({session_id: answer_key})
+
+
+async def adiscard(session_id, answer_key):
+    if ENABLED:
+        await cache.adelete_many(_buffer_keys({session_id: answer_key}))
+
+
+def discard_many(answer_keys):
+    """Drop the buffers of several sessions (``{session_id: answer_key}``) with one cache call."""
+    if ENABLED:
+        cache.delete_many(_buffer_keys(answer_keys))
+
+
+def flush(batch_size=FLUSH_BATCH_SIZE):
+    """
+    Upsert buffered answers of every dirty session into ``Answer``.
+
+    Only one flusher runs at a time across all processes sharing the cache.
+    Returns the number of answer rows written.
+    """
+    if not cache.add(FLUSH_LOCK_KEY, True, max(FLUSH_INTERVAL * 6, 60)):
+        return 0
+    try:
+        cursor = cache.get(LOG_CURSOR_KEY, 0)
+        end = cache.get(LOG_SEQ_KEY, 0)
+        if end < cursor:
+            # The log counter was evicted and restarted; start over.
+            cursor = 0
+
+        written = 0
+        while cursor < end:
+            stop = min(end, cursor + batch_size)
+            log_keys = [_log_key(position) for position in range(cursor + 1, stop + 1)]
+            written += flush_sessions(dict(cache.get_many(log_keys).values()))
+            cache.set(LOG_CURSOR_KEY, stop, None)
+            cache.delete_many(log_keys)
+            cursor = stop
+        return written
+    finally:
+        cache.delete(FLUSH_LOCK_KEY)
+
+
+def flush_sessions(session_exam_ids):
+    """Upsert the buffered answers of sessions given as ``{session_id: exam_id}`` in one transaction."""
+    if not session_exam_ids:
+        return 0
+
+    # Clear the dirty flags first so deltas arriving from now on are re-logged.
+    cache.delete_many([_dirty_key(session_id) for session_id in session_exam_ids])
+    exams = Exam.objects.in_bulk(set(session_exam_ids.values()))
+    answer_keys = get_answer_keys(exams, session_exam_ids)
+    buffered = get_buffered_answers_many(answer_keys)
+    if not buffered:
+        return 0
+
+    with transaction.atomic():
+        # Locking the open sessions keeps a concurrent submit from being overwritten.
+        open_ids = set(
+            ExamSession.objects.select_for_update()
+            .filter(pk__in=buffered.keys(), is_submitted=False)
+            .values_list('pk', flat=True)
+        )
+        rows = []
+        for session_id, answers in buffered.items():
+            if session_id in open_ids:
+                rows.extend(answer_rows(session_id, grade_answers(answer_keys[session_id], answers)))
+        upsert_answers(rows, batch_size=FLUSH_BATCH_SIZE)
+    return len(rows)
+
+
+def run_flusher(interval=FLUSH_INTERVAL, stop_event=None):
+    """Flush the buffer every ``interval`` seconds until ``stop_event`` is set."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(interval):
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            logger.exception("Answer buffer flush failed")
+        finally:
+            close_old_connections()
+
+
+_flusher = None
+_flusher_lock = threading.Lock()
+
+
+def ensure_flusher():
+    """Start the in-process background flusher once per process, if enabled."""
+    global _flusher
+    if not FLUSH_IN_PROCESS or (_flusher is not None and _flusher.is_alive()):
+        return
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=run_flusher, name='answer-buffer-flusher', daemon=True)
+            _flusher.start()
@@ -1,6 +1,18 @@
 from django.apps import AppConfig
+from django.db import connections
+from django.db.models.signals import post_migrate
+
+
+def install_search(sender, using, **kwargs):
+    from . import search
+
+    search.install(connections[using])
 
 
 class ExamsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'exams'
+
+    def ready(self):
+        # Keeps the search triggers in place when a migration rebuilt the question table
+        post_migrate.connect(install_search, sender=self)
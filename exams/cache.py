@@ -0,0 +1,143 @@
+"""
+Versioned cache for the immutable per-exam data: the ordered question list,
+the choices, the answer key and the examinee-facing JSON paper.
+
+Entries are keyed by ``Exam.version``. Every write path that changes an
+exam's questions calls ``Exam.bump_version()``, which makes the old entries
+unreachable; they simply expire.
+"""
+import json
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Prefetch
+
+from .models import Choice, Question
+
+PAPER_CACHE_TIMEOUT = getattr(settings, 'EXAM_PAPER_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+def exam_cache_key(exam, kind):
+    return f'exams:exam:{exam.pk}:v{exam.version}:{kind}'
+
+
+def build_exam_paper(exam):
+    """
+    Load the paper of an exam with a single prefetch.
+
+    Returns a list of question dicts in paper order, each with a ``choices``
+    list of ``{'id', 'text', 'is_correct'}`` dicts.
+    """
+    questions = (
+        Question.objects.filter(exam=exam)
+        .order_by('order', 'id')
+        .prefetch_related(Prefetch('choices', queryset=Choice.objects.order_by('id')))
+    )
+    return [paper_question(question) for question in questions]
+
+
+def paper_question(question, order=None):
+    """The paper entry of a question whose choices were prefetched in id order."""
+    return {
+        'id': question.id,
+        'text': question.text,
+        'order': question.order if order is None else order,
+        'choices': [
+            {'id': choice.id, 'text': choice.text, 'is_correct': choice.is_correct}
+            for choice in question.choices.all()
+        ],
+    }
+
+
+def build_answer_key(paper):
+    """Return ``{question_id: {choice_id: is_correct}}`` for a paper."""
+    return {
+        question['id']: {choice['id']: choice['is_correct'] for choice in question['choices']}
+        for question in paper
+        if question['choices']
+    }
+
+
+def get_exam_paper(exam):
+    """Return the cached paper of an exam, loading it on a miss."""
+    key = exam_cache_key(exam, 'paper')
+    paper = cache.get(key)
+    if paper is None:
+        paper = build_exam_paper(exam)
+        cache.set_many({
+            key: paper,
+            exam_cache_key(exam, 'answer_key'): build_answer_key(paper),
+        }, PAPER_CACHE_TIMEOUT)
+    return paper
+
+
+def get_answer_key(exam):
+    """Return the cached answer key of an exam, loading it on a miss."""
+    answer_key = cache.get(exam_cache_key(exam, 'answer_key'))
+    if answer_key is None:
+        answer_key = build_answer_key(get_exam_paper(exam))
+        cache.set(exam_cache_key(exam, 'answer_key'), answer_key, PAPER_CACHE_TIMEOUT)
+    return answer_key
+
+
+async def aget_answer_key(exam):
+    """Async ``get_answer_key``: one cache round trip on a hit."""
+    answer_key = await cache.aget(exam_cache_key(exam, 'answer_key'))
+    if answer_key is None:
+        answer_key = await sync_to_async(get_answer_key)(exam)
+    return answer_key
+
+
+# Bump when the JSON paper schema changes, so browsers drop their old copies.
+PAPER_FORMAT = 1
+
+
+def build_paper_json(paper):
+    """
+    Serialize the examinee-facing paper: question ids and texts with their
+    ``[choice_id, text]`` pairs, in paper order. Never includes ``is_correct``.
+    """
+    return json.dumps({
+        'format': PAPER_FORMAT,
+        'questions': [
+            {
+                'id': question['id'],
+                'text': question['text'],
+                'choices': [[choice['id'], choice['text']] for choice in question['choices']],
+            }
+            for question in paper
+        ],
+    }, ensure_ascii=False, separators=(',', ':')).encode()
+
+
+def paper_etag(exam, session_id=None):
+    """
+    Strong ETag of the JSON paper; changes whenever the questions do. Papers
+    drawn from a question bank differ per session and carry its id.
+    """
+    session = f'-s{session_id}' if session_id is not None else ''
+    return f'"paper-{exam.pk}-v{exam.version}{session}-f{PAPER_FORMAT}"'
+
+
+def get_paper_json(exam):
+    """
+    Return the JSON paper of an exam as bytes.
+
+    It holds no per-user data, so it is serialized once per exam version and
+    the same bytes are served to every examinee.
+    """
+    key = exam_cache_key(exam, 'paper_json')
+    paper_json = cache.get(key)
+    if paper_json is None:
+        paper_json = build_paper_json(get_exam_paper(exam))
+        cache.set(key, paper_json, PAPER_CACHE_TIMEOUT)
+    return paper_json
+
+
+async def aget_paper_json(exam):
+    """Async ``get_paper_json``: one cache round trip on a hit."""
+    paper_json = await cache.aget(exam_cache_key(exam, 'paper_json'))
+    if paper_json is None:
+        paper_json = await sync_to_async(get_paper_json)(exam)
+    return paper_json
@@ -0,0 +1,301 @@
+"""
+Duplicate detection for question imports.
+
+Every question is fingerprinted when it is imported or edited (see
+``fingerprint_questions``):
+
+* ``text_hash`` identifies its normalized text (case, punctuation and spacing
+  ignored), so exact duplicates are one index lookup away;
+* a MinHash signature of its character shingles estimates the Jaccard
+  similarity of two texts from ``NUM_HASHES`` integers.
+
+For near duplicates the signature is cut into ``BANDS`` bands of ``ROWS``
+values (locality-sensitive hashing) and each band's hash is indexed in
+``QuestionBand``. Two texts of similarity s share at least one band with
+probability 1 - (1 - s^ROWS)^BANDS, so the candidates of a row come from a
+few index lookups whatever the number of existing questions, and only their
+signatures are compared: a 10k-row upload is never checked pairwise against
+the bank.
+"""
+import random
+import re
+import struct
+import unicodedata
+from dataclasses import dataclass, field as dataclass_field
+from hashlib import blake2b
+from itertools import islice
+from operator import eq
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Q
+
+from .models import Question, QuestionBand, QuestionSignature
+
+SHINGLE_SIZE = 5
+BANDS = 16
+ROWS = 8
+NUM_HASHES = BANDS * ROWS
+# Estimated similarity from which a question is reported as a near duplicate
+NEAR_DUPLICATE_THRESHOLD = getattr(settings, 'NEAR_DUPLICATE_THRESHOLD', 0.8)
+CHECK_BATCH_SIZE = 500
+# Values per IN (...) lookup, below SQLite's limit on query parameters
+LOOKUP_CHUNK_SIZE = 500
+REPORT_LIMIT = 200
+
+# Signatures are stored, so the densification probes are fixed: each bin
+# gets its own order in which to look for a non-empty bin.
+_rng = random.Random(0x5EED)
+_PROBES = [_rng.sample(range(NUM_HASHES), NUM_HASHES) for _ in range(NUM_HASHES)]
+_SIGNATURE = struct.Struct(f'<{NUM_HASHES}I')
+_BAND = struct.Struct(f'<B{ROWS}I')
+
+
+def normalize_text(text):
+    """Lowercased words of ``text`` separated by single spaces; punctuation is dropped."""
+    return ' '.join(re.findall(r'\w+', unicodedata.normalize('NFKC', text).lower()))
+
+
+def _hash64(data):
+    """A stable signed 64-bit hash (Python's ``hash`` is salted per process)."""
+    return int.from_bytes(blake2b(data, digest_size=8).digest(), 'little', signed=True)
+
+
+def text_hash(normalized):
+    return _hash64(normalized.encode())
+
+
+def minhash(normalized):
+    """
+    The MinHash signature (``NUM_HASHES`` 32-bit values) of a normalized
+    text's shingles, by one-permutation hashing: every shingle is hashed once
+    into one of ``NUM_HASHES`` bins and each bin keeps its minimum, so the cost
+    is linear in the length of the text. An empty bin takes the value of the
+    first non-empty one in its probe order (optimal densification).
+    """
+    bins = [None] * NUM_HASHES
+    for i in range(max(len(normalized) - SHINGLE_SIZE, 0) + 1):
+        digest = int.from_bytes(blake2b(normalized[i:i + SHINGLE_SIZE].encode(), digest_size=8).digest(), 'little')
+        position, value = digest % NUM_HASHES, digest >> 32
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    signature = list(bins)
+    for position, value in enumerate(bins):
+        if value is None:
+            for probe in _PROBES[position]:
+                if bins[probe] is not None:
+                    signature[position] = bins[probe]
+                    break
+    return tuple(signature)
+
+
+def band_hashes(signature):
+    """One hash per LSH band of a signature, salted with the band number."""
+    return [_hash64(_BAND.pack(band, *signature[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def similarity(signature, other):
+    """The estimated Jaccard similarity of the texts of two signatures."""
+    return sum(map(eq, signature, other)) / NUM_HASHES
+
+
+def fingerprint(text):
+    """Return ``(text_hash, signature)`` of a question text."""
+    normalized = normalize_text(text)
+    return text_hash(normalized), minhash(normalized)
+
+
+def fingerprint_questions(questions, replace=False):
+    """
+    Store the fingerprints of saved questions; ``replace`` drops their old
+    ones first (after an edit). The caller owns the transaction.
+    """
+    ids = [question.pk for question in questions]
+    if replace:
+        QuestionBand.objects.filter(question_id__in=ids).delete()
+        QuestionSignature.objects.filter(question_id__in=ids).delete()
+    signatures, bands = [], []
+    for question in questions:
+        digest, signature = fingerprint(question.text)
+        signatures.append((question.pk, digest, _SIGNATURE.pack(*signature)))
+        bands.extend((question.pk, band) for band in band_hashes(signature))
+    # ``BANDS`` rows per question: raw inserts skip building a model instance for each
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            f'INSERT INTO {QuestionSignature._meta.db_table} (question_id, text_hash, minhash) VALUES (%s, %s, %s)',
+            signatures,
+        )
+        cursor.executemany(f'INSERT INTO {QuestionBand._meta.db_table} (question_id, band_hash) VALUES (%s, %s)', bands)
+
+
+def _chunks(values, size=LOOKUP_CHUNK_SIZE):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+
+@dataclass
+class Duplicate:
+    """A CSV row that repeats an existing question (``match``) or an earlier row (``match_row``)."""
+    row: int
+    text: str
+    exact: bool
+    similarity: float
+    match: Question = None
+    match_row: int = None
+
+
+@dataclass
+class DuplicateReport:
+    rows: int = 0
+    exact: int = 0
+    near: int = 0
+    # The first ``REPORT_LIMIT`` duplicates, in row order
+    duplicates: list = dataclass_field(default_factory=list)
+
+    @property
+    def new(self):
+        return self.rows - self.exact - self.near
+
+    @property
+    def truncated(self):
+        return self.exact + self.near > len(self.duplicates)
+
+    def add(self, duplicate):
+        if duplicate.exact:
+            self.exact += 1
+        else:
+            self.near += 1
+        if len(self.duplicates) < REPORT_LIMIT:
+            self.duplicates.append(duplicate)
+
+
+class _Upload:
+    """The rows checked so far, indexed like the stored fingerprints."""
+
+    def __init__(self):
+        self.texts = {}
+        self.bands = {}
+        self.signatures = {}
+
+    def find(self, digest, signature, bands, threshold):
+        if digest in self.texts:
+            return self.texts[digest], 1.0, True
+        rows = {row for band in bands for row in self.bands.get(band, ())}
+        estimate, row = max(((similarity(signature, self.signatures[row]), -row) for row in rows), default=(0, 0))
+        return (-row, estimate, False) if estimate >= threshold else (None, 0, False)
+
+    def add(self, row, digest, signature, bands):
+        self.texts.setdefault(digest, row)
+        self.signatures[row] = signature
+        for band in bands:
+            self.bands.setdefault(band, []).append(row)
+
+
+def _owned_by(owner):
+    return Q(question__exam__examiner=owner) | Q(question__bank__owner=owner)
+
+
+def _check_batch(batch, owner, threshold, upload, report, first_row):
+    fingerprints = [fingerprint(row['question']) for row in batch]
+    row_bands = [band_hashes(signature) for _, signature in fingerprints]
+    scope = _owned_by(owner)
+
+    # Exact duplicates: the oldest question with the same normalized text
+    exact = {}
+    for chunk in _chunks({digest for digest, _ in fingerprints}):
+        for digest, question_id in (
+            QuestionSignature.objects.filter(scope, text_hash__in=chunk).values_list('text_hash', 'question_id')
+        ):
+            exact[digest] = min(question_id, exact.get(digest, question_id))
+
+    # Near duplicates: questions sharing a band, then compared by signature
+    bucket = {}
+    wanted = {band for (digest, _), bands in zip(fingerprints, row_bands) if digest not in exact for band in bands}
+    for chunk in _chunks(wanted):
+        for band, question_id in (
+            QuestionBand.objects.filter(scope, band_hash__in=chunk).values_list('band_hash', 'question_id')
+        ):
+            bucket.setdefault(band, set()).add(question_id)
+    signatures = {}
+    for chunk in _chunks({question_id for question_ids in bucket.values() for question_id in question_ids}):
+        for question_id, packed in QuestionSignature.objects.filter(question_id__in=chunk).values_list(
+            'question_id', 'minhash'
+        ):
+            signatures[question_id] = _SIGNATURE.unpack(bytes(packed))
+
+    for offset, (row, (digest, signature), bands) in enumerate(zip(batch, fingerprints, row_bands)):
+        number = first_row + offset
+        duplicate = None
+        if digest in exact:
+            duplicate = Duplicate(number, row['question'], True, 1.0, match=exact[digest])
+        else:
+            candidates = {question_id for band in bands for question_id in bucket.get(band, ())}
+            estimate, question_id = max(
+                ((similarity(signature, signatures[question_id]), -question_id) for question_id in candidates),
+                default=(0, 0),
+            )
+            if estimate >= threshold:
+                duplicate = Duplicate(number, row['question'], False, estimate, match=-question_id)
+            else:
+                match_row, estimate, is_exact = upload.find(digest, signature, bands, threshold)
+                if match_row is not None:
+                    duplicate = Duplicate(number, row['question'], is_exact, estimate, match_row=match_row)
+        if duplicate:
+            report.add(duplicate)
+        upload.add(number, digest, signature, bands)
+
+
+def find_duplicates(rows, owner, threshold=NEAR_DUPLICATE_THRESHOLD, batch_size=CHECK_BATCH_SIZE):
+    """
+    Check CSV rows against the questions of ``owner``'s exams and banks, and
+    against each other, without importing anything.
+
+    Rows are numbered from 1 and consumed ``batch_size`` at a time. Returns a
+    ``DuplicateReport``; the ``match`` of each reported duplicate is loaded
+    with its exam and bank.
+    """
+    rows = iter(rows)
+    report = DuplicateReport()
+    upload = _Upload()
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+        _check_batch(batch, owner, threshold, upload, report, report.rows + 1)
+        report.rows += len(batch)
+
+    matches = Question.objects.select_related('exam', 'bank').in_bulk(
+        [duplicate.match for duplicate in report.duplicates if duplicate.match is not None]
+    )
+    for duplicate in report.duplicates:
+        if duplicate.match is not None:
+            duplicate.match = matches.get(duplicate.match)
+    return report
+
+
+def rebuild(batch_size=CHECK_BATCH_SIZE, missing_only=True, progress=None):
+    """
+    Fingerprint questions in id order, ``batch_size`` at a time: those without
+    a fingerprint, or every question (dropping the old fingerprints first).
+    Returns the number of questions fingerprinted; ``progress`` is called with
+    that running total after each batch.
+    """
+    if not missing_only:
+        with transaction.atomic():
+            QuestionBand.objects.all().delete()
+            QuestionSignature.objects.all().delete()
+    done = 0
+    last_id = 0
+    while True:
+        questions = list(
+            Question.objects.filter(id__gt=last_id, signature__isnull=True).order_by('id').only('id', 'text')[:batch_size]
+        )
+        if not questions:
+            return done
+        with transaction.atomic():
+            fingerprint_questions(questions)
+        done += len(questions)
+        last_id = questions[-1].pk
+        if progress:
+            progress(done)
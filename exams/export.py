@@ -0,0 +1,117 @@
+"""
+Streaming export of exam results.
+
+Rows are produced from a server-side cursor (``iterator(chunk_size=...)``)
+with the examinee joined in, and per-question answers are fetched one chunk of
+sessions at a time, so memory stays flat whatever the number of sessions.
+For exams drawn from banks the answer columns are every question drawn for
+a submitted session, blank for the sessions not given it. Answers are the
+letter each examinee saw the chosen choice under, so with shuffled choices the
+same letter can mean different choices for different examinees.
+"""
+import csv
+from itertools import islice
+
+from django.utils import timezone
+
+from .models import Answer
+from .sampling import get_results_paper
+from .shuffle import shuffle_choices
+
+try:
+    from openpyxl import Workbook
+except ImportError:  # pragma: no cover - openpyxl is listed in requirements-dev.txt
+    Workbook = None
+
+XLSX_AVAILABLE = Workbook is not None
+EXPORT_CHUNK_SIZE = 2000
+
+
+class Echo:
+    """File-like object whose ``write`` just returns the value, for streaming ``csv.writer``."""
+
+    def write(self, value):
+        return value
+
+
+def _format_datetime(value):
+    return timezone.localtime(value).strftime('%Y-%m-%d %H:%M:%S') if value else ''
+
+
+def _choice_letter(exam, session_id, question, choice_id):
+    """The letter ``session_id`` was shown ``choice_id`` under, or '' if unanswered."""
+    if choice_id is None:
+        return ''
+    for position, choice in enumerate(shuffle_choices(question, exam, session_id)):
+        if choice['id'] == choice_id:
+            return chr(ord('A') + position)
+    return ''
+
+
+def iter_result_rows(exam, include_answers=False, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield the header and one row per submitted session of an exam."""
+    header = ['Student', 'Email', 'Started', 'Completed', 'Score', 'Correct', 'Answered']
+    if include_answers:
+        submitted = exam.sessions.filter(is_submitted=True).values_list('id', flat=True)
+        paper = get_results_paper(exam, submitted.iterator())
+        if exam.draws_from_bank:
+            # Papers differ between examinees: columns are named by question id
+            header += [f"Q#{question['id']}" for question in paper]
+        else:
+            header += [f"Q{number}" for number in range(1, len(paper) + 1)]
+    yield header
+
+    sessions = (
+        exam.sessions.filter(is_submitted=True)
+        .select_related('examinee')
+        .only(
+            'started_at', 'completed_at', 'score', 'total_correct', 'total_questions',
+            'examinee__username', 'examinee__email',
+        )
+        .order_by('completed_at', 'id')
+        .iterator(chunk_size=chunk_size)
+    )
+    while True:
+        chunk = list(islice(sessions, chunk_size))
+        if not chunk:
+            break
+
+        if include_answers:
+            answers = {}
+            rows = Answer.objects.filter(session__in=[session.pk for session in chunk]).exclude(chosen_choice=None)
+            for session_id, question_id, choice_id in rows.values_list('session_id', 'question_id', 'chosen_choice_id'):
+                answers.setdefault(session_id, {})[question_id] = choice_id
+
+        for session in chunk:
+            row = [
+                session.examinee.username,
+                session.examinee.email,
+                _format_datetime(session.started_at),
+                _format_datetime(session.completed_at),
+                round(session.score, 2),
+                session.total_correct,
+                session.total_questions,
+            ]
+            if include_answers:
+                session_answers = answers.get(session.pk, {})
+                row += [
+                    _choice_letter(exam, session.pk, question, session_answers.get(question['id']))
+                    for question in paper
+                ]
+            yield row
+
+
+def iter_csv(rows):
+    """Encode rows as CSV lines one at a time."""
+    writer = csv.writer(Echo())
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def write_xlsx(rows, fileobj):
+    """Write rows to ``fileobj`` as an XLSX workbook using openpyxl's write-only mode."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet('Results')
+    for row in rows:
+        sheet.append(row)
+    workbook.save(fileobj)
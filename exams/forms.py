@@ -1,18 +1,25 @@
 from django import forms
 from django.db import transaction
-from .models import Exam, Question, Choice
+from .duplicates import fingerprint_questions
+from .models import Exam, Question, Choice, QuestionBank, SamplingRule
 
 
 class ExamForm(forms.ModelForm):
     class Meta:
         model = Exam
-        fields = ['title', 'description', 'duration_minutes', 'start_time', 'end_time']
+        fields = ['title', 'description', 'duration_minutes', 'start_time', 'end_time', 'shuffle_questions', 'shuffle_choices']
         widgets = {
             'title': forms.TextInput(attrs={'class': 'form-control'}),
             'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 3}),
             'duration_minutes': forms.NumberInput(attrs={'class': 'form-control'}),
             'start_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
             'end_time': forms.DateTimeInput(attrs={'class': 'form-control', 'type': 'datetime-local'}),
+            'shuffle_questions': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+            'shuffle_choices': forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        }
+        help_texts = {
+            'shuffle_questions': 'Each examinee gets the questions in a different order.',
+            'shuffle_choices': "Each examinee gets every question's options in a different order.",
         }
 
 
@@ -24,6 +31,55 @@ class QuestionUploadForm(forms.Form):
     )
 
 
+class BankUploadForm(QuestionUploadForm):
+    csv_file = forms.FileField(
+        label='CSV File',
+        help_text=(
+            'Upload a CSV file with columns: question, option_1 ... option_5, correct_answer, '
+            'and optionally difficulty (easy, medium or hard) and tags (separated by ;)'
+        ),
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv'})
+    )
+
+
+class QuestionBankForm(forms.ModelForm):
+    class Meta:
+        model = QuestionBank
+        fields = ['name', 'description']
+        widgets = {
+            'name': forms.TextInput(attrs={'class': 'form-control'}),
+            'description': forms.Textarea(attrs={'class': 'form-control', 'rows': 2}),
+        }
+
+
+class SamplingRuleForm(forms.ModelForm):
+    class Meta:
+        model = SamplingRule
+        fields = ['bank', 'tag', 'difficulty', 'count']
+        widgets = {
+            'bank': forms.Select(attrs={'class': 'form-select'}),
+            'tag': forms.Select(attrs={'class': 'form-select'}),
+            'difficulty': forms.Select(attrs={'class': 'form-select'}),
+            'count': forms.NumberInput(attrs={'class': 'form-control', 'min': 1}),
+        }
+        labels = {
+            'count': 'Questions',
+        }
+
+    def __init__(self, *args, banks=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if banks is not None:
+            self.fields['bank'].queryset = banks
+        self.fields['tag'].empty_label = 'Any tag'
+        self.fields['difficulty'].choices = [('', 'Any difficulty')] + Question.DIFFICULTY_CHOICES
+
+    def clean_count(self):
+        count = self.cleaned_data['count']
+        if count < 1:
+            raise forms.ValidationError('Draw at least one question.')
+        return count
+
+
 class QuestionEditForm(forms.ModelForm):
     class Meta:
         model = Question
@@ -163,5 +219,10 @@ class QuestionWithChoicesForm(forms.Form):
                         text=choice_text,
                         is_correct=self.cleaned_data.get(f'choice_{i}_correct', False)
                     )
+            
+            fingerprint_questions([self.question], replace=True)
+            # Bank questions have no exam paper of their own to invalidate
+            if self.question.exam_id:
+                self.question.exam.bump_version()
         
         return self.question
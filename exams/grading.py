@@ -0,0 +1,104 @@
+"""
+Set-based grading for exam submissions.
+
+The answer key for an exam is loaded once, the whole submission is checked in
+memory and every ``Answer`` row is written with a single bulk upsert, so the
+cost of a submit no longer grows with the number of questions.
+"""
+from django.db import transaction
+from django.utils import timezone
+
+from .sampling import get_session_answer_key
+from .models import Answer, ExamSession
+from .stats import record_score, update_user_summaries
+
+
+def grade_answers(answer_key, answers):
+    """
+    Check submitted ``{question_id: choice_id}`` pairs against an answer key.
+
+    Ids may arrive as strings (they come from JSON). Pairs that do not belong
+    to the exam are skipped. Returns ``{question_id: (choice_id, is_correct)}``.
+    """
+    graded = {}
+    for question_id, choice_id in answers.items():
+        try:
+            question_id = int(question_id)
+            choice_id = int(choice_id)
+        except (TypeError, ValueError):
+            continue
+        choices = answer_key.get(question_id)
+        if choices is None or choice_id not in choices:
+            continue
+        graded[question_id] = (choice_id, choices[choice_id])
+    return graded
+
+
+def score_graded(graded):
+    """Return ``(total_questions, total_correct, score)`` for graded answers."""
+    total_questions = len(graded)
+    total_correct = sum(1 for _, is_correct in graded.values() if is_correct)
+    score = (total_correct / total_questions * 100) if total_questions > 0 else 0
+    return total_questions, total_correct, score
+
+
+def answer_rows(session_id, graded):
+    """Build unsaved ``Answer`` rows for one session's graded answers."""
+    return [
+        Answer(session_id=session_id, question_id=question_id, chosen_choice_id=choice_id, is_correct=is_correct)
+        for question_id, (choice_id, is_correct) in graded.items()
+    ]
+
+
+def upsert_answers(rows, batch_size=None):
+    """Insert or update ``Answer`` rows with one bulk statement per batch."""
+    if not rows:
+        return
+    Answer.objects.bulk_create(
+        rows,
+        batch_size=batch_size,
+        update_conflicts=True,
+        unique_fields=['session', 'question'],
+        update_fields=['chosen_choice', 'is_correct', 'answered_at'],
+    )
+
+
+def save_answers(session, graded):
+    """Upsert the graded answers of a session with one bulk statement."""
+    upsert_answers(answer_rows(session.pk, graded))
+
+
+def submit_session(session, answers, answer_key=None):
+    """
+    Grade and finalize a session.
+
+    The session row is claimed with a conditional UPDATE so a double submit
+    cannot grade twice. Returns ``False`` if the session was already submitted.
+    """
+    if answer_key is None:
+        answer_key = get_session_answer_key(session.exam, session.pk)
+
+    graded = grade_answers(answer_key, answers)
+    total_questions, total_correct, score = score_graded(graded)
+    completed_at = timezone.now()
+
+    with transaction.atomic():
+        claimed = ExamSession.objects.filter(pk=session.pk, is_submitted=False).update(
+            is_submitted=True,
+            completed_at=completed_at,
+            total_questions=total_questions,
+            total_correct=total_correct,
+            score=score,
+        )
+        if not claimed:
+            return False
+        save_answers(session, graded)
+        transaction.on_commit(lambda: record_score(session.exam_id, score))
+        update_user_summaries([session.examinee_id], score=score)
+
+    session.is_submitted = True
+    session.completed_at = completed_at
+    session.total_questions = total_questions
+    session.total_correct = total_correct
+    session.score = score
+    return True
@@ -0,0 +1,113 @@
+"""
+Streaming CSV question import.
+
+The upload is decoded line by line as Django reads it in chunks, and
+questions, choices and tags are written in batches with ``bulk_create``, so
+memory stays bounded and a large bank costs a few hundred INSERTs instead of
+one per question and choice. Each batch is fingerprinted for duplicate
+detection (see ``exams.duplicates``) as it is written.
+"""
+import codecs
+import csv
+from itertools import islice
+
+from django.conf import settings
+
+from .duplicates import fingerprint_questions
+from .models import Choice, Question, Tag
+
+IMPORT_BATCH_SIZE = getattr(settings, 'QUESTION_IMPORT_BATCH_SIZE', 500)
+MAX_CHOICES = 5
+
+
+def iter_csv_rows(csv_file, encoding='utf-8-sig'):
+    """Decode an uploaded CSV file incrementally and yield its rows as dicts."""
+    return csv.DictReader(codecs.iterdecode(csv_file, encoding))
+
+
+def build_choices(question, row):
+    """Return the unsaved choices described by the ``option_N`` columns of a row."""
+    correct_answer = (row.get('correct_answer') or '').strip()
+    choices = []
+    for i in range(1, MAX_CHOICES + 1):  # 5 choices (A, B, C, D, E)
+        choice_text = row.get(f'option_{i}') or ''
+        if choice_text:
+            choices.append(Choice(question=question, text=choice_text, is_correct=correct_answer == str(i)))
+    return choices
+
+
+def parse_difficulty(value):
+    """Map a ``difficulty`` cell (easy/medium/hard or 1-3) to ``Question.difficulty``; blank is medium."""
+    value = (value or '').strip().lower()
+    if not value:
+        return Question.MEDIUM
+    for difficulty, label in Question.DIFFICULTY_CHOICES:
+        if value in (label.lower(), str(difficulty)):
+            return difficulty
+    raise ValueError(f'Unknown difficulty "{value}"; use easy, medium or hard.')
+
+
+def parse_tags(value):
+    """Split a ``tags`` cell on ``;`` (or ``,``) into normalized tag names."""
+    names = (value or '').replace(',', ';').split(';')
+    return sorted({name.strip().lower()[:50] for name in names if name.strip()})
+
+
+def _import_rows(rows, batch_size, new_question, tagged=False):
+    rows = iter(rows)
+    created = 0
+    tag_ids = {}
+    while True:
+        batch = list(islice(rows, batch_size))
+        if not batch:
+            break
+
+        questions = [new_question(row, created + i) for i, row in enumerate(batch)]
+        Question.objects.bulk_create(questions)
+        fingerprint_questions(questions)
+
+        choices = []
+        for question, row in zip(questions, batch):
+            choices.extend(build_choices(question, row))
+        Choice.objects.bulk_create(choices)
+
+        if tagged:
+            row_tags = [parse_tags(row.get('tags')) for row in batch]
+            new_names = {name for names in row_tags for name in names} - tag_ids.keys()
+            if new_names:
+                Tag.objects.bulk_create([Tag(name=name) for name in new_names], ignore_conflicts=True)
+                tag_ids.update(Tag.objects.filter(name__in=new_names).values_list('name', 'id'))
+            QuestionTag = Question.tags.through
+            QuestionTag.objects.bulk_create([
+                QuestionTag(question_id=question.id, tag_id=tag_ids[name])
+                for question, names in zip(questions, row_tags)
+                for name in names
+            ])
+
+        created += len(batch)
+    return created
+
+
+def import_questions(exam, rows, batch_size=IMPORT_BATCH_SIZE, start_order=1):
+    """
+    Create questions and choices for ``exam`` from an iterable of CSV rows.
+
+    Rows are consumed ``batch_size`` at a time. Returns the number of
+    questions created. The caller owns the transaction.
+    """
+    return _import_rows(
+        rows, batch_size, lambda row, i: Question(exam=exam, text=row['question'], order=start_order + i)
+    )
+
+
+def import_bank_questions(bank, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Create questions and choices in a question bank from CSV rows, with the
+    optional ``difficulty`` and ``tags`` columns. Tags are created as needed.
+
+    Returns the number of questions created. The caller owns the transaction.
+    """
+    def new_question(row, i):
+        return Question(bank=bank, text=row['question'], difficulty=parse_difficulty(row.get('difficulty')))
+
+    return _import_rows(rows, batch_size, new_question, tagged=True)
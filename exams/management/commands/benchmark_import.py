@@ -0,0 +1,57 @@
+import csv
+import io
+import tempfile
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.files import File
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from exams.importer import IMPORT_BATCH_SIZE, import_questions, iter_csv_rows
+from exams.models import Exam
+
+
+class Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the streaming CSV question importer (rows/sec). Nothing is kept in the database."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--batch-size', type=int, default=IMPORT_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'seconds':>10} {'rows/sec':>12}")
+        for rows in options['rows']:
+            with tempfile.TemporaryFile() as tmp:
+                self.write_csv(tmp, rows)
+                tmp.seek(0)
+                elapsed = self.run_import(File(tmp), options['batch_size'])
+            self.stdout.write(f"{rows:>10} {elapsed:>10.2f} {rows / elapsed:>12.0f}")
+
+    def write_csv(self, tmp, rows):
+        text = io.TextIOWrapper(tmp, encoding='utf-8', newline='')
+        writer = csv.writer(text)
+        writer.writerow(['question', 'option_1', 'option_2', 'option_3', 'option_4', 'option_5', 'correct_answer'])
+        for i in range(rows):
+            writer.writerow([f'Benchmark question {i}?', 'Alpha', 'Beta', 'Gamma', 'Delta', 'Epsilon', i % 5 + 1])
+        text.detach()
+
+    def run_import(self, csv_file, batch_size):
+        User = get_user_model()
+        try:
+            with transaction.atomic():
+                examiner = User.objects.create(
+                    username='benchmark-import', email='benchmark-import@example.com', role=User.Role.EXAMINER
+                )
+                exam = Exam.objects.create(title='Import benchmark', examiner=examiner)
+                started = time.perf_counter()
+                import_questions(exam, iter_csv_rows(csv_file), batch_size=batch_size)
+                elapsed = time.perf_counter() - started
+                raise Rollback
+        except Rollback:
+            pass
+        return elapsed
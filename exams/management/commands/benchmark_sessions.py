@@ -0,0 +1,150 @@
+import json
+import uuid
+from collections import Counter
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from exams.models import Choice, Exam, Question
+
+ENGINES = [
+    'django.contrib.sessions.backends.db',
+    'django.contrib.sessions.backends.cached_db',
+    'config.sessions',
+]
+VERBS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE')
+
+
+class SessionQueries:
+    """``execute_wrapper`` hook counting statements on the session table, by verb."""
+
+    def __init__(self):
+        self.table = Session._meta.db_table
+        self.counts = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        if self.table in sql:
+            self.counts[sql.lstrip().split(None, 1)[0].upper()] += 1
+        return execute(sql, params, many, context)
+
+
+class Command(BaseCommand):
+    help = (
+        "Count session-table queries per examinee request (login, join, take, autosave/heartbeat, submit, "
+        "result, logout) for each session engine. Seeded users and exams are removed afterwards."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--examinees', type=int, default=20)
+        parser.add_argument('--questions', type=int, default=20)
+        parser.add_argument('--autosaves', type=int, default=5, help='Autosave requests per examinee.')
+        parser.add_argument('--engines', nargs='+', default=ENGINES, help='SESSION_ENGINE values to compare.')
+
+    def handle(self, *args, **options):
+        if options['examinees'] < 1:
+            raise CommandError('--examinees must be positive.')
+
+        run_id = uuid.uuid4().hex[:8]
+        User = get_user_model()
+        examiner = User.objects.create(
+            username=f'benchmark-sessions-{run_id}-examiner',
+            email=f'benchmark-sessions-{run_id}-examiner@example.com',
+            role=User.Role.EXAMINER,
+        )
+        User.objects.bulk_create([
+            User(
+                username=f'benchmark-sessions-{run_id}-{i}', email=f'benchmark-sessions-{run_id}-{i}@example.com',
+                password='!', role=User.Role.EXAMINEE,
+            )
+            for i in range(options['examinees'])
+        ])
+        examinees = list(User.objects.filter(username__startswith=f'benchmark-sessions-{run_id}-').exclude(pk=examiner.pk))
+        host = next((host for host in settings.ALLOWED_HOSTS if host != '*' and not host.startswith('.')), 'localhost')
+
+        self.stdout.write(
+            f"{'engine':<45} {'requests':>8} " + ' '.join(f'{verb:>7}' for verb in VERBS) + f" {'per request':>12}"
+        )
+        try:
+            for engine in options['engines']:
+                requests, counts = self.run_engine(engine, examiner, examinees, host, options)
+                total = sum(counts.values())
+                self.stdout.write(
+                    f"{engine:<45} {requests:>8} " + ' '.join(f'{counts[verb]:>7}' for verb in VERBS)
+                    + f" {total / requests:>12.2f}"
+                )
+        finally:
+            User.objects.filter(username__startswith=f'benchmark-sessions-{run_id}-').delete()
+
+    def run_engine(self, engine, examiner, examinees, host, options):
+        exam = self.create_exam(examiner, options['questions'])
+        pending = Exam.objects.create(
+            title='Session benchmark (pending)', examiner=examiner, is_published=True,
+            start_time=timezone.now() + timezone.timedelta(days=1),
+        )
+        paper = [
+            [choice.id for choice in question.choices.all()]
+            for question in exam.questions.order_by('order').prefetch_related('choices')
+        ]
+        requests = 0
+        queries = SessionQueries()
+        try:
+            with override_settings(SESSION_ENGINE=engine), connection.execute_wrapper(queries):
+                for examinee in examinees:
+                    client = Client(HTTP_HOST=host)
+                    client.force_login(examinee)
+                    for method, path, data in self.flow(exam, pending, paper, options['autosaves']):
+                        response = getattr(client, method)(path, data)
+                        if response.status_code >= 400:
+                            raise CommandError(f'{method.upper()} {path} returned {response.status_code} ({engine})')
+                        requests += 1
+        finally:
+            exam.delete()
+            pending.delete()
+        return requests, queries.counts
+
+    def create_exam(self, examiner, num_questions):
+        exam = Exam.objects.create(
+            title='Session benchmark', examiner=examiner, num_questions=num_questions,
+            duration_minutes=0, is_published=True, results_published=True,
+        )
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f'Session benchmark question {order}?', order=order)
+            for order in range(1, num_questions + 1)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=f'Option {c + 1}', is_correct=c == 0)
+            for question in questions
+            for c in range(4)
+        ])
+        return exam
+
+    def flow(self, exam, pending, paper, autosaves):
+        """``(method, path, data)`` for one examinee visit, in order."""
+        code = exam.code
+        yield 'get', '/join-exam/', None
+        # A scheduled exam parks its details in the session until it opens.
+        yield 'post', '/join-exam/', {'exam_code': pending.code}
+        yield 'get', f'/pending/{pending.code}/', None
+        yield 'post', '/join-exam/', {'exam_code': pending.code}
+        yield 'post', '/join-exam/', {'exam_code': code}
+        yield 'get', f'/exam/{code}/', None
+        yield 'post', f'/exam/{code}/start/', {}
+
+        question_ids = list(exam.questions.order_by('order').values_list('id', flat=True))
+        answers = {str(qid): str(choices[0]) for qid, choices in zip(question_ids, paper)}
+        keys = list(answers)
+        chunk = max(1, -(-len(keys) // max(autosaves, 1)))
+        for start in range(0, len(keys) if autosaves else 0, chunk):
+            delta = {qid: answers[qid] for qid in keys[start:start + chunk]}
+            yield 'post', f'/exam/{code}/autosave/', {'answers': json.dumps(delta)}
+            yield 'get', f'/exam/{code}/heartbeat/', None
+
+        yield 'post', f'/exam/{code}/submit/', {'answers': json.dumps(answers)}
+        yield 'get', f'/exam/{code}/result/', None
+        yield 'get', '/accounts/logout/', None
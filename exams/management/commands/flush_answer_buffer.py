@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from exams.answer_buffer import FLUSH_BATCH_SIZE, FLUSH_INTERVAL, flush, run_flusher
+
+
+class Command(BaseCommand):
+    help = "Upsert buffered autosaved answers into the Answer table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep flushing every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=FLUSH_INTERVAL)
+        parser.add_argument('--batch-size', type=int, default=FLUSH_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self.stdout.write(f"Flushing the answer buffer every {options['interval']}s (Ctrl+C to stop)")
+            run_flusher(interval=options['interval'])
+            return
+        written = flush(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Flushed {written} answers."))
@@ -0,0 +1,359 @@
+import json
+import random
+import re
+import socket
+import threading
+import time
+import uuid
+from http.cookies import SimpleCookie
+from importlib import import_module
+from queue import Empty, Queue
+from urllib.error import HTTPError, URLError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPErrorProcessor, Request, build_opener
+
+from django.conf import settings
+from django.contrib.auth import BACKEND_SESSION_KEY, HASH_SESSION_KEY, SESSION_KEY, get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.core.asgi import get_asgi_application
+from django.core.servers.basehttp import ThreadedWSGIServer, WSGIRequestHandler, get_internal_wsgi_application
+from django.db import connection
+from django.utils import timezone
+
+from exams.models import Choice, Exam, Question
+
+# Set by config.metrics.MetricsMiddleware, so remote servers report their queries too.
+SERVER_TIMING_QUERIES = re.compile(r'desc="(\d+) queries"')
+
+
+class QuietRequestHandler(WSGIRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+def start_wsgi_server():
+    server = ThreadedWSGIServer(('127.0.0.1', 0), QuietRequestHandler)
+    server.set_app(get_internal_wsgi_application())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    def stop():
+        server.shutdown()
+        server.server_close()
+    return f'http://127.0.0.1:{server.server_address[1]}', stop
+
+
+def start_asgi_server():
+    try:
+        import uvicorn
+    except ImportError:
+        raise CommandError('--server asgi needs uvicorn (pip install uvicorn).')
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    server = uvicorn.Server(uvicorn.Config(
+        get_asgi_application(), log_level='warning', access_log=False, lifespan='off', backlog=4096,
+    ))
+    thread = threading.Thread(target=server.run, kwargs={'sockets': [sock]}, daemon=True)
+    thread.start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+        thread.join()
+        sock.close()
+    return f'http://127.0.0.1:{sock.getsockname()[1]}', stop
+
+
+class NoRedirects(HTTPErrorProcessor):
+    """Return 3xx responses as-is so each endpoint of the flow is timed on its own."""
+
+    def http_response(self, request, response):
+        if 300 <= response.status < 400:
+            return response
+        return super().http_response(request, response)
+
+    https_response = http_response
+
+
+def percentile(values, pct):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+class Examinee:
+    """
+    One simulated browser: a cookie jar and the flow join -> take -> paper ->
+    autosave/heartbeat -> paper revalidation -> submit -> result.
+    """
+
+    def __init__(self, base_url, session_key, exam, paper, autosaves, think_time, record):
+        self.base_url = base_url
+        self.cookies = {settings.SESSION_COOKIE_NAME: session_key}
+        self.exam = exam
+        self.paper = paper
+        self.autosaves = autosaves
+        self.think_time = think_time
+        self.record = record
+        self.opener = build_opener(NoRedirects())
+
+    def request(self, endpoint, path, data=None, headers=None, expect=None):
+        """Send one request and record it; a status other than ``expect`` (when given) is an error."""
+        headers = {'Cookie': '; '.join(f'{name}={value}' for name, value in self.cookies.items()), **(headers or {})}
+        body = None
+        if data is not None:
+            body = urlencode(data).encode()
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+            headers['X-CSRFToken'] = self.cookies.get(settings.CSRF_COOKIE_NAME, '')
+            headers['Referer'] = self.base_url
+        started = time.perf_counter()
+        try:
+            response = self.opener.open(Request(urljoin(self.base_url, path), data=body, headers=headers), timeout=60)
+            status, content = response.status, response.read()
+        except HTTPError as error:
+            response, status, content = error, error.code, error.read()
+        except URLError as error:
+            self.record(endpoint, time.perf_counter() - started, None, None, str(error.reason))
+            return None, b'', {}
+        elapsed = time.perf_counter() - started
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            for name, morsel in SimpleCookie(header).items():
+                self.cookies[name] = morsel.value
+        queries = SERVER_TIMING_QUERIES.search(response.headers.get('Server-Timing', ''))
+        error = None if status < 400 else f'HTTP {status}'
+        if error is None and expect is not None and status != expect:
+            error = f'HTTP {status}, expected {expect}'
+        if error is None and data is not None and response.headers.get_content_type() == 'application/json':
+            result = json.loads(content)
+            if not result.get('success', True):
+                error = result.get('error', 'failed')
+        self.record(endpoint, elapsed, status, int(queries.group(1)) if queries else None, error)
+        return status, content, response.headers
+
+    def think(self):
+        # Examinees spend most of an exam reading: idle connections, not requests.
+        if self.think_time:
+            time.sleep(random.uniform(0.5, 1.5) * self.think_time)
+
+    def run(self):
+        code = self.exam.code
+        self.request('join_exam_page', '/join-exam/')
+        self.request('join_exam', '/join-exam/', {'exam_code': code})
+        self.request('take_exam', f'/exam/{code}/')
+        self.request('start_exam', f'/exam/{code}/start/')
+        # The page fetches the paper as JSON, versioned like take_exam's paper_url
+        paper_path = f'/exam/{code}/paper/?v={self.exam.version}'
+        _, _, paper_headers = self.request('exam_paper', paper_path)
+        etag = paper_headers.get('ETag')
+
+        answers = {question['id']: random.choice(question['choices']) for question in self.paper}
+        question_ids = list(answers)
+        chunk = max(1, -(-len(question_ids) // max(self.autosaves, 1)))
+        for start in range(0, len(question_ids) if self.autosaves else 0, chunk):
+            self.think()
+            delta = {str(qid): str(answers[qid]) for qid in question_ids[start:start + chunk]}
+            self.request('autosave_answers', f'/exam/{code}/autosave/', {'answers': json.dumps(delta)})
+            self.request('exam_heartbeat', f'/exam/{code}/heartbeat/')
+
+        if etag:
+            # A reload mid-exam: the browser revalidates its copy and gets a 304
+            self.request('exam_paper_304', paper_path, headers={'If-None-Match': etag}, expect=304)
+
+        self.think()
+        self.request('submit_exam', f'/exam/{code}/submit/', {
+            'answers': json.dumps({str(qid): str(cid) for qid, cid in answers.items()}),
+        })
+        self.request('view_result', f'/exam/{code}/result/')
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the examinee flow (join -> take -> paper -> autosave/heartbeat -> submit -> result) with simulated "
+        "examinees and write per-endpoint throughput, latency percentiles and SQL queries per request as JSON."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--examinees', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50, help='Simulated examinees in flight at once.')
+        parser.add_argument('--questions', type=int, default=50)
+        parser.add_argument('--autosaves', type=int, default=5, help='Autosave requests per examinee.')
+        parser.add_argument(
+            '--think-time', type=float, default=0,
+            help='Mean seconds an examinee idles before each autosave and the submit.',
+        )
+        parser.add_argument(
+            '--url', help='Base URL of a running server sharing this database. '
+                          'By default an in-process server is started.',
+        )
+        parser.add_argument(
+            '--server', choices=['wsgi', 'asgi'], default='wsgi',
+            help='In-process server: threaded WSGI, or uvicorn serving the async views.',
+        )
+        parser.add_argument('--output', help='JSON report path (default: loadtest-<timestamp>.json).')
+        parser.add_argument('--keep', action='store_true', help='Keep the seeded users and exam.')
+
+    def handle(self, *args, **options):
+        if options['examinees'] < 1 or options['concurrency'] < 1:
+            raise CommandError('--examinees and --concurrency must be positive.')
+
+        run_id = uuid.uuid4().hex[:8]
+        self.stdout.write(f"Seeding {options['examinees']} examinees and a {options['questions']}-question exam...")
+        exam, examinees = self.seed(run_id, options['examinees'], options['questions'])
+        stop_server = None
+        try:
+            base_url = options['url']
+            if not base_url:
+                start_server = start_asgi_server if options['server'] == 'asgi' else start_wsgi_server
+                base_url, stop_server = start_server()
+            self.stdout.write(f"Running against {base_url} with concurrency {options['concurrency']}...")
+            report = self.run_load(base_url, exam, examinees, options)
+        finally:
+            if stop_server:
+                stop_server()
+            if not options['keep']:
+                self.cleanup(run_id, exam)
+
+        output = options['output'] or f"loadtest-{timezone.now():%Y%m%d-%H%M%S}.json"
+        with open(output, 'w') as f:
+            json.dump(report, f, indent=2)
+        self.print_report(report)
+        self.stdout.write(self.style.SUCCESS(f"Report written to {output}"))
+
+    def seed(self, run_id, count, num_questions):
+        User = get_user_model()
+        examiner = User.objects.create(
+            username=f'loadtest-{run_id}-examiner', email=f'loadtest-{run_id}-examiner@example.com',
+            role=User.Role.EXAMINER,
+        )
+        exam = Exam.objects.create(
+            title=f'Load test {run_id}', examiner=examiner, num_questions=num_questions,
+            duration_minutes=0, is_published=True, results_published=True,
+        )
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f'Load test question {order}?', order=order)
+            for order in range(1, num_questions + 1)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=f'Option {c + 1}', is_correct=c == 0)
+            for question in questions
+            for c in range(4)
+        ])
+
+        User.objects.bulk_create([
+            User(
+                username=f'loadtest-{run_id}-{i}', email=f'loadtest-{run_id}-{i}@example.com',
+                password='!', role=User.Role.EXAMINEE,
+            )
+            for i in range(count)
+        ], batch_size=1000)
+        users = User.objects.filter(username__startswith=f'loadtest-{run_id}-').exclude(pk=examiner.pk)
+        # Log everyone in up front, the way Client.force_login does, so hashing is not measured.
+        engine = import_module(settings.SESSION_ENGINE)
+        backend = settings.AUTHENTICATION_BACKENDS[0]
+        session_keys = []
+        for user in users.iterator():
+            session = engine.SessionStore()
+            session[SESSION_KEY] = user._meta.pk.value_to_string(user)
+            session[BACKEND_SESSION_KEY] = backend
+            session[HASH_SESSION_KEY] = user.get_session_auth_hash()
+            session.save()
+            session_keys.append(session.session_key)
+        return exam, session_keys
+
+    def cleanup(self, run_id, exam):
+        User = get_user_model()
+        exam.delete()
+        User.objects.filter(username__startswith=f'loadtest-{run_id}-').delete()
+
+    def run_load(self, base_url, exam, session_keys, options):
+        paper = [
+            {'id': question.id, 'choices': [choice.id for choice in question.choices.all()]}
+            for question in exam.questions.order_by('order').prefetch_related('choices')
+        ]
+        samples = {}
+        lock = threading.Lock()
+
+        def record(endpoint, elapsed, status, queries, error):
+            with lock:
+                samples.setdefault(endpoint, []).append((elapsed, status, queries, error))
+
+        pending = Queue()
+        for session_key in session_keys:
+            pending.put(session_key)
+
+        def worker():
+            while True:
+                try:
+                    session_key = pending.get_nowait()
+                except Empty:
+                    return
+                Examinee(
+                    base_url, session_key, exam, paper, options['autosaves'], options['think_time'], record,
+                ).run()
+
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker) for _ in range(options['concurrency'])]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        duration = time.perf_counter() - started
+
+        endpoints = {}
+        for endpoint, rows in samples.items():
+            latencies = [elapsed * 1000 for elapsed, _, _, _ in rows]
+            queries = [count for _, _, count, _ in rows if count is not None]
+            errors = [error for _, _, _, error in rows if error]
+            endpoints[endpoint] = {
+                'requests': len(rows),
+                'errors': len(errors),
+                'error_samples': sorted(set(errors))[:5],
+                'throughput_rps': len(rows) / duration,
+                'latency_ms': {
+                    'mean': sum(latencies) / len(latencies),
+                    'p50': percentile(latencies, 50),
+                    'p95': percentile(latencies, 95),
+                    'p99': percentile(latencies, 99),
+                    'max': max(latencies),
+                },
+                'queries_per_request': sum(queries) / len(queries) if queries else None,
+            }
+        total = sum(len(rows) for rows in samples.values())
+        return {
+            'timestamp': timezone.now().isoformat(),
+            'target': options['url'] or f"in-process {options['server']}",
+            'database': connection.vendor,
+            'config': {
+                'examinees': len(session_keys),
+                'concurrency': options['concurrency'],
+                'questions': options['questions'],
+                'autosaves': options['autosaves'],
+                'think_time': options['think_time'],
+            },
+            'duration_seconds': duration,
+            'requests': total,
+            'throughput_rps': total / duration,
+            'examinees_per_second': len(session_keys) / duration,
+            'endpoints': endpoints,
+        }
+
+    def print_report(self, report):
+        self.stdout.write(
+            f"\n{report['requests']} requests in {report['duration_seconds']:.1f}s "
+            f"({report['throughput_rps']:.0f} req/s, {report['examinees_per_second']:.1f} examinees/s)\n"
+        )
+        self.stdout.write(
+            f"{'endpoint':<18} {'reqs':>7} {'errors':>7} {'req/s':>8} {'p50 ms':>8} "
+            f"{'p95 ms':>8} {'p99 ms':>8} {'queries':>8}"
+        )
+        for endpoint, stats in report['endpoints'].items():
+            latency = stats['latency_ms']
+            queries = stats['queries_per_request']
+            self.stdout.write(
+                f"{endpoint:<18} {stats['requests']:>7} {stats['errors']:>7} {stats['throughput_rps']:>8.1f} "
+                f"{latency['p50']:>8.1f} {latency['p95']:>8.1f} {latency['p99']:>8.1f} "
+                f"{'-' if queries is None else f'{queries:.1f}':>8}"
+            )
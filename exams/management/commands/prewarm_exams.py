@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from exams.prewarm import PREWARM_INTERVAL, PREWARM_MINUTES, prewarm, run_prewarmer
+
+
+class Command(BaseCommand):
+    help = "Warm the caches and pre-create sessions for exams starting within the next --minutes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--minutes', type=int, default=PREWARM_MINUTES)
+        parser.add_argument('--loop', action='store_true', help='Keep pre-warming every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=PREWARM_INTERVAL)
+
+    def handle(self, *args, **options):
+        if options['loop']:
+            self.stdout.write(
+                f"Pre-warming exams starting within {options['minutes']} minutes "
+                f"every {options['interval']}s (Ctrl+C to stop)"
+            )
+            run_prewarmer(interval=options['interval'], minutes=options['minutes'])
+            return
+        warmed, provisioned = prewarm(options['minutes'])
+        self.stdout.write(self.style.SUCCESS(f"Warmed {warmed} exams and provisioned {provisioned} sessions."))
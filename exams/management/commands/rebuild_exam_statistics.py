@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from exams.models import Exam
+from exams.stats import rebuild_exam_statistics
+
+
+class Command(BaseCommand):
+    help = "Recompute per-exam session counts and score statistics from sessions (repairs drift)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('exam_ids', nargs='*', type=int, help='Exams to rebuild (default: all).')
+
+    def handle(self, *args, **options):
+        exams = Exam.objects.all().order_by('id')
+        if options['exam_ids']:
+            exams = exams.filter(id__in=options['exam_ids'])
+        for exam in exams.iterator():
+            stats = rebuild_exam_statistics(exam)
+            self.stdout.write(f"{exam}: {stats.session_count} sessions, {stats.count} submissions, mean {stats.mean:.1f}")
+        self.stdout.write(self.style.SUCCESS("Exam statistics rebuilt."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from exams.duplicates import CHECK_BATCH_SIZE, rebuild
+
+
+class Command(BaseCommand):
+    help = "Fingerprint questions for duplicate detection: those missing one (default) or all of them."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Drop and recompute every fingerprint.')
+        parser.add_argument('--batch-size', type=int, default=CHECK_BATCH_SIZE,
+                            help='Questions fingerprinted per transaction.')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def progress(done):
+            if verbosity > 1:
+                self.stdout.write(f"Fingerprinted {done} questions")
+
+        done = rebuild(batch_size=options['batch_size'], missing_only=not options['all'], progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Fingerprinted {done} questions."))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from exams.search import REBUILD_BATCH_SIZE, get_backend, rebuild
+
+
+class Command(BaseCommand):
+    help = "Rebuild the question full-text search index in batches (and create it if missing)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_BATCH_SIZE,
+                            help='Questions indexed per transaction.')
+
+    def handle(self, *args, **options):
+        verbosity = options['verbosity']
+
+        def progress(last_id):
+            if verbosity > 1:
+                self.stdout.write(f"Indexed questions up to id {last_id}")
+
+        batches = rebuild(batch_size=options['batch_size'], progress=progress)
+        backend = get_backend().__class__.__name__
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt the search index ({backend}) in {batches} batches."))
@@ -0,0 +1,21 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from exams.stats import rebuild_user_summary
+
+
+class Command(BaseCommand):
+    help = "Recompute per-user dashboard summaries from sessions and exams (repairs drift)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('user_ids', nargs='*', type=int, help='Users to rebuild (default: all).')
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all().order_by('id')
+        if options['user_ids']:
+            users = users.filter(id__in=options['user_ids'])
+        rebuilt = 0
+        for user in users.iterator():
+            rebuild_user_summary(user)
+            rebuilt += 1
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {rebuilt} user summaries."))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from exams.sweeper import SWEEP_BATCH_SIZE, SWEEP_INTERVAL, expired_sessions, run_sweeper, sweep
+
+
+class Command(BaseCommand):
+    help = "Auto-submit and grade exam sessions whose time has run out."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--loop', action='store_true', help='Keep sweeping every --interval seconds.')
+        parser.add_argument('--interval', type=float, default=SWEEP_INTERVAL)
+        parser.add_argument('--batch-size', type=int, default=SWEEP_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired sessions.')
+
+    def handle(self, *args, **options):
+        if options['dry_run']:
+            self.stdout.write(f"{expired_sessions().count()} expired sessions waiting to be submitted.")
+            return
+        if options['loop']:
+            self.stdout.write(f"Sweeping expired sessions every {options['interval']}s (Ctrl+C to stop)")
+            run_sweeper(interval=options['interval'])
+            return
+        submitted = sweep(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Processed {submitted} expired sessions."))
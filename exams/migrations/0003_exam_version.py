@@ -0,0 +1,18 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0002_exam_results_published'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
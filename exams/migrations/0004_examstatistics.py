@@ -0,0 +1,60 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_statistics(apps, schema_editor):
+    """Fold in the scores submitted so far, as the rebuild_exam_statistics command does."""
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    ExamStatistics = apps.get_model('exams', 'ExamStatistics')
+    pass_mark = getattr(settings, 'EXAM_PASS_MARK', 70)
+    bins = 10
+
+    rows = []
+    scores = ExamSession.objects.filter(is_submitted=True).order_by('exam_id').values_list('exam_id', 'score')
+    for exam_id, score in scores.iterator(chunk_size=2000):
+        if not rows or rows[-1].exam_id != exam_id:
+            rows.append(ExamStatistics(exam_id=exam_id, histogram=[0] * bins))
+        # ExamStatistics.add_score (Welford's algorithm); historical models have no methods
+        stats = rows[-1]
+        stats.count += 1
+        delta = score - stats.mean
+        stats.mean += delta / stats.count
+        stats.m2 += delta * (score - stats.mean)
+        stats.min_score = score if stats.min_score is None else min(stats.min_score, score)
+        stats.max_score = score if stats.max_score is None else max(stats.max_score, score)
+        if score >= pass_mark:
+            stats.pass_count += 1
+        stats.histogram[max(min(int(score // (100 / bins)), bins - 1), 0)] += 1
+    ExamStatistics.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0003_exam_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamStatistics',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('mean', models.FloatField(default=0)),
+                ('m2', models.FloatField(default=0)),
+                ('min_score', models.FloatField(blank=True, null=True)),
+                ('max_score', models.FloatField(blank=True, null=True)),
+                ('pass_count', models.PositiveIntegerField(default=0)),
+                ('histogram', models.JSONField(default=list)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('exam', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='statistics', to='exams.exam')),
+            ],
+            options={
+                'verbose_name_plural': 'exam statistics',
+            },
+        ),
+        migrations.RunPython(backfill_statistics, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:39
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0004_examstatistics'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['-created_at', '-id'], name='exam_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['examiner', '-created_at', '-id'], name='exam_examiner_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['exam', '-started_at', '-id'], name='session_exam_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(fields=['examinee', '-started_at', '-id'], name='session_examinee_started_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('is_submitted', True)), fields=['exam', '-completed_at', '-id'], name='session_exam_completed_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('is_submitted', True)), fields=['examinee', '-completed_at', '-id'], name='session_examinee_done_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def dedupe_exam_sessions(apps, schema_editor):
+    """Keep one session per (exam, examinee): the submitted one, else the oldest."""
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    duplicates = (
+        ExamSession.objects.values('exam_id', 'examinee_id')
+        .annotate(sessions=Count('id'))
+        .filter(sessions__gt=1)
+    )
+    for pair in duplicates.iterator():
+        sessions = ExamSession.objects.filter(exam_id=pair['exam_id'], examinee_id=pair['examinee_id'])
+        keep = sessions.order_by('-is_submitted', 'id').values_list('id', flat=True).first()
+        sessions.exclude(id=keep).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0005_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(dedupe_exam_sessions, migrations.RunPython.noop),
+    ]
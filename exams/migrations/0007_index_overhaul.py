@@ -0,0 +1,27 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0006_dedupe_exam_sessions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(fields=['is_published'], name='exam_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['exam', 'order', 'id'], name='question_exam_order_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='examsession',
+            constraint=models.UniqueConstraint(fields=('exam', 'examinee'), name='unique_exam_session'),
+        ),
+    ]
@@ -0,0 +1,36 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:42
+
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def backfill_expires_at(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    for exam_id, duration in Exam.objects.filter(duration_minutes__gt=0).values_list('id', 'duration_minutes').iterator():
+        ExamSession.objects.filter(exam_id=exam_id).update(
+            expires_at=models.F('started_at') + timedelta(minutes=duration)
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0007_index_overhaul'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='examsession',
+            name='expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='examsession',
+            index=models.Index(condition=models.Q(('is_submitted', False)), fields=['expires_at', 'id'], name='session_open_expiry_idx'),
+        ),
+        migrations.RunPython(backfill_expires_at, migrations.RunPython.noop),
+    ]
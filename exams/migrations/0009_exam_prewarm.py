@@ -0,0 +1,46 @@
+# Generated by Django 5.0.6 on 2026-10-17 21:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0008_session_expires_at'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExamRegistration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('registered_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='examsession',
+            name='provisioned',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddIndex(
+            model_name='exam',
+            index=models.Index(condition=models.Q(('is_published', True)), fields=['start_time'], name='exam_scheduled_idx'),
+        ),
+        migrations.AddField(
+            model_name='examregistration',
+            name='exam',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='registrations', to='exams.exam'),
+        ),
+        migrations.AddField(
+            model_name='examregistration',
+            name='examinee',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='exam_registrations', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='examregistration',
+            constraint=models.UniqueConstraint(fields=('exam', 'examinee'), name='unique_exam_registration'),
+        ),
+    ]
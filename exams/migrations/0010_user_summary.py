@@ -0,0 +1,75 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:16
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def backfill_summaries(apps, schema_editor):
+    Exam = apps.get_model('exams', 'Exam')
+    ExamSession = apps.get_model('exams', 'ExamSession')
+    ExamStatistics = apps.get_model('exams', 'ExamStatistics')
+    UserSummary = apps.get_model('exams', 'UserSummary')
+
+    opened = ExamSession.objects.filter(provisioned=False)
+    for row in opened.values('exam_id').annotate(sessions=Count('id')).iterator():
+        ExamStatistics.objects.update_or_create(exam_id=row['exam_id'], defaults={'session_count': row['sessions']})
+
+    summaries = {}
+    for row in opened.values('examinee_id').annotate(
+        taken=Count('id'),
+        completed=Count('id', filter=Q(is_submitted=True)),
+        score_total=Sum('score', filter=Q(is_submitted=True)),
+        last_started=Max('started_at'),
+        last_completed=Max('completed_at'),
+    ).iterator():
+        summaries[row['examinee_id']] = UserSummary(
+            user_id=row['examinee_id'],
+            exams_taken=row['taken'],
+            exams_completed=row['completed'],
+            score_total=row['score_total'] or 0,
+            last_activity_at=max(when for when in (row['last_started'], row['last_completed']) if when),
+        )
+    for row in Exam.objects.values('examiner_id').annotate(
+        created=Count('id'),
+        published=Count('id', filter=Q(is_published=True)),
+        last_created=Max('created_at'),
+    ).iterator():
+        summary = summaries.setdefault(row['examiner_id'], UserSummary(user_id=row['examiner_id']))
+        summary.exams_created = row['created']
+        summary.exams_published = row['published']
+        summary.last_activity_at = max(when for when in (summary.last_activity_at, row['last_created']) if when)
+    UserSummary.objects.bulk_create(summaries.values(), batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0003_user_lower_login_indexes'),
+        ('exams', '0009_exam_prewarm'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('exams_taken', models.PositiveIntegerField(default=0)),
+                ('exams_completed', models.PositiveIntegerField(default=0)),
+                ('score_total', models.FloatField(default=0)),
+                ('exams_created', models.PositiveIntegerField(default=0)),
+                ('exams_published', models.PositiveIntegerField(default=0)),
+                ('last_activity_at', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'user summaries',
+            },
+        ),
+        migrations.AddField(
+            model_name='examstatistics',
+            name='session_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(backfill_summaries, migrations.RunPython.noop),
+    ]
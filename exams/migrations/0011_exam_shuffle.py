@@ -0,0 +1,23 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0010_user_summary'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='shuffle_choices',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='shuffle_questions',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -0,0 +1,85 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:26
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0011_exam_shuffle'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='exam',
+            name='draws_from_bank',
+            field=models.BooleanField(default=False, editable=False),
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='difficulty',
+            field=models.PositiveSmallIntegerField(choices=[(1, 'Easy'), (2, 'Medium'), (3, 'Hard')], default=2),
+        ),
+        migrations.AlterField(
+            model_name='question',
+            name='exam',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='exams.exam'),
+        ),
+        migrations.CreateModel(
+            name='QuestionBank',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('description', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_banks', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='bank',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='questions', to='exams.questionbank'),
+        ),
+        migrations.CreateModel(
+            name='SamplingRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('difficulty', models.PositiveSmallIntegerField(blank=True, choices=[(1, 'Easy'), (2, 'Medium'), (3, 'Hard')], null=True)),
+                ('count', models.PositiveSmallIntegerField()),
+                ('candidate_ids', models.JSONField(default=list, editable=False)),
+                ('bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sampling_rules', to='exams.questionbank')),
+                ('exam', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='sampling_rules', to='exams.exam')),
+                ('tag', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='sampling_rules', to='exams.tag')),
+            ],
+            options={
+                'ordering': ['id'],
+            },
+        ),
+        migrations.AddField(
+            model_name='question',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='questions', to='exams.tag'),
+        ),
+        migrations.AddIndex(
+            model_name='question',
+            index=models.Index(fields=['bank', 'difficulty', 'id'], name='question_bank_difficulty_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='question',
+            constraint=models.CheckConstraint(check=models.Q(('exam__isnull', False), ('bank__isnull', False), _connector='OR'), name='question_exam_or_bank'),
+        ),
+        migrations.AddIndex(
+            model_name='questionbank',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='bank_owner_created_idx'),
+        ),
+    ]
@@ -0,0 +1,26 @@
+from django.db import migrations
+
+
+def install_search(apps, schema_editor):
+    from exams import search
+
+    search.rebuild(connection=schema_editor.connection)
+
+
+def uninstall_search(apps, schema_editor):
+    from exams import search
+
+    search.get_backend(schema_editor.connection).uninstall()
+
+
+class Migration(migrations.Migration):
+    # The index is filled in batches, each committed on its own (see exams/search.py).
+    atomic = False
+
+    dependencies = [
+        ('exams', '0012_question_bank'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search, uninstall_search),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.6 on 2026-10-17 22:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0013_question_search'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='QuestionSignature',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='signature', serialize=False, to='exams.question')),
+                ('text_hash', models.BigIntegerField(db_index=True)),
+                ('minhash', models.BinaryField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='QuestionBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('band_hash', models.BigIntegerField()),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bands', to='exams.question')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['band_hash', 'question'], name='question_band_hash_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:01
+
+from django.db import migrations, models
+
+
+def seed_from_version(apps, schema_editor):
+    # Draws and shuffles were seeded with the version; keep every paper as it is.
+    Exam = apps.get_model('exams', 'Exam')
+    Exam.objects.update(paper_seed=models.F('version'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0014_question_fingerprints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exam',
+            name='paper_seed',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+        migrations.RunPython(seed_from_version, migrations.RunPython.noop),
+    ]
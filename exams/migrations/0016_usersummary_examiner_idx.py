@@ -0,0 +1,19 @@
+# Generated by Django 5.0.6 on 2026-10-17 23:14
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('exams', '0015_exam_paper_seed'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='usersummary',
+            index=models.Index(condition=models.Q(('exams_created__gt', 0)), fields=['exams_created', 'exams_published'], name='summary_examiner_idx'),
+        ),
+    ]
@@ -1,6 +1,7 @@
 from django.db import models
 from django.conf import settings
 from django.utils import timezone
+import math
 import uuid
 
 
@@ -15,21 +16,111 @@ class Exam(models.Model):
     end_time = models.DateTimeField(null=True, blank=True)
     is_published = models.BooleanField(default=False)
     results_published = models.BooleanField(default=False)
+    # Give each session its own order (see exams/shuffle.py)
+    shuffle_questions = models.BooleanField(default=False)
+    shuffle_choices = models.BooleanField(default=False)
+    # Each session's questions are drawn from question banks by the exam's
+    # sampling rules instead of being the exam's own (see exams/sampling.py)
+    draws_from_bank = models.BooleanField(default=False, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
+    # Bumped whenever the questions change; keys the cached paper and answer key.
+    version = models.PositiveIntegerField(default=1, editable=False)
+    # Seeds each session's draw and order. Changed only with the sampling rules,
+    # which are locked once the exam has been taken, so edits never change a
+    # started session's paper.
+    paper_seed = models.PositiveIntegerField(default=1, editable=False)
+
+    class Meta:
+        indexes = [
+            # Keyset pagination of the exam lists (see exams/pagination.py)
+            models.Index(fields=["-created_at", "-id"], name="exam_created_idx"),
+            models.Index(fields=["examiner", "-created_at", "-id"], name="exam_examiner_created_idx"),
+            # Narrow covering index for the dashboard's total/published counts
+            models.Index(fields=["is_published"], name="exam_published_idx"),
+            # Scheduled exams about to start, for the pre-warm job
+            models.Index(fields=["start_time"], condition=models.Q(is_published=True), name="exam_scheduled_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         if not self.code:
             self.code = uuid.uuid4().hex[:8].upper()
         super().save(*args, **kwargs)
 
+    def session_expiry(self, started_at):
+        """When a session started at ``started_at`` runs out of time, or None if untimed."""
+        if not self.duration_minutes:
+            return None
+        return started_at + timezone.timedelta(minutes=self.duration_minutes)
+
+    def update_session_expiry(self):
+        """Re-time the open sessions of this exam after its schedule or duration changed."""
+        provisioned = self.sessions.filter(provisioned=True)
+        if self.start_time:
+            provisioned.update(started_at=self.start_time)
+        else:
+            # No longer scheduled; sessions are created on first visit again.
+            provisioned.delete()
+        open_sessions = self.sessions.filter(is_submitted=False)
+        if self.duration_minutes:
+            open_sessions.update(expires_at=models.F("started_at") + timezone.timedelta(minutes=self.duration_minutes))
+        else:
+            open_sessions.update(expires_at=None)
+
+    def bump_version(self):
+        """Invalidate the cached paper and answer key of this exam."""
+        Exam.objects.filter(pk=self.pk).update(version=models.F("version") + 1)
+        self.refresh_from_db(fields=["version"])
+
     def __str__(self) -> str:
         return f"{self.title} ({self.code})"
 
 
+class QuestionBank(models.Model):
+    """A pool of tagged questions that exams draw their papers from."""
+    name = models.CharField(max_length=255)
+    description = models.TextField(blank=True)
+    owner = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="question_banks")
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["owner", "-created_at", "-id"], name="bank_owner_created_idx"),
+        ]
+
+    def __str__(self) -> str:
+        return self.name
+
+
+class Tag(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+
+    def __str__(self) -> str:
+        return self.name
+
+
 class Question(models.Model):
-    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="questions")
+    EASY, MEDIUM, HARD = 1, 2, 3
+    DIFFICULTY_CHOICES = [(EASY, "Easy"), (MEDIUM, "Medium"), (HARD, "Hard")]
+
+    # A question belongs either to one exam or to a question bank.
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="questions", null=True, blank=True)
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name="questions", null=True, blank=True)
     text = models.TextField()
     order = models.PositiveIntegerField(default=0)
+    difficulty = models.PositiveSmallIntegerField(choices=DIFFICULTY_CHOICES, default=MEDIUM)
+    tags = models.ManyToManyField(Tag, blank=True, related_name="questions")
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(exam__isnull=False) | models.Q(bank__isnull=False), name="question_exam_or_bank"
+            ),
+        ]
+        indexes = [
+            models.Index(fields=["exam", "order", "id"], name="question_exam_order_idx"),
+            # Candidate ids of a sampling rule, in id order (see SamplingRule)
+            models.Index(fields=["bank", "difficulty", "id"], name="question_bank_difficulty_idx"),
+        ]
 
     def __str__(self) -> str:
         return f"Q{self.order}: {self.text[:50]}"
@@ -44,6 +135,73 @@ class Choice(models.Model):
         return f"{self.text[:50]} ({'correct' if self.is_correct else 'wrong'})"
 
 
+class QuestionSignature(models.Model):
+    """
+    Fingerprint of a question's text, for duplicate detection on import (see
+    ``exams.duplicates``): a hash of the normalized text and its packed
+    MinHash signature. Written with the question by the importer and on edit;
+    ``rebuild_question_fingerprints`` fills in the rest.
+    """
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name="signature")
+    text_hash = models.BigIntegerField(db_index=True)
+    minhash = models.BinaryField()
+
+
+class QuestionBand(models.Model):
+    """One LSH band of a question's signature: questions sharing a band are near-duplicate candidates."""
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name="bands")
+    band_hash = models.BigIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["band_hash", "question"], name="question_band_hash_idx"),
+        ]
+
+
+class SamplingRule(models.Model):
+    """
+    "Draw ``count`` questions from ``bank``", optionally only those with ``tag``
+    and/or ``difficulty``.
+
+    The ids of the matching questions are snapshotted in ``candidate_ids``
+    (sorted) when the rule is saved or refreshed, so drawing a paper is O(k)
+    in the number of questions drawn and the same seed always draws the same
+    paper, however the bank changes afterwards.
+    """
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="sampling_rules")
+    bank = models.ForeignKey(QuestionBank, on_delete=models.CASCADE, related_name="sampling_rules")
+    tag = models.ForeignKey(Tag, on_delete=models.CASCADE, null=True, blank=True, related_name="sampling_rules")
+    difficulty = models.PositiveSmallIntegerField(choices=Question.DIFFICULTY_CHOICES, null=True, blank=True)
+    count = models.PositiveSmallIntegerField()
+    candidate_ids = models.JSONField(default=list, editable=False)
+
+    class Meta:
+        ordering = ["id"]
+
+    def candidates(self):
+        """The bank questions this rule draws from (index scan on bank, difficulty, id)."""
+        questions = Question.objects.filter(bank_id=self.bank_id)
+        if self.difficulty is not None:
+            questions = questions.filter(difficulty=self.difficulty)
+        if self.tag_id is not None:
+            questions = questions.filter(tags=self.tag_id)
+        return questions.order_by("id")
+
+    def refresh_candidates(self):
+        self.candidate_ids = list(self.candidates().values_list("id", flat=True))
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.refresh_candidates()
+        super().save(*args, **kwargs)
+
+    def __str__(self) -> str:
+        criteria = [str(self.tag)] if self.tag_id else []
+        if self.difficulty is not None:
+            criteria.append(self.get_difficulty_display().lower())
+        return f"{self.count} from {self.bank}" + (f" ({', '.join(criteria)})" if criteria else "")
+
+
 class ExamSession(models.Model):
     exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="sessions")
     examinee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="exam_sessions")
@@ -53,15 +211,66 @@ class ExamSession(models.Model):
     total_correct = models.PositiveIntegerField(default=0)
     total_questions = models.PositiveIntegerField(default=0)
     is_submitted = models.BooleanField(default=False)
+    # started_at + the exam duration, or NULL for untimed exams
+    expires_at = models.DateTimeField(null=True, blank=True)
+    # Created ahead of start_time by the pre-warm job and not opened yet
+    provisioned = models.BooleanField(default=False)
+
+    class Meta:
+        constraints = [
+            # One session per examinee and exam; makes get_or_create race-safe.
+            models.UniqueConstraint(fields=["exam", "examinee"], name="unique_exam_session"),
+        ]
+        indexes = [
+            # Keyset pagination of the session lists (see exams/pagination.py)
+            models.Index(fields=["exam", "-started_at", "-id"], name="session_exam_started_idx"),
+            models.Index(fields=["examinee", "-started_at", "-id"], name="session_examinee_started_idx"),
+            models.Index(
+                fields=["exam", "-completed_at", "-id"],
+                condition=models.Q(is_submitted=True),
+                name="session_exam_completed_idx",
+            ),
+            models.Index(
+                fields=["examinee", "-completed_at", "-id"],
+                condition=models.Q(is_submitted=True),
+                name="session_examinee_done_idx",
+            ),
+            # Expired open sessions, for the auto-submit sweeper
+            models.Index(
+                fields=["expires_at", "id"],
+                condition=models.Q(is_submitted=False),
+                name="session_open_expiry_idx",
+            ),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.expires_at is None:
+            self.expires_at = self.exam.session_expiry(self.started_at)
+        super().save(*args, **kwargs)
 
     def is_active(self) -> bool:
         if self.is_submitted:
             return False
-        if self.exam.duration_minutes:
-            return timezone.now() < self.started_at + timezone.timedelta(minutes=self.exam.duration_minutes)
+        if self.expires_at:
+            return timezone.now() < self.expires_at
         return True
 
 
+class ExamRegistration(models.Model):
+    """An examinee who joined a scheduled exam before it started."""
+    exam = models.ForeignKey(Exam, on_delete=models.CASCADE, related_name="registrations")
+    examinee = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="exam_registrations")
+    registered_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["exam", "examinee"], name="unique_exam_registration"),
+        ]
+
+    def __str__(self) -> str:
+        return f"{self.examinee} -> {self.exam}"
+
+
 class Answer(models.Model):
     session = models.ForeignKey(ExamSession, on_delete=models.CASCADE, related_name="answers")
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
@@ -72,4 +281,119 @@ class Answer(models.Model):
     class Meta:
         unique_together = ("session", "question")
 
-# Create your models here.
+
+class ExamStatistics(models.Model):
+    """
+    Running score statistics of an exam's submitted sessions.
+
+    Updated in O(1) per submission (Welford's algorithm for the variance), so
+    results pages read one row instead of aggregating every session. Use the
+    ``rebuild_exam_statistics`` command to repair drift.
+    """
+    HISTOGRAM_BINS = 10
+
+    exam = models.OneToOneField(Exam, on_delete=models.CASCADE, related_name="statistics")
+    # Sessions opened by their examinee; ``count`` below is the submitted ones
+    session_count = models.PositiveIntegerField(default=0)
+    count = models.PositiveIntegerField(default=0)
+    mean = models.FloatField(default=0)
+    # Sum of squared deviations from the mean
+    m2 = models.FloatField(default=0)
+    min_score = models.FloatField(null=True, blank=True)
+    max_score = models.FloatField(null=True, blank=True)
+    pass_count = models.PositiveIntegerField(default=0)
+    # Submission counts per 10-point score band, 0-10 up to 90-100
+    histogram = models.JSONField(default=list)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name_plural = "exam statistics"
+
+    @staticmethod
+    def pass_mark() -> float:
+        return getattr(settings, "EXAM_PASS_MARK", 70)
+
+    def add_score(self, score: float) -> None:
+        self.count += 1
+        delta = score - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (score - self.mean)
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        if score >= self.pass_mark():
+            self.pass_count += 1
+        if len(self.histogram) != self.HISTOGRAM_BINS:
+            self.histogram = [0] * self.HISTOGRAM_BINS
+        bucket = min(int(score // (100 / self.HISTOGRAM_BINS)), self.HISTOGRAM_BINS - 1)
+        self.histogram[max(bucket, 0)] += 1
+
+    def reset(self) -> None:
+        self.count = 0
+        self.mean = 0
+        self.m2 = 0
+        self.min_score = None
+        self.max_score = None
+        self.pass_count = 0
+        self.histogram = [0] * self.HISTOGRAM_BINS
+
+    @property
+    def variance(self) -> float:
+        return self.m2 / self.count if self.count else 0
+
+    @property
+    def std_dev(self) -> float:
+        return math.sqrt(self.variance)
+
+    @property
+    def pass_rate(self) -> float:
+        return self.pass_count / self.count * 100 if self.count else 0
+
+    def histogram_bands(self):
+        """Return ``(label, count, percent of submissions)`` for each score band."""
+        width = 100 // self.HISTOGRAM_BINS
+        counts = self.histogram or [0] * self.HISTOGRAM_BINS
+        return [
+            (f"{i * width}-{(i + 1) * width}", count, count / self.count * 100 if self.count else 0)
+            for i, count in enumerate(counts)
+        ]
+
+    def __str__(self) -> str:
+        return f"Statistics for {self.exam}"
+
+
+class UserSummary(models.Model):
+    """
+    Dashboard counters of one user, as examinee and as examiner.
+
+    Updated when a session is opened or submitted and when an exam is created
+    or (un)published, so the dashboard reads one row by primary key whatever
+    the length of the user's history. Use the ``rebuild_user_summaries``
+    command to repair drift.
+    """
+    user = models.OneToOneField(
+        settings.AUTH_USER_MODEL, on_delete=models.CASCADE, primary_key=True, related_name="summary"
+    )
+    exams_taken = models.PositiveIntegerField(default=0)
+    exams_completed = models.PositiveIntegerField(default=0)
+    score_total = models.FloatField(default=0)
+    exams_created = models.PositiveIntegerField(default=0)
+    exams_published = models.PositiveIntegerField(default=0)
+    last_activity_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = "user summaries"
+        indexes = [
+            # The examiners' rows, summed into the admin dashboard's exam totals
+            models.Index(
+                fields=["exams_created", "exams_published"],
+                condition=models.Q(exams_created__gt=0),
+                name="summary_examiner_idx",
+            ),
+        ]
+
+    @property
+    def average_score(self):
+        return self.score_total / self.exams_completed if self.exams_completed else None
+
+    def __str__(self) -> str:
+        return f"Summary for {self.user}"
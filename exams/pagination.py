@@ -0,0 +1,106 @@
+"""
+Keyset (cursor) pagination for the exam and session lists.
+
+Pages are ordered newest first on ``(field, id)`` and a page is fetched with
+``WHERE (field, id) < cursor ORDER BY field DESC, id DESC LIMIT n``, which a
+composite index answers directly, so page N costs the same as page 1
+whatever the table size (unlike ``OFFSET``, which reads every skipped row).
+"""
+import base64
+from dataclasses import dataclass, field as dataclass_field
+from datetime import datetime
+
+from django.conf import settings
+from django.db.models import Q
+
+PAGE_SIZE = getattr(settings, 'EXAM_PAGE_SIZE', 25)
+
+
+def encode_cursor(value, pk):
+    raw = f'{value.isoformat()}|{pk}'.encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return ``(datetime, pk)`` for a cursor, or None if it is malformed."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        value, pk = raw.rsplit('|', 1)
+        return datetime.fromisoformat(value), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        return None
+
+
+@dataclass
+class KeysetPage:
+    object_list: list = dataclass_field(default_factory=list)
+    next_cursor: str = None
+    previous_cursor: str = None
+    param: str = 'cursor'
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    @property
+    def has_other_pages(self):
+        return self.has_next or self.has_previous
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+
+def paginate(request, queryset, field, page_size=PAGE_SIZE, param='cursor'):
+    """
+    Return one newest-first page of ``queryset`` ordered by ``(field, id)``.
+
+    The request's ``?<param>=`` value selects the page: ``a<cursor>`` pages
+    forward past a row, ``b<cursor>`` pages back before one. ``field`` must be
+    set on every paged row, so filter NULLs out of nullable columns.
+    """
+    token = request.GET.get(param, '')
+    direction, position = token[:1], decode_cursor(token[1:]) if token else None
+    if direction not in ('a', 'b') or position is None:
+        direction, position = 'a', None
+
+    if direction == 'b':
+        # Walk backwards in ascending order, then flip the page round.
+        queryset = queryset.order_by(field, 'id')
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(Q(**{f'{field}__gt': value}) | Q(**{field: value, 'id__gt': pk}))
+    else:
+        queryset = queryset.order_by(f'-{field}', '-id')
+        if position is not None:
+            value, pk = position
+            queryset = queryset.filter(Q(**{f'{field}__lt': value}) | Q(**{field: value, 'id__lt': pk}))
+
+    rows = list(queryset[:page_size + 1])
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if direction == 'b':
+        rows.reverse()
+
+    page = KeysetPage(object_list=rows, param=param)
+    if rows:
+        first, last = rows[0], rows[-1]
+        more_after = has_more if direction == 'a' else position is not None
+        more_before = position is not None if direction == 'a' else has_more
+        if more_after:
+            page.next_cursor = 'a' + encode_cursor(getattr(last, field), last.pk)
+        if more_before:
+            page.previous_cursor = 'b' + encode_cursor(getattr(first, field), first.pk)
+    return page
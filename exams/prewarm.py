@@ -0,0 +1,166 @@
+"""
+Pre-start phase for scheduled exams.
+
+Some minutes before an exam's ``start_time`` the paper, the answer key and the
+JSON paper served to examinees are loaded into the cache, and an
+``ExamSession`` is bulk-created for every registered examinee. When the exam
+opens, ``take_exam`` then finds an existing session and a warm cache instead of
+racing thousands of INSERTs and paper queries.
+
+With a per-process cache (LocMem) every worker has to warm its own copy, so
+the in-process scheduler is started in each worker (see ``gunicorn.conf.py``);
+the warm marker lives in the same cache as the data it describes.
+"""
+import logging
+import threading
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import Exists, OuterRef
+from django.utils import timezone
+
+from .cache import PAPER_CACHE_TIMEOUT, exam_cache_key, get_answer_key, get_exam_paper, get_paper_json
+from .models import Exam, ExamRegistration, ExamSession
+from .sampling import get_sampling_rules
+
+logger = logging.getLogger(__name__)
+
+PREWARM_MINUTES = getattr(settings, 'EXAM_PREWARM_MINUTES', 15)
+PREWARM_INTERVAL = getattr(settings, 'EXAM_PREWARM_INTERVAL', 60)
+PREWARM_IN_PROCESS = getattr(settings, 'EXAM_PREWARM_IN_PROCESS', False)
+PROVISION_BATCH_SIZE = getattr(settings, 'EXAM_PREWARM_BATCH_SIZE', 1000)
+
+
+def upcoming_exams(minutes=PREWARM_MINUTES, now=None):
+    """Published exams starting within the next ``minutes``."""
+    now = now or timezone.now()
+    return Exam.objects.filter(
+        is_published=True,
+        start_time__gt=now,
+        start_time__lte=now + timezone.timedelta(minutes=minutes),
+    ).order_by('start_time')
+
+
+def warm_exam(exam):
+    """
+    Load an exam's paper, answer key and JSON paper into the cache; for an
+    exam drawing from question banks, the candidates its papers are drawn from.
+
+    Returns False if this cache was already warm for the current exam version.
+    """
+    marker = exam_cache_key(exam, 'warm')
+    if cache.get(marker):
+        return False
+    if exam.draws_from_bank:
+        get_sampling_rules(exam)
+    else:
+        get_exam_paper(exam)
+        get_answer_key(exam)
+        get_paper_json(exam)
+    cache.set(marker, True, PAPER_CACHE_TIMEOUT)
+    return True
+
+
+def provision_sessions(exam, batch_size=PROVISION_BATCH_SIZE):
+    """
+    Bulk-create sessions for registered examinees who do not have one yet.
+
+    Sessions are timed from the exam's ``start_time`` until the examinee
+    first opens the exam (see ``open_provisioned_session``). Returns the
+    number of sessions created.
+    """
+    registrants = (
+        ExamRegistration.objects.filter(exam=exam)
+        .exclude(Exists(ExamSession.objects.filter(exam=exam, examinee=OuterRef('examinee'))))
+        .values_list('examinee_id', flat=True)
+    )
+    expires_at = exam.session_expiry(exam.start_time)
+    created = 0
+    batch = []
+    for examinee_id in registrants.iterator(chunk_size=batch_size):
+        batch.append(ExamSession(
+            exam=exam, examinee_id=examinee_id, started_at=exam.start_time,
+            expires_at=expires_at, provisioned=True,
+        ))
+        if len(batch) >= batch_size:
+            created += _create_sessions(exam, batch)
+            batch = []
+    if batch:
+        created += _create_sessions(exam, batch)
+    return created
+
+
+def _create_sessions(exam, batch):
+    # Examinees who got a session meanwhile are skipped, so the rows are counted
+    # rather than the batch. Provisioners of the same exam (one per worker)
+    # take turns on the exam row and are the only ones creating such rows.
+    provisioned = ExamSession.objects.filter(
+        exam=exam, examinee_id__in=[session.examinee_id for session in batch], provisioned=True
+    )
+    with transaction.atomic():
+        Exam.objects.select_for_update().filter(pk=exam.pk).values_list('pk').get()
+        before = provisioned.count()
+        ExamSession.objects.bulk_create(batch, ignore_conflicts=True)
+        return provisioned.count() - before
+
+
+def open_provisioned_session(session, now=None):
+    """
+    Start a provisioned session on its examinee's first visit: it is timed
+    from now, so arriving late costs no time. Only the first of concurrent
+    visits updates the row; the others reload its timing. Returns True for
+    the first visit.
+    """
+    now = now or timezone.now()
+    expires_at = session.exam.session_expiry(now)
+    opened = ExamSession.objects.filter(pk=session.pk, provisioned=True).update(
+        provisioned=False, started_at=now, expires_at=expires_at,
+    )
+    if opened:
+        session.started_at, session.expires_at = now, expires_at
+    else:
+        session.refresh_from_db(fields=['started_at', 'expires_at'])
+    session.provisioned = False
+    return bool(opened)
+
+
+def prewarm(minutes=PREWARM_MINUTES, now=None):
+    """Warm and provision every exam starting within ``minutes``. Returns ``(warmed, provisioned)``."""
+    warmed = provisioned = 0
+    for exam in upcoming_exams(minutes, now):
+        warmed += warm_exam(exam)
+        provisioned += provision_sessions(exam)
+    return warmed, provisioned
+
+
+def run_prewarmer(interval=PREWARM_INTERVAL, minutes=PREWARM_MINUTES, stop_event=None):
+    """Pre-warm upcoming exams now and every ``interval`` seconds until ``stop_event`` is set."""
+    stop_event = stop_event or threading.Event()
+    while True:
+        close_old_connections()
+        try:
+            warmed, provisioned = prewarm(minutes)
+            if warmed or provisioned:
+                logger.info("Pre-warmed %d exams, provisioned %d sessions", warmed, provisioned)
+        except Exception:
+            logger.exception("Exam pre-warm failed")
+        finally:
+            close_old_connections()
+        if stop_event.wait(interval):
+            return
+
+
+_prewarmer = None
+_prewarmer_lock = threading.Lock()
+
+
+def ensure_prewarmer():
+    """Start the in-process pre-warm scheduler once per process, if enabled."""
+    global _prewarmer
+    if not PREWARM_IN_PROCESS or (_prewarmer is not None and _prewarmer.is_alive()):
+        return
+    with _prewarmer_lock:
+        if _prewarmer is None or not _prewarmer.is_alive():
+            _prewarmer = threading.Thread(target=run_prewarmer, name='exam-prewarmer', daemon=True)
+            _prewarmer.start()
@@ -0,0 +1,270 @@
+"""
+Per-session papers drawn from question banks.
+
+An exam with sampling rules ("10 from algebra, 5 hard") has no questions of
+its own: each session gets ``count`` questions per rule, picked from the
+rule's snapshot of candidate ids (``SamplingRule.candidate_ids``) by a PRNG
+seeded with the session id and the exam's ``paper_seed``. A draw costs O(k)
+in the number of questions drawn whatever the size of the bank, and it is
+never stored: the paper is rebuilt from the seed wherever it is needed and
+cached per session. Changing the rules changes the seed and redraws, so they
+are locked once an examinee has started the exam (``RulesLocked``); other
+edits to the exam leave every draw as it was.
+
+The ``session`` functions also serve exams with their own questions, so
+callers need not know where a paper comes from.
+"""
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Exists, OuterRef, Prefetch
+
+from .cache import (
+    PAPER_CACHE_TIMEOUT, aget_answer_key, aget_paper_json, build_answer_key, build_paper_json,
+    exam_cache_key, get_answer_key, get_exam_paper, get_paper_json, paper_etag, paper_question,
+)
+from .models import Choice, ExamSession, Question, SamplingRule
+from .shuffle import session_rng
+
+# Random picks are used while the candidates outnumber what is wanted by this much.
+SPARSE_RATIO = 2
+# Rules are immutable per exam version; each process keeps the ones it uses
+# so that a draw does not deserialize every candidate list again.
+RULES_MEMO_SIZE = 32
+_rules_memo = {}
+
+
+class RulesLocked(Exception):
+    """The sampling rules of an exam cannot change once examinees have started it."""
+
+
+def is_taken(exam):
+    """Whether an examinee has opened a session (and so seen a paper) of this exam."""
+    return exam.sessions.filter(provisioned=False).exists()
+
+
+def get_sampling_rules(exam):
+    """Return the cached ``[(count, candidate_ids), ...]`` of an exam's rules."""
+    key = exam_cache_key(exam, 'sampling_rules')
+    rules = _rules_memo.get(key)
+    if rules is not None:
+        return rules
+    rules = cache.get(key)
+    if rules is None:
+        rules = [
+            (count, candidate_ids)
+            for count, candidate_ids in exam.sampling_rules.order_by('id').values_list('count', 'candidate_ids')
+        ]
+        cache.set(key, rules, PAPER_CACHE_TIMEOUT)
+    if len(_rules_memo) >= RULES_MEMO_SIZE:
+        _rules_memo.clear()
+    _rules_memo[key] = rules
+    return rules
+
+
+def sample_ids(rng, candidates, count, taken):
+    """
+    Draw up to ``count`` of the sorted ``candidates`` that are not in ``taken``.
+
+    While the candidates are plentiful, random positions are picked until
+    enough new ids come up: O(count) expected, never a pass over the list.
+    A rule that wants most of its candidates samples what is left directly.
+    """
+    picked = []
+    chosen = set(taken)
+    if len(candidates) >= SPARSE_RATIO * (count + len(chosen)):
+        # Each pick is new with probability >= 1/2; give up on a very unlucky run.
+        for _ in range(2 * SPARSE_RATIO * count):
+            if len(picked) == count:
+                return picked
+            question_id = candidates[rng.randrange(len(candidates))]
+            if question_id not in chosen:
+                chosen.add(question_id)
+                picked.append(question_id)
+    if len(picked) < count:
+        rest = [question_id for question_id in candidates if question_id not in chosen]
+        picked += rng.sample(rest, min(count - len(picked), len(rest)))
+    return picked
+
+
+def draw_question_ids(exam, session_id):
+    """The ids of the questions drawn for a session, rule by rule, none twice."""
+    rng = session_rng(session_id, exam.paper_seed, 'draw')
+    drawn = []
+    for count, candidates in get_sampling_rules(exam):
+        drawn += sample_ids(rng, candidates, count, drawn)
+    return drawn
+
+
+def build_drawn_paper(question_ids):
+    """
+    Load the given questions with a single prefetch, as a paper in that order.
+
+    Questions deleted from the bank since the rules were refreshed are left out.
+    """
+    questions = Question.objects.filter(id__in=question_ids).prefetch_related(
+        Prefetch('choices', queryset=Choice.objects.order_by('id'))
+    )
+    by_id = {question.id: question for question in questions}
+    return [
+        paper_question(by_id[question_id], order=position)
+        for position, question_id in enumerate(question_ids, 1)
+        if question_id in by_id
+    ]
+
+
+def get_results_paper(exam, session_ids):
+    """
+    The questions to report per-question results on: the exam's own paper,
+    or every question drawn for at least one of ``session_ids``, in id order.
+    """
+    if not exam.draws_from_bank:
+        return get_exam_paper(exam)
+    drawn = set()
+    for session_id in session_ids:
+        drawn.update(draw_question_ids(exam, session_id))
+    return build_drawn_paper(sorted(drawn))
+
+
+def _session_key(exam, session_id, kind):
+    return exam_cache_key(exam, f'session:{session_id}:{kind}')
+
+
+def get_session_paper(exam, session_id):
+    """
+    Return the paper of a session, before shuffling (see ``shuffle_paper``):
+    the exam's own paper, or the questions drawn for the session.
+    """
+    if not exam.draws_from_bank:
+        return get_exam_paper(exam)
+    key = _session_key(exam, session_id, 'paper')
+    paper = cache.get(key)
+    if paper is None:
+        paper = build_drawn_paper(draw_question_ids(exam, session_id))
+        cache.set_many({
+            key: paper,
+            _session_key(exam, session_id, 'answer_key'): build_answer_key(paper),
+        }, PAPER_CACHE_TIMEOUT)
+    return paper
+
+
+def get_session_answer_key(exam, session_id):
+    """Return the answer key of a session's paper."""
+    if not exam.draws_from_bank:
+        return get_answer_key(exam)
+    answer_key = cache.get(_session_key(exam, session_id, 'answer_key'))
+    if answer_key is None:
+        answer_key = build_answer_key(get_session_paper(exam, session_id))
+        cache.set(_session_key(exam, session_id, 'answer_key'), answer_key, PAPER_CACHE_TIMEOUT)
+    return answer_key
+
+
+async def aget_session_answer_key(exam, session_id):
+    """Async ``get_session_answer_key``: one cache round trip on a hit."""
+    if not exam.draws_from_bank:
+        return await aget_answer_key(exam)
+    answer_key = await cache.aget(_session_key(exam, session_id, 'answer_key'))
+    if answer_key is None:
+        answer_key = await sync_to_async(get_session_answer_key)(exam, session_id)
+    return answer_key
+
+
+def get_answer_keys(exams, session_exam_ids):
+    """
+    Return ``{session_id: answer_key}`` for sessions given as ``{session_id: exam_id}``.
+
+    ``exams`` maps exam ids to exams; sessions of other exams are left out.
+    Exams with their own questions share one key, drawn papers are fetched
+    with one cache round trip.
+    """
+    shared = {exam_id: get_answer_key(exam) for exam_id, exam in exams.items() if not exam.draws_from_bank}
+    answer_keys = {}
+    drawn = {}
+    for session_id, exam_id in session_exam_ids.items():
+        if exam_id in shared:
+            answer_keys[session_id] = shared[exam_id]
+        elif exam_id in exams:
+            drawn[_session_key(exams[exam_id], session_id, 'answer_key')] = session_id
+    cached = cache.get_many(drawn)
+    for key, session_id in drawn.items():
+        answer_key = cached.get(key)
+        if answer_key is None:
+            answer_key = get_session_answer_key(exams[session_exam_ids[session_id]], session_id)
+        answer_keys[session_id] = answer_key
+    return answer_keys
+
+
+def session_paper_etag(exam, session_id):
+    return paper_etag(exam, session_id if exam.draws_from_bank else None)
+
+
+def get_session_paper_json(exam, session_id):
+    """Return the JSON paper of a session as bytes (shared by every session unless drawn)."""
+    if not exam.draws_from_bank:
+        return get_paper_json(exam)
+    key = _session_key(exam, session_id, 'paper_json')
+    paper_json = cache.get(key)
+    if paper_json is None:
+        paper_json = build_paper_json(get_session_paper(exam, session_id))
+        cache.set(key, paper_json, PAPER_CACHE_TIMEOUT)
+    return paper_json
+
+
+async def aget_session_paper_json(exam, session_id):
+    """Async ``get_session_paper_json``: one cache round trip on a hit."""
+    if not exam.draws_from_bank:
+        return await aget_paper_json(exam)
+    paper_json = await cache.aget(_session_key(exam, session_id, 'paper_json'))
+    if paper_json is None:
+        paper_json = await sync_to_async(get_session_paper_json)(exam, session_id)
+    return paper_json
+
+
+def update_exam_rules(exam):
+    """
+    Re-derive an exam's sampling state after its rules changed: whether it
+    draws from banks and how many questions a paper has. Changes the paper
+    seed, so every session is redrawn; raises ``RulesLocked`` (call it inside
+    the transaction that changed the rules) if the exam has been taken.
+    """
+    if is_taken(exam):
+        raise RulesLocked("Examinees have started this exam; its sampling rules can no longer change.")
+    rules = exam.sampling_rules.all()
+    exam.draws_from_bank = rules.exists()
+    if exam.draws_from_bank:
+        exam.num_questions = sum(
+            min(count, len(candidate_ids)) for count, candidate_ids in rules.values_list('count', 'candidate_ids')
+        )
+    else:
+        exam.num_questions = exam.questions.count()
+    exam.paper_seed += 1
+    exam.save(update_fields=['draws_from_bank', 'num_questions', 'paper_seed'])
+    exam.bump_version()
+
+
+def refresh_rules(rules):
+    """
+    Re-snapshot the candidate ids of ``rules`` from their banks, and update
+    their exams. Returns the number of exams updated; raises ``RulesLocked``
+    if one of them has been taken.
+    """
+    rules = list(rules.select_related('exam'))
+    exams = {}
+    with transaction.atomic():
+        for rule in rules:
+            rule.refresh_candidates()
+            exams[rule.exam_id] = rule.exam
+        SamplingRule.objects.bulk_update(rules, ['candidate_ids'])
+        for exam in exams.values():
+            update_exam_rules(exam)
+    return len(exams)
+
+
+def refresh_bank_rules(bank):
+    """
+    Pick up changes to a bank in the exams drawing from it, except those
+    already taken: their papers must still be rebuilt from the same
+    candidates. Returns the number of exams updated.
+    """
+    taken = ExamSession.objects.filter(exam=OuterRef('exam'), provisioned=False)
+    return refresh_rules(SamplingRule.objects.filter(bank=bank).exclude(Exists(taken)))
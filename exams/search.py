@@ -0,0 +1,264 @@
+"""
+Full-text search over questions, for examiners.
+
+One interface over two indexes, picked by the database vendor:
+
+* SQLite: an external-content FTS5 table (``exams_question_fts``, Porter
+  stemming), ranked with ``bm25()``.
+* PostgreSQL: a ``tsvector`` column on the question table with a GIN index,
+  ranked with ``ts_rank()``.
+
+Both are kept in sync by triggers on the question table, so every write path
+(forms, ``bulk_create`` imports, cascading deletes, the admin) updates the
+index in the same transaction without any application code. The PostgreSQL
+column is added empty and filled by ``rebuild``, in batches, so adding it does
+not rewrite a large table under a lock; ``rebuild_search_index`` does the same
+after a restore or a change of configuration.
+
+Ranking has to score every match whatever the page, so results are paged
+with LIMIT/OFFSET (up to ``MAX_PAGES``) rather than keyset cursors. Other
+databases fall back to an unranked ``icontains`` scan.
+"""
+import re
+
+from django.db import connection as default_connection, transaction
+
+from .models import Exam, Question, QuestionBank
+
+SEARCH_PAGE_SIZE = 20
+MAX_PAGES = 50
+MAX_TERMS = 16
+REBUILD_BATCH_SIZE = 5000
+
+QUESTION_TABLE = Question._meta.db_table
+FTS_TABLE = f'{QUESTION_TABLE}_fts'
+TSVECTOR_COLUMN = 'search_vector'
+TS_CONFIG = 'english'
+
+
+def search_terms(query):
+    """The words of a user's query, lowercased; operators and punctuation are dropped."""
+    return re.findall(r'\w+', query.lower())[:MAX_TERMS]
+
+
+def _scope(owner=None, exam=None, bank=None):
+    """SQL conditions on ``q`` (the question table) limiting a search, with their params."""
+    clauses, params = [], []
+    if exam is not None:
+        clauses.append('q.exam_id = %s')
+        params.append(exam.pk)
+    if bank is not None:
+        clauses.append('q.bank_id = %s')
+        params.append(bank.pk)
+    if owner is not None:
+        # The owner's exams and banks are few; each match is then checked by primary key.
+        clauses.append(
+            f'(q.exam_id IN (SELECT id FROM {Exam._meta.db_table} WHERE examiner_id = %s)'
+            f' OR q.bank_id IN (SELECT id FROM {QuestionBank._meta.db_table} WHERE owner_id = %s))'
+        )
+        params += [owner.pk, owner.pk]
+    return ''.join(f' AND {clause}' for clause in clauses), params
+
+
+class SearchBackend:
+    """Unranked fallback: a substring scan, for databases without a text index."""
+    vendor = None
+
+    def __init__(self, connection):
+        self.connection = connection
+
+    def install(self):
+        pass
+
+    def uninstall(self):
+        pass
+
+    def reset(self):
+        pass
+
+    def index_batch(self, after_id, batch_size):
+        """Index up to ``batch_size`` questions past ``after_id``; return the last id, or None when done."""
+        return None
+
+    def search(self, terms, scope_sql, scope_params, limit, offset):
+        """Return ``[(question_id, rank), ...]`` for the best matches, best first."""
+        questions = Question.objects.all()
+        for term in terms:
+            questions = questions.filter(text__icontains=term)
+        sql, params = questions.values('id').query.sql_with_params()
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT q.id, 0 FROM {QUESTION_TABLE} q WHERE q.id IN ({sql}){scope_sql} '
+                f'ORDER BY q.id DESC LIMIT %s OFFSET %s',
+                [*params, *scope_params, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+class SQLiteSearchBackend(SearchBackend):
+    vendor = 'sqlite'
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+                f"text, content='{QUESTION_TABLE}', content_rowid='id', tokenize='porter unicode61')"
+            )
+            # Django rebuilds a SQLite table to alter it, which drops its triggers;
+            # the app re-runs this after every migrate.
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert AFTER INSERT ON {QUESTION_TABLE} BEGIN '
+                f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END'
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete AFTER DELETE ON {QUESTION_TABLE} BEGIN '
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); END"
+            )
+            cursor.execute(
+                f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update AFTER UPDATE OF text ON {QUESTION_TABLE} BEGIN '
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) VALUES ('delete', old.id, old.text); "
+                f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END'
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            for event in ('insert', 'delete', 'update'):
+                cursor.execute(f'DROP TRIGGER IF EXISTS {FTS_TABLE}_{event}')
+            cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+    def reset(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('delete-all')")
+
+    def index_batch(self, after_id, batch_size):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT id, text FROM {QUESTION_TABLE} WHERE id > %s ORDER BY id LIMIT %s', [after_id, batch_size]
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+            cursor.executemany(f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (%s, %s)', rows)
+        return rows[-1][0]
+
+    def search(self, terms, scope_sql, scope_params, limit, offset):
+        # Every term quoted: an implicit AND of plain words, never FTS5 syntax
+        match = ' '.join(f'"{term}"' for term in terms)
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT q.id, -bm25({FTS_TABLE}) AS rank FROM {FTS_TABLE} '
+                f'JOIN {QUESTION_TABLE} q ON q.id = {FTS_TABLE}.rowid '
+                f'WHERE {FTS_TABLE} MATCH %s{scope_sql} ORDER BY bm25({FTS_TABLE}), q.id LIMIT %s OFFSET %s',
+                [match, *scope_params, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+class PostgreSQLSearchBackend(SearchBackend):
+    vendor = 'postgresql'
+
+    def install(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'ALTER TABLE {QUESTION_TABLE} ADD COLUMN IF NOT EXISTS {TSVECTOR_COLUMN} tsvector')
+            cursor.execute(
+                f'CREATE OR REPLACE FUNCTION {QUESTION_TABLE}_{TSVECTOR_COLUMN}() RETURNS trigger AS $$ BEGIN '
+                f"NEW.{TSVECTOR_COLUMN} := to_tsvector('{TS_CONFIG}', coalesce(NEW.text, '')); RETURN NEW; "
+                f'END $$ LANGUAGE plpgsql'
+            )
+            cursor.execute(f'DROP TRIGGER IF EXISTS {QUESTION_TABLE}_{TSVECTOR_COLUMN} ON {QUESTION_TABLE}')
+            cursor.execute(
+                f'CREATE TRIGGER {QUESTION_TABLE}_{TSVECTOR_COLUMN} BEFORE INSERT OR UPDATE OF text '
+                f'ON {QUESTION_TABLE} FOR EACH ROW EXECUTE FUNCTION {QUESTION_TABLE}_{TSVECTOR_COLUMN}()'
+            )
+            cursor.execute(
+                f'CREATE INDEX IF NOT EXISTS {QUESTION_TABLE}_search_idx ON {QUESTION_TABLE} USING GIN ({TSVECTOR_COLUMN})'
+            )
+
+    def uninstall(self):
+        with self.connection.cursor() as cursor:
+            cursor.execute(f'DROP TRIGGER IF EXISTS {QUESTION_TABLE}_{TSVECTOR_COLUMN} ON {QUESTION_TABLE}')
+            cursor.execute(f'DROP FUNCTION IF EXISTS {QUESTION_TABLE}_{TSVECTOR_COLUMN}()')
+            cursor.execute(f'ALTER TABLE {QUESTION_TABLE} DROP COLUMN IF EXISTS {TSVECTOR_COLUMN}')
+
+    def index_batch(self, after_id, batch_size):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f"UPDATE {QUESTION_TABLE} SET {TSVECTOR_COLUMN} = to_tsvector('{TS_CONFIG}', coalesce(text, '')) "
+                f'WHERE id IN (SELECT id FROM {QUESTION_TABLE} WHERE id > %s ORDER BY id LIMIT %s) RETURNING id',
+                [after_id, batch_size],
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+        return max(ids) if ids else None
+
+    def search(self, terms, scope_sql, scope_params, limit, offset):
+        with self.connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT q.id, ts_rank(q.{TSVECTOR_COLUMN}, query) AS rank '
+                f"FROM {QUESTION_TABLE} q, plainto_tsquery('{TS_CONFIG}', %s) query "
+                f'WHERE q.{TSVECTOR_COLUMN} @@ query{scope_sql} ORDER BY rank DESC, q.id LIMIT %s OFFSET %s',
+                [' '.join(terms), *scope_params, limit, offset],
+            )
+            return cursor.fetchall()
+
+
+BACKENDS = {backend.vendor: backend for backend in (SQLiteSearchBackend, PostgreSQLSearchBackend)}
+
+
+def get_backend(connection=None):
+    connection = connection or default_connection
+    return BACKENDS.get(connection.vendor, SearchBackend)(connection)
+
+
+def install(connection=None):
+    """Create the index and its triggers if missing (idempotent)."""
+    connection = connection or default_connection
+    if QUESTION_TABLE in connection.introspection.table_names():
+        get_backend(connection).install()
+
+
+def rebuild(batch_size=REBUILD_BATCH_SIZE, connection=None, progress=None):
+    """
+    Re-index every question, ``batch_size`` per transaction. Returns the
+    number of batches. ``progress`` is called with the last id of each batch.
+    """
+    backend = get_backend(connection)
+    backend.install()
+    with transaction.atomic(using=backend.connection.alias):
+        backend.reset()
+    batches = 0
+    after_id = 0
+    while True:
+        with transaction.atomic(using=backend.connection.alias):
+            after_id = backend.index_batch(after_id, batch_size)
+        if after_id is None:
+            return batches
+        batches += 1
+        if progress:
+            progress(after_id)
+
+
+def search_questions(query, owner=None, exam=None, bank=None, page=1, page_size=SEARCH_PAGE_SIZE):
+    """
+    Rank the questions matching every word of ``query``, limited to those of
+    ``exam``, of ``bank`` and/or owned by ``owner`` (their exams and banks).
+
+    Returns ``(questions, has_next)`` for page ``page`` (1-based, at most
+    ``MAX_PAGES``); each question has its ``exam`` and ``bank`` loaded and a
+    ``rank`` attribute.
+    """
+    terms = search_terms(query)
+    page = min(max(page, 1), MAX_PAGES)
+    if not terms:
+        return [], False
+    scope_sql, scope_params = _scope(owner, exam, bank)
+    rows = get_backend().search(terms, scope_sql, scope_params, page_size + 1, (page - 1) * page_size)
+    has_next = len(rows) > page_size and page < MAX_PAGES
+    rows = rows[:page_size]
+    questions = Question.objects.select_related('exam', 'bank').in_bulk([question_id for question_id, _ in rows])
+    results = []
+    for question_id, rank in rows:
+        if question_id in questions:
+            question = questions[question_id]
+            question.rank = rank
+            results.append(question)
+    return results, has_next
@@ -0,0 +1,66 @@
+"""
+Per-session question and choice order, derived rather than stored.
+
+When an exam shuffles its questions or choices, each session sees its own
+order, recomputed wherever it is needed (the exam page, the result and the
+session review) so nothing is written when a session starts. The questions,
+and each question's choices, are put in id order and shuffled with
+Fisher-Yates (``random.shuffle``, O(n)) from a PRNG seeded with the session
+id and the exam's paper seed; the choices of a question are seeded with its
+id as well, so their order does not depend on the rest of the paper. The
+seed only changes with the sampling rules, which are locked once the exam
+is taken, so edits to the exam never move what a session has already seen.
+Adding or removing a question reshuffles the question order of open
+sessions, but not their choices. Grading is keyed by question and choice
+ids and does not depend on the order.
+"""
+import random
+from operator import itemgetter
+
+
+def session_rng(session_id, seed, purpose):
+    # String seeds are hashed with SHA-512, so the sequence is the same in every process.
+    return random.Random(f'exams:{purpose}:{session_id}:{seed}')
+
+
+def _shuffled(items, session_id, seed, purpose):
+    items = sorted(items, key=itemgetter('id'))
+    session_rng(session_id, seed, purpose).shuffle(items)
+    return items
+
+
+def shuffle_choices(question, exam, session_id):
+    """The choices of a paper question in the order ``session_id`` sees them."""
+    if not exam.shuffle_choices:
+        return question['choices']
+    return _shuffled(question['choices'], session_id, exam.paper_seed, f"choices:{question['id']}")
+
+
+def shuffle_paper(paper, exam, session_id):
+    """
+    Return ``paper`` (as from ``get_session_paper``) in the order ``session_id`` sees it.
+
+    The cached paper is not modified. Returns it as is when the exam does not shuffle.
+    """
+    if not (exam.shuffle_questions or exam.shuffle_choices):
+        return paper
+    questions = list(paper)
+    if exam.shuffle_questions:
+        questions = _shuffled(questions, session_id, exam.paper_seed, 'questions')
+    if exam.shuffle_choices:
+        questions = [{**question, 'choices': shuffle_choices(question, exam, session_id)} for question in questions]
+    return questions
+
+
+def paper_order(paper, exam, session_id):
+    """
+    The session's order as ``[[question_id, [choice_id, ...]], ...]`` for the
+    exam page, which applies it to the shared JSON paper; None when the exam
+    does not shuffle.
+    """
+    if not (exam.shuffle_questions or exam.shuffle_choices):
+        return None
+    return [
+        [question['id'], [choice['id'] for choice in question['choices']]]
+        for question in shuffle_paper(paper, exam, session_id)
+    ]
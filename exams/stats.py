@@ -0,0 +1,141 @@
+"""
+Incrementally maintained per-exam score statistics and per-user dashboard counters.
+"""
+from collections import Counter
+
+from django.db import transaction
+from django.db.models import Count, F, Max, Q, Sum
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from .models import Exam, ExamSession, ExamStatistics, UserSummary
+
+
+def _increment(model, field, keys, **updates):
+    """Apply ``updates`` to the rows of ``model`` whose ``field`` is in ``keys``, creating missing rows."""
+    keys = set(keys)
+    rows = model.objects.filter(**{f'{field}__in': keys})
+    if rows.update(**updates) == len(keys):
+        return
+    # First update for some of them; another process may be creating the same rows.
+    missing = keys - set(rows.values_list(field, flat=True))
+    model.objects.bulk_create([model(**{field: key}) for key in missing], ignore_conflicts=True)
+    model.objects.filter(**{f'{field}__in': missing}).update(**updates)
+
+
+def record_score(exam_id, score):
+    """Fold one submitted score into an exam's statistics (see ``record_scores``)."""
+    record_scores(exam_id, [score])
+
+
+def record_scores(exam_id, scores):
+    """
+    Fold several submitted scores into an exam's statistics with one UPDATE.
+
+    Register it with ``transaction.on_commit`` of the submit transaction: it
+    runs its own short transaction, so the row lock serializes concurrent
+    submissions of an exam for one SELECT and one UPDATE rather than for the
+    whole grading. Scores lost to a crash in between are restored by
+    ``rebuild_exam_statistics``.
+    """
+    with transaction.atomic():
+        stats, _ = ExamStatistics.objects.select_for_update().get_or_create(exam_id=exam_id)
+        for score in scores:
+            stats.add_score(score)
+        stats.save()
+
+
+def record_session_opened(session):
+    """Count a session its examinee just opened, for the exam and the examinee."""
+    _increment(ExamStatistics, 'exam_id', [session.exam_id], session_count=F('session_count') + 1)
+    update_user_summaries([session.examinee_id], exams_taken=1)
+
+
+def update_user_summaries(user_ids, score=None, touch=True, **deltas):
+    """
+    Add ``deltas`` (``exams_taken=1`` ...) to the summaries of ``user_ids``.
+
+    ``score`` counts one completed exam with that score. A user listed twice
+    is counted twice. ``touch`` sets their last activity to now.
+    """
+    if score is not None:
+        deltas['exams_completed'] = deltas.get('exams_completed', 0) + 1
+        deltas['score_total'] = deltas.get('score_total', 0) + score
+    by_times = {}
+    for user_id, times in Counter(user_ids).items():
+        by_times.setdefault(times, []).append(user_id)
+    for times, ids in by_times.items():
+        # Counters never go below zero, even when they drifted (e.g. exams published in the admin).
+        updates = {
+            field: F(field) + delta * times if delta >= 0 else Greatest(F(field) + delta * times, 0)
+            for field, delta in deltas.items()
+        }
+        if touch:
+            updates['last_activity_at'] = timezone.now()
+        _increment(UserSummary, 'user_id', ids, **updates)
+
+
+def get_exam_statistics(exam):
+    """Return the statistics row of an exam, or an empty unsaved one."""
+    try:
+        return exam.statistics
+    except ExamStatistics.DoesNotExist:
+        return ExamStatistics(exam=exam)
+
+
+def get_exam_totals():
+    """
+    ``{'total': ..., 'published': ...}`` exams, summed from the summaries of
+    the users who created any (an index covers exactly those rows).
+    """
+    return UserSummary.objects.filter(exams_created__gt=0).aggregate(
+        total=Coalesce(Sum('exams_created'), 0),
+        published=Coalesce(Sum('exams_published'), 0),
+    )
+
+
+def get_user_summary(user):
+    """Return the summary row of a user, or an empty unsaved one."""
+    try:
+        return UserSummary.objects.get(user=user)
+    except UserSummary.DoesNotExist:
+        return UserSummary(user=user)
+
+
+def rebuild_exam_statistics(exam, chunk_size=2000):
+    """Recompute an exam's statistics from its sessions."""
+    with transaction.atomic():
+        stats, _ = ExamStatistics.objects.select_for_update().get_or_create(exam=exam)
+        stats.reset()
+        stats.session_count = ExamSession.objects.filter(exam=exam, provisioned=False).count()
+        scores = ExamSession.objects.filter(exam=exam, is_submitted=True).values_list('score', flat=True)
+        for score in scores.iterator(chunk_size=chunk_size):
+            stats.add_score(score)
+        stats.save()
+    return stats
+
+
+def rebuild_user_summary(user):
+    """Recompute a user's summary from their sessions and exams."""
+    taken = ExamSession.objects.filter(examinee=user, provisioned=False).aggregate(
+        exams_taken=Count('id'),
+        exams_completed=Count('id', filter=Q(is_submitted=True)),
+        score_total=Sum('score', filter=Q(is_submitted=True)),
+        last_started=Max('started_at'),
+        last_completed=Max('completed_at'),
+    )
+    created = Exam.objects.filter(examiner=user).aggregate(
+        exams_created=Count('id'),
+        exams_published=Count('id', filter=Q(is_published=True)),
+        last_created=Max('created_at'),
+    )
+    activity = [taken['last_started'], taken['last_completed'], created['last_created']]
+    summary, _ = UserSummary.objects.update_or_create(user=user, defaults={
+        'exams_taken': taken['exams_taken'],
+        'exams_completed': taken['exams_completed'],
+        'score_total': taken['score_total'] or 0,
+        'exams_created': created['exams_created'],
+        'exams_published': created['exams_published'],
+        'last_activity_at': max((when for when in activity if when), default=None),
+    })
+    return summary
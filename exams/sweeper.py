@@ -0,0 +1,158 @@
+"""
+Auto-submit sweeper for expired exam sessions.
+
+Sessions whose time ran out are found with one query on the partial
+``(expires_at, id) WHERE NOT is_submitted`` index, graded in memory from their
+saved answers (database rows overlaid with the autosave buffer) and finalized
+in batches. Sessions with the same tally get the same score, so each batch
+costs one session UPDATE and one user summary UPDATE per distinct
+``(total_questions, total_correct)`` pair, one bulk upsert of the answers and
+one statistics update per exam.
+"""
+import logging
+import threading
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .answer_buffer import discard_many, get_buffered_answers_many
+from .sampling import get_answer_keys
+from .grading import answer_rows, grade_answers, score_graded, upsert_answers
+from .models import Answer, Exam, ExamSession
+from .stats import record_scores, update_user_summaries
+
+logger = logging.getLogger(__name__)
+
+SWEEP_BATCH_SIZE = getattr(settings, 'EXAM_SWEEP_BATCH_SIZE', 1000)
+SWEEP_INTERVAL = getattr(settings, 'EXAM_SWEEP_INTERVAL', 60)
+SWEEP_IN_PROCESS = getattr(settings, 'EXAM_SWEEP_IN_PROCESS', True)
+# Leave expired sessions alone this long so in-flight submits and autosaves land first.
+SWEEP_GRACE = getattr(settings, 'EXAM_SWEEP_GRACE_SECONDS', 30)
+
+SWEEP_LOCK_KEY = 'exams:sweeper:lock'
+
+
+def expired_sessions(now=None):
+    """Open sessions whose time ran out before ``now`` minus the grace period."""
+    now = now or timezone.now()
+    cutoff = now - timezone.timedelta(seconds=SWEEP_GRACE)
+    return ExamSession.objects.filter(is_submitted=False, expires_at__lte=cutoff).order_by('expires_at', 'id')
+
+
+def sweep_batch(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Auto-submit up to ``batch_size`` expired sessions in one transaction.
+
+    Provisioned sessions that were never opened are no-shows and are deleted
+    rather than graded. Returns the number of expired sessions processed.
+    """
+    with transaction.atomic():
+        sessions = list(
+            expired_sessions(now)
+            .select_for_update(skip_locked=True)
+            .only('id', 'exam_id', 'examinee_id', 'provisioned')[:batch_size]
+        )
+        if not sessions:
+            return 0
+        processed = len(sessions)
+
+        no_shows = [session.pk for session in sessions if session.provisioned]
+        if no_shows:
+            ExamSession.objects.filter(pk__in=no_shows).delete()
+            sessions = [session for session in sessions if not session.provisioned]
+        session_ids = [session.pk for session in sessions]
+
+        exams = Exam.objects.in_bulk({session.exam_id for session in sessions})
+        answer_keys = get_answer_keys(exams, {session.pk: session.exam_id for session in sessions})
+        saved = {session_id: {} for session_id in session_ids}
+        stored = (
+            Answer.objects.filter(session_id__in=session_ids)
+            .exclude(chosen_choice=None)
+            .values_list('session_id', 'question_id', 'chosen_choice_id')
+        )
+        for session_id, question_id, choice_id in stored:
+            saved[session_id][question_id] = choice_id
+        for session_id, answers in get_buffered_answers_many(answer_keys).items():
+            saved[session_id].update(answers)
+
+        rows = []
+        scores = {}
+        tallies = {}
+        for session in sessions:
+            graded = grade_answers(answer_keys[session.pk], saved[session.pk])
+            tally = score_graded(graded)
+            tallies.setdefault(tally, []).append(session)
+            rows.extend(answer_rows(session.pk, graded))
+            scores.setdefault(session.exam_id, []).append(tally[2])
+
+        for (total_questions, total_correct, score), tallied in tallies.items():
+            ExamSession.objects.filter(pk__in=[session.pk for session in tallied]).update(
+                is_submitted=True,
+                # The session ended when its time ran out, not when it was swept.
+                completed_at=F('expires_at'),
+                total_questions=total_questions,
+                total_correct=total_correct,
+                score=score,
+            )
+            # The examinees were not active; their last activity stays as it was.
+            update_user_summaries([session.examinee_id for session in tallied], score=score, touch=False)
+        upsert_answers(rows, batch_size=batch_size)
+        for exam_id, exam_scores in scores.items():
+            transaction.on_commit(partial(record_scores, exam_id, exam_scores))
+        transaction.on_commit(lambda: discard_many(answer_keys))
+    return processed
+
+
+def sweep(now=None, batch_size=SWEEP_BATCH_SIZE):
+    """
+    Auto-submit every expired session, one batch at a time.
+
+    Only one sweeper runs at a time across all processes sharing the cache.
+    Returns the number of expired sessions processed.
+    """
+    if not cache.add(SWEEP_LOCK_KEY, True, max(SWEEP_INTERVAL * 5, 300)):
+        return 0
+    try:
+        now = now or timezone.now()
+        submitted = 0
+        while True:
+            swept = sweep_batch(now, batch_size)
+            submitted += swept
+            if swept < batch_size:
+                return submitted
+    finally:
+        cache.delete(SWEEP_LOCK_KEY)
+
+
+def run_sweeper(interval=SWEEP_INTERVAL, stop_event=None):
+    """Sweep every ``interval`` seconds until ``stop_event`` is set."""
+    stop_event = stop_event or threading.Event()
+    while not stop_event.wait(interval):
+        close_old_connections()
+        try:
+            submitted = sweep()
+            if submitted:
+                logger.info("Processed %d expired exam sessions", submitted)
+        except Exception:
+            logger.exception("Expired session sweep failed")
+        finally:
+            close_old_connections()
+
+
+_sweeper = None
+_sweeper_lock = threading.Lock()
+
+
+def ensure_sweeper():
+    """Start the in-process background sweeper once per process, if enabled."""
+    global _sweeper
+    if not SWEEP_IN_PROCESS or (_sweeper is not None and _sweeper.is_alive()):
+        return
+    with _sweeper_lock:
+        if _sweeper is None or not _sweeper.is_alive():
+            _sweeper = threading.Thread(target=run_sweeper, name='expired-session-sweeper', daemon=True)
+            _sweeper.start()
@@ -1,3 +1,969 @@
-from django.test import TestCase
+import csv
+import json
+import random
+import re
+import statistics
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from django.contrib.auth import BACKEND_SESSION_KEY, SESSION_KEY, get_user_model
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import RequestFactory, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+
+from accounts.backends import EmailOrUsernameModelBackend
+from config.metrics import render_metrics
+from config.sessions import DURABLE_EXPIRY_KEY, DURABLE_REFRESH, KEY_PREFIX, SessionStore
+
+from . import analysis, export
+from .models import (
+    Answer, Choice, Exam, ExamRegistration, ExamSession, ExamStatistics, Question, QuestionBand, QuestionBank,
+    QuestionSignature, SamplingRule, Tag, UserSummary,
+)
+from .stats import rebuild_exam_statistics, rebuild_user_summary, record_scores
+from .answer_buffer import buffer_answers, discard, flush, get_buffered_answers, get_saved_answers
+from .cache import get_answer_key, get_exam_paper
+from .forms import QuestionWithChoicesForm
+from .grading import grade_answers, score_graded, submit_session
+from .importer import import_bank_questions, import_questions, iter_csv_rows, parse_difficulty, parse_tags
+from .pagination import decode_cursor, encode_cursor, paginate
+from .prewarm import prewarm
+from .sampling import RulesLocked, draw_question_ids, get_session_paper, update_exam_rules
+from .search import search_questions
+from .shuffle import paper_order, shuffle_choices
+from .sweeper import SWEEP_BATCH_SIZE, expired_sessions, sweep
+
+User = get_user_model()
+
+BARE_SCAN = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+
+
+@skipUnless(connection.vendor == 'sqlite', "Query plans are checked with SQLite's EXPLAIN QUERY PLAN")
+class QueryPlanTests(TestCase):
+    """
+    Run the hot views against a seeded database and EXPLAIN every SELECT they
+    issue. A plan that reads a large table without an index (a bare
+    ``SCAN <table>``) fails the test.
+    """
+    EXAMINERS = 3
+    EXAMS_PER_EXAMINER = 15
+    QUESTIONS_PER_EXAM = 20
+    CHOICES_PER_QUESTION = 4
+    EXAMINEES = 120
+    EXAMS_PER_EXAMINEE = 5
+
+    LARGE_TABLES = {
+        model._meta.db_table for model in (
+            User, Exam, Question, Question.tags.through, QuestionSignature, QuestionBand, Choice, ExamSession, Answer,
+        )
+    }
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role=User.Role.ADMIN)
+        examiners = User.objects.bulk_create([
+            User(username=f'examiner{i}', email=f'examiner{i}@example.com', role=User.Role.EXAMINER)
+            for i in range(cls.EXAMINERS)
+        ])
+        examinees = User.objects.bulk_create([
+            User(username=f'examinee{i}', email=f'examinee{i}@example.com', role=User.Role.EXAMINEE)
+            for i in range(cls.EXAMINEES + 1)
+        ])
+        cls.examiner = examiners[0]
+        cls.examinee = examinees[0]
+        cls.new_examinee = examinees[-1]
+
+        exams = Exam.objects.bulk_create([
+            Exam(
+                title=f'Exam {examiner.pk}-{i}', examiner=examiner, code=f'E{examiner.pk:03d}{i:04d}',
+                num_questions=cls.QUESTIONS_PER_EXAM, is_published=True, results_published=True,
+            )
+            for examiner in examiners
+            for i in range(cls.EXAMS_PER_EXAMINER)
+        ])
+        questions = Question.objects.bulk_create([
+            Question(exam=exam, text=f'Question {order}?', order=order)
+            for exam in exams
+            for order in range(1, cls.QUESTIONS_PER_EXAM + 1)
+        ])
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=f'Choice {c}', is_correct=c == 0)
+            for question in questions
+            for c in range(cls.CHOICES_PER_QUESTION)
+        ])
+        questions_by_exam = {}
+        for question in questions:
+            questions_by_exam.setdefault(question.exam_id, []).append(question)
+        first_choice = {choice.question_id: choice for choice in reversed(choices)}
+
+        now = timezone.now()
+        sessions = ExamSession.objects.bulk_create([
+            ExamSession(
+                exam=exams[(n + k) % len(exams)], examinee=examinee, started_at=now,
+                completed_at=now, is_submitted=True, score=100,
+                total_correct=cls.QUESTIONS_PER_EXAM, total_questions=cls.QUESTIONS_PER_EXAM,
+            )
+            for n, examinee in enumerate(examinees[:-1])
+            for k in range(cls.EXAMS_PER_EXAMINEE)
+        ])
+        Answer.objects.bulk_create([
+            Answer(
+                session=session, question=question,
+                chosen_choice=first_choice[question.pk], is_correct=True,
+            )
+            for session in sessions
+            for question in questions_by_exam[session.exam_id]
+        ])
+        # Both exams belong to cls.examiner
+        cls.exam = exams[0]
+        cls.open_exam = exams[cls.EXAMS_PER_EXAMINER - 1]
+        for exam in (cls.exam, cls.open_exam):
+            rebuild_exam_statistics(exam)
+        for user in (cls.examiner, cls.examinee):
+            rebuild_user_summary(user)
+
+        # Give the planner real table statistics, as a production database would have.
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def setUp(self):
+        cache.clear()
+
+    def assertNoFullScans(self, user, url, method='get', data=None):
+        self.client.force_login(user)
+        with CaptureQueriesContext(connection) as queries:
+            response = getattr(self.client, method)(url, data or {})
+        self.assertLess(response.status_code, 400, url)
+
+        for query in queries.captured_queries:
+            if query['sql'].lstrip().upper().startswith('SELECT'):
+                self.assertIndexedPlan(query['sql'], url)
+        return response
+
+    def assertIndexedPlan(self, sql, label, params=None):
+        with connection.cursor() as cursor:
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            for row in cursor.fetchall():
+                match = BARE_SCAN.match(row[-1])
+                if match and match.group(1) in self.LARGE_TABLES:
+                    self.fail(f'{label}: full scan of {match.group(1)}:\n{sql}')
+
+    def test_dashboards(self):
+        self.assertNoFullScans(self.admin, reverse('exams:dashboard'))
+        self.assertNoFullScans(self.examiner, reverse('exams:dashboard'))
+        self.assertNoFullScans(self.examinee, reverse('exams:dashboard'))
+
+    def test_dashboard_reads_summaries(self):
+        session_table = ExamSession._meta.db_table
+        exam_table = Exam._meta.db_table
+        for user, table in ((self.examinee, session_table), (self.examiner, exam_table)):
+            self.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(reverse('exams:dashboard'))
+            # No aggregate over the user's history; counts come from the summary row
+            self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'] and f'"{table}"' in q['sql']])
+            self.assertEqual(response.context['summary'].pk, user.pk)
+        self.assertEqual(response.context['summary'].exams_created, self.EXAMS_PER_EXAMINER)
+
+        # The admin's totals and an exam's session count come from the maintained rows too
+        for examiner in User.objects.filter(role=User.Role.EXAMINER):
+            rebuild_user_summary(examiner)
+        contexts = []
+        for user, url, table in (
+            (self.admin, reverse('exams:dashboard'), exam_table),
+            (self.examiner, reverse('exams:exam_detail', args=[self.exam.pk]), session_table),
+        ):
+            self.client.force_login(user)
+            with CaptureQueriesContext(connection) as queries:
+                contexts.append(self.client.get(url).context)
+            self.assertFalse([q['sql'] for q in queries if 'COUNT(' in q['sql'] and f'"{table}"' in q['sql']])
+        exams = self.EXAMINERS * self.EXAMS_PER_EXAMINER
+        self.assertEqual(contexts[0]['exam_counts'], {'total': exams, 'published': exams})
+        self.assertEqual(contexts[1]['session_count'], ExamSession.objects.filter(exam=self.exam).count())
+
+    def test_login_lookup(self):
+        for login in ('Examinee7', 'EXAMINEE7@example.com'):
+            with CaptureQueriesContext(connection) as queries:
+                EmailOrUsernameModelBackend().authenticate(None, username=login, password='wrong')
+            self.assertEqual(len(queries), 1)
+            self.assertIndexedPlan(queries[0]['sql'], f'login {login}')
+
+    def test_request_user_is_cached(self):
+        self.client.force_login(self.examinee)
+        url = reverse('exams:exam_history')
+        self.client.get(url)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(url)
+        user_table = User._meta.db_table
+        self.assertFalse([q['sql'] for q in queries if f'FROM "{user_table}"' in q['sql']])
+
+        # Saving the user drops the cached copy
+        self.examinee.role = User.Role.EXAMINER
+        self.examinee.save()
+        response = self.client.get(reverse('exams:dashboard'))
+        self.assertEqual(response.wsgi_request.user.role, User.Role.EXAMINER)
+
+    def test_exam_lists(self):
+        self.assertNoFullScans(self.examiner, reverse('exams:my_exams'))
+        self.assertNoFullScans(self.examinee, reverse('exams:exam_history'))
+
+    def test_exam_detail_and_questions(self):
+        self.assertNoFullScans(self.examiner, reverse('exams:exam_detail', args=[self.exam.pk]))
+        self.assertNoFullScans(self.examiner, reverse('exams:manage_questions', args=[self.exam.pk]))
+
+    def test_results(self):
+        exam_id = self.exam.pk
+        self.assertNoFullScans(self.examiner, reverse('exams:exam_results', args=[exam_id]))
+        self.assertNoFullScans(self.examiner, reverse('exams:item_analysis', args=[exam_id]))
+        response = self.assertNoFullScans(
+            self.examiner, reverse('exams:export_results', args=[exam_id]), data={'answers': '1'}
+        )
+        b''.join(response.streaming_content)
+
+    def test_session_review(self):
+        session = ExamSession.objects.filter(exam=self.exam).first()
+        self.assertNoFullScans(self.examiner, reverse('exams:session_detail', args=[session.pk]))
+        self.assertNoFullScans(session.examinee, reverse('exams:view_result', args=[self.exam.code]))
+
+    def test_take_autosave_submit(self):
+        code = self.open_exam.code
+        self.assertNoFullScans(self.new_examinee, reverse('exams:take_exam', args=[code]))
+
+        paper_url = reverse('exams:exam_paper', args=[code])
+        response = self.assertNoFullScans(self.new_examinee, paper_url)
+        self.assertNotIn(b'is_correct', response.content)
+        with CaptureQueriesContext(connection) as queries:
+            revalidated = self.client.get(paper_url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertEqual(len(queries), 1)
+
+        question = self.open_exam.questions.order_by('order').first()
+        answers = json.dumps({str(question.pk): str(question.choices.first().pk)})
+        self.assertNoFullScans(
+            self.new_examinee, reverse('exams:autosave_answers', args=[code]), 'post', {'answers': answers}
+        )
+        self.assertNoFullScans(
+            self.new_examinee, reverse('exams:submit_exam', args=[code]), 'post', {'answers': answers}
+        )
+        self.assertTrue(ExamSession.objects.get(exam=self.open_exam, examinee=self.new_examinee).is_submitted)
+
+        summary = UserSummary.objects.get(user=self.new_examinee)
+        self.assertEqual((summary.exams_taken, summary.exams_completed), (1, 1))
+        stats = ExamStatistics.objects.get(exam=self.open_exam)
+        self.assertEqual(stats.session_count, rebuild_exam_statistics(self.open_exam).session_count)
+
+    def test_shuffled_order_is_derived(self):
+        exam = self.exam
+        exam.shuffle_questions = exam.shuffle_choices = True
+        exam.save()
+        session = ExamSession.objects.filter(exam=exam).first()
+        paper = get_exam_paper(exam)
+
+        order = paper_order(paper, exam, session.pk)
+        self.assertEqual(order, paper_order(paper, exam, session.pk))
+        self.assertNotEqual(order, paper_order(paper, exam, session.pk + 1))
+        self.assertEqual(sorted(question_id for question_id, _ in order), sorted(q['id'] for q in paper))
+
+        # Edits leave a started session's order alone; an added question keeps the others' choices
+        exam.bump_version()
+        self.assertEqual(paper_order(get_exam_paper(exam), exam, session.pk), order)
+        added = Question.objects.create(exam=exam, text='Added?')
+        Choice.objects.create(question=added, text='Yes', is_correct=True)
+        exam.bump_version()
+        grown = paper_order(get_exam_paper(exam), exam, session.pk)
+        choices = dict(grown)
+        self.assertEqual(choices.pop(added.pk), [added.choices.get().pk])
+        self.assertEqual(choices, dict(order))
+
+        # The review rebuilds the same order the exam page was given
+        self.client.force_login(session.examinee)
+        response = self.client.get(reverse('exams:view_result', args=[exam.code]))
+        review = [
+            [answer['question']['id'], [choice['id'] for choice in answer['question']['choices']]]
+            for answer in response.context['answers']
+        ]
+        self.assertEqual(review, [entry for entry in grown if entry[0] != added.pk])
+
+    def test_bank_sampling(self):
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        algebra = Tag.objects.create(name='algebra')
+        questions = Question.objects.bulk_create([
+            Question(bank=bank, text=f'Bank question {i}?', difficulty=i % 3 + 1) for i in range(600)
+        ])
+        Choice.objects.bulk_create([
+            Choice(question=question, text=f'Choice {c}', is_correct=c == 0)
+            for question in questions
+            for c in range(self.CHOICES_PER_QUESTION)
+        ])
+        Question.tags.through.objects.bulk_create([
+            Question.tags.through(question=question, tag=algebra) for question in questions[::2]
+        ])
+        # A code of digits only would route to exam_detail
+        exam = Exam.objects.create(title='Drawn', code='DRAWN001', examiner=self.examiner, is_published=True)
+        sampling_url = reverse('exams:exam_sampling', args=[exam.pk])
+        for rule in ({'tag': algebra.pk, 'count': 10}, {'difficulty': Question.HARD, 'count': 5}):
+            self.assertNoFullScans(self.examiner, sampling_url, 'post', {'bank': bank.pk, **rule})
+        exam.refresh_from_db()
+        self.assertEqual((exam.draws_from_bank, exam.num_questions), (True, 15))
+
+        code = exam.code
+        self.assertNoFullScans(self.new_examinee, reverse('exams:take_exam', args=[code]))
+        session = ExamSession.objects.get(exam=exam, examinee=self.new_examinee)
+        response = self.assertNoFullScans(self.new_examinee, reverse('exams:exam_paper', args=[code]))
+        drawn = [question['id'] for question in json.loads(response.content)['questions']]
+
+        # Rebuilt from the seed alone, and different for another session
+        cache.clear()
+        self.assertEqual(draw_question_ids(exam, session.pk), drawn)
+        self.assertNotEqual(draw_question_ids(exam, session.pk + 1), drawn)
+        self.assertEqual(len(set(drawn)), 15)
+        drawn_questions = Question.objects.in_bulk(drawn)
+        self.assertTrue(all(drawn_questions[pk].tags.filter(pk=algebra.pk).exists() for pk in drawn[:10]))
+        self.assertTrue(all(drawn_questions[pk].difficulty == Question.HARD for pk in drawn[10:]))
+
+        # Edits leave the draw alone, and the rules are locked once taken
+        self.client.force_login(self.examiner)
+        self.client.post(reverse('exams:edit_exam', args=[exam.pk]), {'title': 'Renamed', 'duration_minutes': 30})
+        exam.refresh_from_db()
+        self.assertEqual(exam.title, 'Renamed')
+        self.assertEqual(draw_question_ids(exam, session.pk), drawn)
+        self.client.post(sampling_url, {'bank': bank.pk, 'count': 1})
+        self.client.post(sampling_url, {'action': 'refresh'})
+        exam.refresh_from_db()
+        self.assertEqual((exam.sampling_rules.count(), exam.num_questions), (2, 15))
+        self.assertEqual(draw_question_ids(exam, session.pk), drawn)
+
+        # Only drawn questions are accepted and graded
+        undrawn = next(question for question in questions if question.pk not in drawn)
+        answers = {pk: drawn_questions[pk].choices.first().pk for pk in drawn[:3]}
+        answers[undrawn.pk] = undrawn.choices.first().pk
+        answers = json.dumps({str(pk): str(choice_id) for pk, choice_id in answers.items()})
+        self.assertNoFullScans(
+            self.new_examinee, reverse('exams:submit_exam', args=[code]), 'post', {'answers': answers}
+        )
+        session.refresh_from_db()
+        self.assertEqual((session.total_questions, session.total_correct), (3, 3))
+
+    def test_question_search(self):
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        Question.objects.bulk_create([
+            Question(bank=bank, text=f'Filler question {i} about nothing?') for i in range(500)
+        ] + [
+            Question(bank=bank, text='Which gas do plants absorb for photosynthesis?'),
+            Question(bank=bank, text='Photosynthesis in plants: where does photosynthesis happen?'),
+        ])
+        other_bank = QuestionBank.objects.create(name='Other', owner=User.objects.get(username='examiner1'))
+        Question.objects.create(bank=other_bank, text='Photosynthesis: what is produced?')
+
+        url = reverse('exams:search_questions')
+        response = self.assertNoFullScans(self.examiner, url, data={'q': 'photosynthesis PLANT'})
+        self.assertEqual(
+            [question.text for question in response.context['results']],
+            [
+                'Photosynthesis in plants: where does photosynthesis happen?',
+                'Which gas do plants absorb for photosynthesis?',
+            ],
+        )
+        self.assertEqual(len(search_questions('photosynthesis')[0]), 3)
+
+        # Kept in sync by every write path
+        question = Question.objects.get(text__startswith='Which gas')
+        question.text = 'Which gas do leaves absorb?'
+        question.save()
+        self.assertEqual(len(search_questions('plants', owner=self.examiner)[0]), 1)
+        self.assertEqual(search_questions('leaves', bank=bank)[0], [question])
+        question.delete()
+        self.assertEqual(search_questions('leaves')[0], [])
+        exam_question = Question.objects.filter(exam=self.open_exam).first()
+        exam_question.text = 'Name the leaves of a fern.'
+        exam_question.save()
+        self.assertEqual(search_questions('ferns', exam=self.open_exam)[0], [exam_question])
+        self.assertEqual(search_questions('ferns', bank=bank)[0], [])
+
+    def test_duplicate_preview(self):
+        rng = random.Random(0)
+        words = [''.join(rng.choices('abcdefghijklmnopqrstuvwxyz', k=6)) for _ in range(500)]
+        texts = [f"What is the {' '.join(rng.choices(words, k=10))}?" for _ in range(400)]
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        import_bank_questions(bank, [{'question': text, 'option_1': 'Yes', 'correct_answer': '1'} for text in texts])
+        other_bank = QuestionBank.objects.create(name='Other', owner=User.objects.get(username='examiner1'))
+        import_bank_questions(other_bank, [{'question': 'Is this question owned by someone else?'}])
+
+        rows = [
+            texts[0].upper().replace('?', ' ?'),
+            texts[1].replace('What is the', 'What is a'),
+            'A question that is entirely new?',
+            'a question that is entirely new',
+            'Is this question owned by someone else?',
+        ]
+        upload = SimpleUploadedFile('questions.csv', '\n'.join(['question', *rows]).encode())
+        response = self.assertNoFullScans(
+            self.examiner, reverse('exams:bank_detail', args=[bank.pk]), 'post', {'preview': '', 'csv_file': upload}
+        )
+        report = response.context['report']
+        self.assertEqual((report.rows, report.exact, report.near, report.new), (5, 2, 1, 2))
+        exact, near_duplicate, repeated = report.duplicates
+        self.assertEqual((exact.row, exact.exact, exact.match.text), (1, True, texts[0]))
+        self.assertEqual((near_duplicate.row, near_duplicate.exact, near_duplicate.match.text), (2, False, texts[1]))
+        self.assertGreaterEqual(near_duplicate.similarity, 0.8)
+        self.assertEqual((repeated.row, repeated.exact, repeated.match_row), (4, True, 3))
+        self.assertEqual(bank.questions.count(), len(texts))
+
+    def test_expired_session_sweep(self):
+        sql, params = expired_sessions()[:SWEEP_BATCH_SIZE].query.sql_with_params()
+        self.assertIndexedPlan(sql, 'sweeper', params)
+
+    def test_prewarm(self):
+        Exam.objects.filter(pk=self.open_exam.pk).update(start_time=timezone.now() + timezone.timedelta(minutes=5))
+        ExamRegistration.objects.bulk_create([
+            ExamRegistration(exam=self.open_exam, examinee=examinee)
+            for examinee in User.objects.filter(role=User.Role.EXAMINEE)[:50]
+        ])
+        missing = ExamRegistration.objects.filter(exam=self.open_exam).exclude(
+            examinee__exam_sessions__exam=self.open_exam
+        )
+        expected = missing.count()
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(prewarm()[1], expected)
+        self.assertFalse(missing.exists())
+        for query in queries.captured_queries:
+            if query['sql'].lstrip().upper().startswith('SELECT'):
+                self.assertIndexedPlan(query['sql'], 'prewarm')
+        self.assertEqual(prewarm(), (0, 0))
+
+        # An examinee arriving 20 minutes late still gets the whole duration
+        session = ExamSession.objects.filter(exam=self.open_exam, provisioned=True).select_related('examinee').first()
+        self.open_exam.refresh_from_db()
+        self.open_exam.start_time = timezone.now() - timezone.timedelta(minutes=20)
+        self.open_exam.save()
+        self.open_exam.update_session_expiry()
+        self.client.force_login(session.examinee)
+        before = timezone.now()
+        self.assertEqual(self.client.get(reverse('exams:take_exam', args=[self.open_exam.code])).status_code, 200)
+        session.refresh_from_db()
+        self.assertFalse(session.provisioned)
+        self.assertGreaterEqual(session.started_at, before)
+        self.assertEqual(session.expires_at, self.open_exam.session_expiry(session.started_at))
+
+
+class BehaviourTests(TestCase):
+    """The results the hot paths compute, on a small exam of four questions with three choices each."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = User.objects.create_user('admin', 'admin@example.com', 'pw', role=User.Role.ADMIN)
+        cls.examiner = User.objects.create_user('examiner', 'examiner@example.com', 'pw', role=User.Role.EXAMINER)
+        cls.examinees = [
+            User.objects.create_user(f'examinee{i}', f'examinee{i}@example.com', 'pw', role=User.Role.EXAMINEE)
+            for i in range(4)
+        ]
+        cls.examinee = cls.examinees[0]
+        cls.exam = Exam.objects.create(
+            title='Behaviour', code='BEHAVE01', examiner=cls.examiner, num_questions=4,
+            is_published=True, results_published=True,
+        )
+        cls.questions = Question.objects.bulk_create([
+            Question(exam=cls.exam, text=f'Question {order}?', order=order) for order in range(1, 5)
+        ])
+        choices = Choice.objects.bulk_create([
+            Choice(question=question, text=f'Choice {c}', is_correct=c == 0)
+            for question in cls.questions
+            for c in range(3)
+        ])
+        cls.right = {choice.question_id: choice.pk for choice in choices if choice.is_correct}
+        cls.wrong = {choice.question_id: choice.pk for choice in reversed(choices) if choice.text == 'Choice 1'}
+
+    def setUp(self):
+        cache.clear()
+
+    def open_session(self, examinee, **fields):
+        fields.setdefault('started_at', timezone.now())
+        return ExamSession.objects.create(exam=self.exam, examinee=examinee, **fields)
+
+    def submit(self, examinee, answers):
+        session = self.open_session(examinee)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(submit_session(session, answers))
+        return session
+
+    def test_grading(self):
+        q1, q2, q3, q4 = (question.pk for question in self.questions)
+        answer_key = get_answer_key(self.exam)
+        graded = grade_answers(answer_key, {
+            str(q1): str(self.right[q1]), str(q2): self.wrong[q2],
+            # Foreign choices and unknown questions are dropped
+            str(q3): str(self.right[q4]), 'q4': '1',
+        })
+        self.assertEqual(graded, {q1: (self.right[q1], True), q2: (self.wrong[q2], False)})
+        self.assertEqual(score_graded(graded), (2, 1, 50))
+        self.assertEqual(score_graded({}), (0, 0, 0))
+
+        answers = {q1: self.right[q1], q2: self.right[q2], q3: self.right[q3], q4: self.wrong[q4]}
+        session = self.submit(self.examinee, answers)
+        session.refresh_from_db()
+        self.assertTrue(session.is_submitted)
+        self.assertEqual((session.total_questions, session.total_correct, session.score), (4, 3, 75))
+        self.assertEqual(
+            dict(session.answers.values_list('question_id', 'is_correct')), {q1: True, q2: True, q3: True, q4: False}
+        )
+        # A second submit grades nothing
+        self.assertFalse(submit_session(session, {q4: self.right[q4]}))
+        session.refresh_from_db()
+        self.assertEqual(session.score, 75)
+        stats = ExamStatistics.objects.get(exam=self.exam)
+        self.assertEqual((stats.count, stats.mean), (1, 75))
+
+    def test_question_form(self):
+        data = {'question_text': 'Edited?', 'order': 1, 'choice_2_correct': 'on'}
+        data.update({f'choice_{i}_text': f'Option {i}' for i in range(1, 6)})
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        version = self.exam.version
+        for question in (self.questions[0], Question.objects.create(bank=bank, text='Bank question?')):
+            form = QuestionWithChoicesForm(data, question=question)
+            self.assertTrue(form.is_valid(), form.errors)
+            form.save()
+            question.refresh_from_db()
+            self.assertEqual(question.text, 'Edited?')
+            self.assertEqual([choice.text for choice in question.choices.filter(is_correct=True)], ['Option 2'])
+        # Editing an exam question invalidates the cached paper
+        self.assertEqual(Exam.objects.get(pk=self.exam.pk).version, version + 1)
+
+    def test_csv_import(self):
+        upload = SimpleUploadedFile('questions.csv', (
+            '\ufeffquestion,option_1,option_2,option_3,correct_answer\n'
+            + ''.join(f'Imported {i}?,Yes,No,Maybe,{i % 3 + 1}\n' for i in range(4))
+            + '"Commas, and ""quotes""?",One,Two,,2\n'
+        ).encode())
+        exam = Exam.objects.create(title='Imported', code='IMPORT01', examiner=self.examiner)
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(import_questions(exam, iter_csv_rows(upload), batch_size=2, start_order=3), 5)
+        question_table = Question._meta.db_table
+        inserts = [query for query in queries if query['sql'].startswith(f'INSERT INTO "{question_table}"')]
+        self.assertEqual(len(inserts), 3)
+
+        questions = list(exam.questions.order_by('order').prefetch_related('choices'))
+        self.assertEqual([question.order for question in questions], [3, 4, 5, 6, 7])
+        self.assertEqual(questions[-1].text, 'Commas, and "quotes"?')
+        self.assertEqual(
+            [[(choice.text, choice.is_correct) for choice in question.choices.order_by('id')] for question in questions],
+            [
+                [('Yes', True), ('No', False), ('Maybe', False)],
+                [('Yes', False), ('No', True), ('Maybe', False)],
+                [('Yes', False), ('No', False), ('Maybe', True)],
+                [('Yes', True), ('No', False), ('Maybe', False)],
+                [('One', False), ('Two', True)],
+            ],
+        )
+
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        rows = [
+            {'question': 'Easy one?', 'option_1': 'A', 'option_2': 'B', 'correct_answer': '1',
+             'difficulty': 'Easy', 'tags': 'Algebra; geometry'},
+            {'question': 'Hard one?', 'option_1': 'A', 'option_2': 'B', 'correct_answer': '2',
+             'difficulty': '3', 'tags': 'algebra,'},
+            {'question': 'Plain?', 'option_1': 'A', 'option_2': 'B', 'correct_answer': '1'},
+        ]
+        self.assertEqual(import_bank_questions(bank, rows, batch_size=2), 3)
+        imported = {question.text: question for question in bank.questions.prefetch_related('tags')}
+        self.assertEqual(
+            {text: (question.difficulty, sorted(tag.name for tag in question.tags.all()))
+             for text, question in imported.items()},
+            {
+                'Easy one?': (Question.EASY, ['algebra', 'geometry']),
+                'Hard one?': (Question.HARD, ['algebra']),
+                'Plain?': (Question.MEDIUM, []),
+            },
+        )
+        self.assertEqual(parse_tags(' Algebra ;geometry,ALGEBRA;; '), ['algebra', 'geometry'])
+        with self.assertRaises(ValueError):
+            parse_difficulty('tricky')
+
+    def test_answer_buffer(self):
+        q1, q2, q3, _ = (question.pk for question in self.questions)
+        answer_key = get_answer_key(self.exam)
+        session = self.open_session(self.examinee)
+        self.assertEqual(buffer_answers(session, {q1: self.right[q1], q2: self.wrong[q2], q3: 0}, answer_key), 2)
+        self.assertFalse(Answer.objects.filter(session=session).exists())
+        self.assertEqual(get_saved_answers(session, answer_key), {q1: self.right[q1], q2: self.wrong[q2]})
+
+        # A later delta overrides one question and leaves the rest
+        buffer_answers(session, {str(q2): str(self.right[q2])}, answer_key)
+        self.assertEqual(flush(), 2)
+        self.assertEqual(
+            dict(session.answers.values_list('question_id', 'chosen_choice_id')),
+            {q1: self.right[q1], q2: self.right[q2]},
+        )
+        self.assertEqual(flush(), 0)
+
+        # Stored answers are overlaid with newer buffered ones
+        buffer_answers(session, {q1: self.wrong[q1], q3: self.right[q3]}, answer_key)
+        self.assertEqual(
+            get_saved_answers(session, answer_key), {q1: self.wrong[q1], q2: self.right[q2], q3: self.right[q3]}
+        )
+
+        # Nothing is flushed over a submitted session
+        ExamSession.objects.filter(pk=session.pk).update(is_submitted=True)
+        self.assertEqual(flush(), 0)
+        self.assertEqual(session.answers.get(question_id=q1).chosen_choice_id, self.right[q1])
+        discard(session.pk, answer_key)
+        self.assertEqual(get_buffered_answers(session.pk, answer_key), {})
+
+    def test_sweeper(self):
+        now = timezone.now()
+        expired_at = now - timezone.timedelta(minutes=5)
+        answer_key = get_answer_key(self.exam)
+        expired = self.open_session(
+            self.examinees[0], started_at=now - timezone.timedelta(minutes=35), expires_at=expired_at
+        )
+        # One answer flushed earlier, three still in the buffer
+        q1, q2, q3, q4 = (question.pk for question in self.questions)
+        Answer.objects.create(session=expired, question_id=q1, chosen_choice_id=self.right[q1], is_correct=True)
+        buffer_answers(expired, {q2: self.right[q2], q3: self.right[q3], q4: self.wrong[q4]}, answer_key)
+        no_show = self.open_session(self.examinees[1], expires_at=expired_at, provisioned=True)
+        # Still inside the grace period
+        late = self.open_session(self.examinees[2], expires_at=now - timezone.timedelta(seconds=5))
+        running = self.open_session(self.examinees[3])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(sweep(now=now), 2)
+
+        expired.refresh_from_db()
+        self.assertTrue(expired.is_submitted)
+        self.assertEqual(expired.completed_at, expired_at)
+        self.assertEqual((expired.total_questions, expired.total_correct, expired.score), (4, 3, 75))
+        self.assertEqual(expired.answers.filter(is_correct=True).count(), 3)
+        self.assertEqual(get_buffered_answers(expired.pk, answer_key), {})
+        self.assertFalse(ExamSession.objects.filter(pk=no_show.pk).exists())
+        self.assertFalse(ExamSession.objects.filter(pk__in=[late.pk, running.pk], is_submitted=True).exists())
+        stats = ExamStatistics.objects.get(exam=self.exam)
+        self.assertEqual((stats.count, stats.mean), (1, 75))
+        self.assertEqual(UserSummary.objects.get(user=self.examinees[0]).exams_completed, 1)
+
+    def test_running_statistics(self):
+        rng = random.Random(7)
+        scores = [round(rng.uniform(0, 100), 2) for _ in range(200)] + [0, 100]
+        stats = ExamStatistics(exam=self.exam)
+        for score in scores:
+            stats.add_score(score)
+        self.assertEqual(stats.count, len(scores))
+        self.assertAlmostEqual(stats.mean, statistics.fmean(scores))
+        self.assertAlmostEqual(stats.variance, statistics.pvariance(scores))
+        self.assertAlmostEqual(stats.std_dev, statistics.pstdev(scores))
+        self.assertEqual((stats.min_score, stats.max_score), (0, 100))
+        self.assertEqual(stats.pass_count, sum(score >= 70 for score in scores))
+        self.assertEqual(sum(stats.histogram), len(scores))
+
+        # Folded in over several transactions, and rebuilt from the sessions
+        record_scores(self.exam.pk, scores[:150])
+        record_scores(self.exam.pk, scores[150:])
+        stored = ExamStatistics.objects.get(exam=self.exam)
+        self.assertAlmostEqual(stored.mean, statistics.fmean(scores))
+        self.assertAlmostEqual(stored.variance, statistics.pvariance(scores))
+        self.assertEqual(stored.histogram, stats.histogram)
+
+        for examinee, score in zip(self.examinees, (25, 50, 100)):
+            self.open_session(examinee, is_submitted=True, completed_at=timezone.now(), score=score)
+        rebuilt = rebuild_exam_statistics(self.exam)
+        self.assertEqual(rebuilt.count, 3)
+        self.assertAlmostEqual(rebuilt.mean, statistics.fmean([25, 50, 100]))
+        self.assertAlmostEqual(rebuilt.variance, statistics.pvariance([25, 50, 100]))
+
+    @skipUnless(analysis.AVAILABLE, 'Item analysis needs numpy')
+    def test_item_analysis(self):
+        np = analysis.np
+        # Two questions of two choices; the last session omitted the first question
+        key = np.array([[True, False], [False, True]])
+        chosen = np.array([[0, 1], [0, 0], [1, 1], [-1, 0]])
+        result = analysis.analyze_responses(chosen, key)
+        self.assertEqual(result['sessions'], 4)
+        self.assertEqual(result['mean_score'], 1.0)
+        self.assertEqual(result['difficulty'].tolist(), [0.5, 0.5])
+        self.assertEqual(result['discrimination'].tolist(), [0.0, 0.0])
+        self.assertEqual(result['frequencies'].tolist(), [[2, 1], [2, 2]])
+        self.assertEqual(result['omitted'].tolist(), [1, 0])
+        self.assertAlmostEqual(result['kr20'], 0.0)
+
+        rng = np.random.default_rng(3)
+        questions, choices = 6, 4
+        key = np.zeros((questions, choices), dtype=bool)
+        key[np.arange(questions), np.arange(questions) % choices] = True
+        chosen = rng.integers(-1, choices, size=(50, questions))
+        scored = ((chosen >= 0) & key[np.arange(questions), chosen.clip(0)]).astype(float)
+        totals = scored.sum(axis=1)
+        rest = totals[:, None] - scored
+        p = scored.mean(axis=0)
+        result = analysis.analyze_responses(chosen, key)
+        np.testing.assert_allclose(result['difficulty'], p)
+        np.testing.assert_allclose(
+            result['discrimination'], [np.corrcoef(scored[:, q], rest[:, q])[0, 1] for q in range(questions)]
+        )
+        self.assertAlmostEqual(
+            result['kr20'], questions / (questions - 1) * (1 - (p * (1 - p)).sum() / totals.var())
+        )
+
+        # A question not presented to some sessions is judged on the others only
+        presented = np.ones(chosen.shape, dtype=bool)
+        presented[:10, 0] = False
+        chosen[:10, 0] = -1
+        scored[:10, 0] = 0
+        totals = scored.sum(axis=1)
+        rest = totals[:, None] - scored
+        result = analysis.analyze_responses(chosen, key, presented)
+        self.assertEqual(result['given'][0], 40)
+        self.assertEqual(result['omitted'][0], (chosen[10:, 0] < 0).sum())
+        self.assertAlmostEqual(result['difficulty'][0], scored[10:, 0].mean())
+        self.assertAlmostEqual(result['discrimination'][0], np.corrcoef(scored[10:, 0], rest[10:, 0])[0, 1])
+        self.assertIsNone(result['kr20'])
+
+        # End to end: one examinee right throughout, one wrong throughout
+        self.submit(self.examinees[0], self.right)
+        self.submit(self.examinees[1], self.wrong)
+        item_analysis = analysis.get_item_analysis(self.exam)
+        self.assertEqual(
+            (item_analysis['sessions'], item_analysis['paper_length'], item_analysis['mean_score']), (2, 4, 2.0)
+        )
+        self.assertAlmostEqual(item_analysis['kr20'], 1.0)
+        first = item_analysis['items'][0]
+        self.assertEqual((first['difficulty'], first['discrimination'], first['omitted']), (0.5, 1.0, 0))
+        self.assertEqual([choice['count'] for choice in first['choices']], [1, 1, 0])
+        self.assertEqual([choice['percent'] for choice in first['choices']], [50, 50, 0])
+
+    def test_result_export(self):
+        self.submit(self.examinees[0], self.right)
+        first_two = [question.pk for question in self.questions[:2]]
+        self.submit(self.examinees[1], {pk: self.wrong[pk] for pk in first_two})
+
+        rows = list(export.iter_result_rows(self.exam, include_answers=True, chunk_size=1))
+        self.assertEqual(
+            rows[0], ['Student', 'Email', 'Started', 'Completed', 'Score', 'Correct', 'Answered', 'Q1', 'Q2', 'Q3', 'Q4']
+        )
+        self.assertEqual(
+            [row[:2] + row[4:] for row in rows[1:]],
+            [
+                ['examinee0', 'examinee0@example.com', 100, 4, 4, 'A', 'A', 'A', 'A'],
+                ['examinee1', 'examinee1@example.com', 0, 0, 2, 'B', 'B', '', ''],
+            ],
+        )
+        self.assertRegex(rows[1][3], r'^\d{4}-\d\d-\d\d \d\d:\d\d:\d\d$')
+        self.assertEqual(
+            list(csv.reader(''.join(export.iter_csv(rows)).splitlines())),
+            [[str(value) for value in row] for row in rows],
+        )
+        self.assertEqual(len(next(export.iter_result_rows(self.exam))), 7)
+
+        # With shuffled choices each answer is the letter its examinee saw
+        self.exam.shuffle_choices = True
+        self.exam.save(update_fields=['shuffle_choices'])
+        session = ExamSession.objects.get(exam=self.exam, examinee=self.examinees[0])
+        seen = []
+        for question in get_exam_paper(self.exam):
+            shown = [choice['id'] for choice in shuffle_choices(question, self.exam, session.pk)]
+            seen.append('ABC'[shown.index(self.right[question['id']])])
+        self.assertNotEqual(seen, ['A'] * 4)
+        rows = list(export.iter_result_rows(self.exam, include_answers=True))
+        self.assertEqual(rows[1][7:], seen)
+
+    def test_cursor_pagination(self):
+        when = timezone.now()
+        self.assertEqual(decode_cursor(encode_cursor(when, 42)), (when, 42))
+        for malformed in ('', 'not a cursor', encode_cursor(when, 42)[:-3], '%%%'):
+            self.assertIsNone(decode_cursor(malformed))
+
+        Exam.objects.bulk_create([
+            Exam(title=f'Paged {i}', code=f'PAGED{i:03d}', examiner=self.examiner) for i in range(6)
+        ])
+        exams = Exam.objects.filter(examiner=self.examiner)
+        # Ties on created_at are broken by id
+        pks = sorted(exams.values_list('pk', flat=True))
+        exams.filter(pk__in=pks[:4]).update(created_at=when)
+        exams.filter(pk__in=pks[4:]).update(created_at=when + timezone.timedelta(seconds=1))
+        expected = list(exams.order_by('-created_at', '-id'))
+
+        factory = RequestFactory()
+        pages = [paginate(factory.get('/'), exams, 'created_at', page_size=3)]
+        while pages[-1].has_next:
+            pages.append(paginate(factory.get('/', {'cursor': pages[-1].next_cursor}), exams, 'created_at', 3))
+        self.assertEqual([len(page) for page in pages], [3, 3, 1])
+        self.assertEqual([exam for page in pages for exam in page], expected)
+        self.assertFalse(pages[0].has_previous)
+
+        back = [pages[-1]]
+        while back[-1].has_previous:
+            back.append(paginate(factory.get('/', {'cursor': back[-1].previous_cursor}), exams, 'created_at', 3))
+        self.assertEqual([list(page) for page in back], [list(page) for page in reversed(pages)])
+        self.assertEqual(list(paginate(factory.get('/', {'cursor': 'a!!'}), exams, 'created_at', 3)), expected[:3])
+
+    def test_metrics(self):
+        labels = json.dumps
+        text = render_metrics({
+            ('http_requests_total', labels([['method', 'GET'], ['status', '2xx'], ['view', 'exams:dashboard']])): 3,
+            ('http_request_duration_seconds_bucket', labels([['le', '0.01'], ['view', 'exams:dashboard']])): 2,
+            ('http_request_duration_seconds_bucket', labels([['le', '0.5'], ['view', 'exams:dashboard']])): 1,
+            ('http_request_duration_seconds_sum', labels([['view', 'exams:dashboard']])): 0.25,
+            ('http_request_duration_seconds_count', labels([['view', 'exams:dashboard']])): 3,
+        })
+        lines = text.splitlines()
+        self.assertIn('# TYPE http_requests_total counter', lines)
+        self.assertIn('http_requests_total{method="GET",status="2xx",view="exams:dashboard"} 3', lines)
+        self.assertIn('# TYPE http_request_duration_seconds histogram', lines)
+        buckets = [line for line in lines if line.startswith('http_request_duration_seconds_bucket')]
+        self.assertEqual(
+            [line.rsplit(' ', 1)[1] for line in buckets], ['0', '2', '2', '2', '2', '2', '3', '3', '3', '3', '3', '3']
+        )
+        self.assertEqual(buckets[-1], 'http_request_duration_seconds_bucket{view="exams:dashboard",le="+Inf"} 3')
+        self.assertIn('http_request_duration_seconds_sum{view="exams:dashboard"} 0.25', lines)
+        self.assertIn('http_request_duration_seconds_count{view="exams:dashboard"} 3', lines)
+
+        url = reverse('metrics')
+        outside = {'REMOTE_ADDR': '203.0.113.9'}
+        self.assertEqual(self.client.get(url, **outside).status_code, 403)
+        self.assertEqual(self.client.get(url, REMOTE_ADDR='127.0.0.1').status_code, 200)
+        with mock.patch('config.metrics.METRICS_TOKEN', 'scrape-token'):
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer scrape-token', **outside).status_code, 200)
+            self.assertEqual(self.client.get(url, HTTP_AUTHORIZATION='Bearer guess', **outside).status_code, 403)
+        self.client.force_login(self.examinee)
+        self.assertEqual(self.client.get(url, **outside).status_code, 403)
+        self.client.force_login(self.admin)
+        response = self.client.get(url, **outside)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '# TYPE http_requests_total counter')
+
+    async def test_async_exam_views(self):
+        q1, q2, q3, q4 = (question.pk for question in self.questions)
+        code = self.exam.code
+        anonymous = await self.async_client.get(reverse('exams:exam_heartbeat', args=[code]))
+        self.assertEqual(anonymous.status_code, 302)
+
+        await sync_to_async(self.open_session)(self.examinee)
+        await sync_to_async(self.async_client.force_login)(self.examinee)
+
+        paper_url = reverse('exams:exam_paper', args=[code])
+        paper = await self.async_client.get(paper_url)
+        self.assertEqual(paper.status_code, 200)
+        self.assertEqual([question['id'] for question in paper.json()['questions']], [q1, q2, q3, q4])
+        revalidated = await self.async_client.get(paper_url, headers={'If-None-Match': paper['ETag']})
+        self.assertEqual(revalidated.status_code, 304)
+
+        autosave_url = reverse('exams:autosave_answers', args=[code])
+        response = await self.async_client.post(
+            autosave_url, {'answers': json.dumps({str(q1): str(self.right[q1]), str(q2): 'x'})}
+        )
+        self.assertEqual(response.json(), {'success': True, 'saved': 1})
+        response = await self.async_client.post(autosave_url, {'answers': '[1, 2]'})
+        self.assertEqual(response.json(), {'success': False, 'error': 'Invalid answers format'})
+
+        heartbeat = (await self.async_client.get(reverse('exams:exam_heartbeat', args=[code]))).json()
+        self.assertEqual((heartbeat['is_active'], heartbeat['is_submitted']), (True, False))
+        self.assertTrue(0 < heartbeat['remaining_seconds'] <= self.exam.duration_minutes * 60)
+
+        # The autosaved answer is graded along with the ones posted at submit
+        submit_url = reverse('exams:submit_exam', args=[code])
+        answers = {str(q2): self.right[q2], str(q3): self.right[q3], str(q4): self.wrong[q4]}
+        response = await self.async_client.post(submit_url, {'answers': json.dumps(answers)})
+        self.assertEqual(
+            response.json(), {'success': True, 'score': 75, 'total_correct': 3, 'total_questions': 4}
+        )
+        response = await self.async_client.post(submit_url, {'answers': json.dumps(answers)})
+        self.assertEqual(response.json(), {'success': False, 'error': 'Exam already submitted'})
+        self.assertEqual(await Answer.objects.filter(session__examinee=self.examinee, is_correct=True).acount(), 3)
+        heartbeat = (await self.async_client.get(reverse('exams:exam_heartbeat', args=[code]))).json()
+        self.assertEqual((heartbeat['is_active'], heartbeat['is_submitted']), (False, True))
+        self.assertEqual((await self.async_client.get(paper_url)).status_code, 403)
+
+    def test_paper_only_while_open(self):
+        session = self.open_session(self.examinee)
+        self.client.force_login(self.examinee)
+        paper_url = reverse('exams:exam_paper', args=[self.exam.code])
+        self.assertEqual(self.client.get(paper_url).status_code, 200)
+
+        closed = {'end_time': timezone.now() - timezone.timedelta(minutes=1)}
+        for change in ({'is_published': False}, closed):
+            Exam.objects.filter(pk=self.exam.pk).update(**change)
+            response = self.client.get(paper_url)
+            self.assertEqual(response.status_code, 403)
+            self.assertEqual(response.json()['error'], 'This exam is not open')
+            Exam.objects.filter(pk=self.exam.pk).update(is_published=True, end_time=None)
+
+        ExamSession.objects.filter(pk=session.pk).update(expires_at=timezone.now())
+        self.assertEqual(self.client.get(paper_url).json()['error'], 'Exam session expired')
+
+    def test_session_engine(self):
+        store = SessionStore()
+        store[SESSION_KEY] = str(self.examinee.pk)
+        store[BACKEND_SESSION_KEY] = 'accounts.backends.EmailOrUsernameModelBackend'
+        store['last_exam'] = self.exam.code
+        store.save()
+        # Only the login is written to the database
+        self.assertEqual(
+            Session.objects.get(session_key=store.session_key).get_decoded(),
+            {SESSION_KEY: str(self.examinee.pk), BACKEND_SESSION_KEY: 'accounts.backends.EmailOrUsernameModelBackend'},
+        )
+
+        with CaptureQueriesContext(connection) as queries:
+            session = SessionStore(store.session_key)
+            self.assertEqual(session['last_exam'], self.exam.code)
+            session['last_exam'] = 'OTHER01'
+            session.save()
+            session.save()
+        self.assertEqual(len(queries), 0)
+
+        # A session kept in use long enough moves the expiry of its database row forward
+        cache_key = KEY_PREFIX + store.session_key
+        data = cache.get(cache_key)
+        data[DURABLE_EXPIRY_KEY] -= DURABLE_REFRESH + 1
+        cache.set(cache_key, data)
+        Session.objects.filter(session_key=store.session_key).update(expire_date=timezone.now())
+        session = SessionStore(store.session_key)
+        session['last_exam'] = self.exam.code
+        session.save()
+        self.assertGreater(
+            Session.objects.get(session_key=store.session_key).expire_date,
+            timezone.now() + timezone.timedelta(seconds=session.get_expiry_age() - 60),
+        )
+
+        # Losing the cache loses the cache-only keys, not the login
+        cache.clear()
+        restored = SessionStore(store.session_key)
+        self.assertEqual(restored[SESSION_KEY], str(self.examinee.pk))
+        self.assertNotIn('last_exam', restored)
+
+        self.client.force_login(self.examinee)
+        cache.clear()
+        response = self.client.get(reverse('exams:dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.wsgi_request.user, self.examinee)
+
+    def test_drawn_paper_survives_edits(self):
+        bank = QuestionBank.objects.create(name='Bank', owner=self.examiner)
+        import_bank_questions(bank, [
+            {'question': f'Bank question {i}?', 'option_1': 'A', 'option_2': 'B', 'option_3': 'C', 'correct_answer': '1'}
+            for i in range(30)
+        ])
+        exam = Exam.objects.create(
+            title='Drawn', code='DRAWN002', examiner=self.examiner, is_published=True,
+            shuffle_questions=True, shuffle_choices=True,
+        )
+        SamplingRule.objects.create(exam=exam, bank=bank, count=8)
+        update_exam_rules(exam)
+        session = ExamSession.objects.create(exam=exam, examinee=self.examinee, started_at=timezone.now())
+        drawn = draw_question_ids(exam, session.pk)
+        order = paper_order(get_session_paper(exam, session.pk), exam, session.pk)
+        self.assertEqual(len(set(drawn)), 8)
+        self.assertEqual(sorted(question_id for question_id, _ in order), sorted(drawn))
+
+        # A new paper version (an edit) changes neither the draw nor the order
+        exam.bump_version()
+        cache.clear()
+        exam = Exam.objects.get(pk=exam.pk)
+        self.assertEqual(draw_question_ids(exam, session.pk), drawn)
+        self.assertEqual(paper_order(get_session_paper(exam, session.pk), exam, session.pk), order)
+
+        with self.assertRaises(RulesLocked):
+            update_exam_rules(exam)
+        exam.refresh_from_db()
+        self.assertEqual(draw_question_ids(exam, session.pk), drawn)
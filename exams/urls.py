@@ -17,16 +17,28 @@ urlpatterns = [
     path('exam/<int:exam_id>/delete-all-questions/', views.delete_all_questions, name='delete_all_questions'),
     path('exam/<int:exam_id>/question/<int:question_id>/edit/', views.edit_question, name='edit_question'),
     path('exam/<int:exam_id>/question/<int:question_id>/delete/', views.delete_question, name='delete_question'),
+    path('exam/<int:exam_id>/sampling/', views.exam_sampling, name='exam_sampling'),
+    path('exam/<int:exam_id>/sampling/<int:rule_id>/delete/', views.delete_sampling_rule, name='delete_sampling_rule'),
     path('exam/<int:exam_id>/publish/', views.publish_exam, name='publish_exam'),
     path('exam/<int:exam_id>/results/', views.exam_results, name='exam_results'),
+    path('exam/<int:exam_id>/results/export/', views.export_results, name='export_results'),
+    path('exam/<int:exam_id>/item-analysis/', views.item_analysis, name='item_analysis'),
     path('exam/<int:exam_id>/publish-results/', views.publish_results, name='publish_results'),
     
+    # Question banks (Examiner)
+    path('banks/', views.question_banks, name='question_banks'),
+    path('banks/<int:bank_id>/', views.bank_detail, name='bank_detail'),
+    path('questions/search/', views.search_questions, name='search_questions'),
+    
     # Exam taking (Examinee)
     path('join-exam/', views.join_exam, name='join_exam'),
     path('pending/<str:exam_code>/', views.exam_pending, name='exam_pending'),
     path('exam/<str:exam_code>/', views.take_exam, name='take_exam'),
     path('exam/<str:exam_code>/start/', views.start_exam, name='start_exam'),
+    path('exam/<str:exam_code>/paper/', views.exam_paper, name='exam_paper'),
+    path('exam/<str:exam_code>/autosave/', views.autosave_answers, name='autosave_answers'),
     path('exam/<str:exam_code>/submit/', views.submit_exam, name='submit_exam'),
+    path('exam/<str:exam_code>/heartbeat/', views.exam_heartbeat, name='exam_heartbeat'),
     path('exam/<str:exam_code>/result/', views.view_result, name='view_result'),
     
     # History and results
@@ -1,14 +1,64 @@
-import csv
-import io
+import json
+import tempfile
+from functools import wraps
+from asgiref.sync import sync_to_async
 from django.shortcuts import render, get_object_or_404, redirect
+from django.contrib.auth import get_user
 from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import Http404, JsonResponse, HttpResponse, StreamingHttpResponse, FileResponse
+from django.urls import reverse
 from django.utils import timezone
+from django.utils.cache import get_conditional_response
 from django.db import transaction
+from django.db.models import Avg, Count, Q
 from django.core.exceptions import PermissionDenied
-from .models import Exam, Question, Choice, ExamSession, Answer
-from .forms import ExamForm, QuestionUploadForm, QuestionWithChoicesForm
+from .models import Exam, Question, ExamSession, ExamRegistration, ExamStatistics, QuestionBank, SamplingRule, Tag
+from .forms import (
+    BankUploadForm, ExamForm, QuestionBankForm, QuestionUploadForm, QuestionWithChoicesForm, SamplingRuleForm,
+)
+from . import analysis, export, search
+from .answer_buffer import abuffer_answers, adiscard, aget_saved_answers, get_saved_answers
+from .cache import get_exam_paper
+from .duplicates import find_duplicates
+from .grading import submit_session
+from .importer import import_bank_questions, import_questions, iter_csv_rows
+from .pagination import paginate
+from .prewarm import open_provisioned_session
+from .sampling import (
+    RulesLocked, aget_session_answer_key, aget_session_paper_json, get_session_answer_key, get_session_paper, is_taken,
+    refresh_bank_rules, refresh_rules, session_paper_etag, update_exam_rules,
+)
+from .shuffle import paper_order, shuffle_paper
+from .stats import get_exam_statistics, get_exam_totals, get_user_summary, record_session_opened, update_user_summaries
+from .sweeper import ensure_sweeper
+
+
+def alogin_required(view_func):
+    """
+    ``login_required`` for async views (Django's only wraps coroutines from 5.1).
+
+    The user is loaded once in a thread and replaces the lazy ``request.user``,
+    which must not be evaluated in an async context.
+    """
+    @wraps(view_func)
+    async def wrapper(request, *args, **kwargs):
+        request.user = await sync_to_async(get_user)(request)
+        if not request.user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        return await view_func(request, *args, **kwargs)
+    return wrapper
+
+
+async def aget_object_or_404(queryset, **kwargs):
+    """``get_object_or_404`` for async views (in ``django.shortcuts`` from Django 5.0)."""
+    if not hasattr(queryset, 'aget'):
+        queryset = queryset._default_manager.all()
+    try:
+        return await queryset.aget(**kwargs)
+    except queryset.model.DoesNotExist:
+        raise Http404(f"No {queryset.model._meta.object_name} matches the given query.")
 
 
 def home(request):
@@ -25,23 +75,27 @@ def dashboard(request):
     
     if user.is_admin():
         # Admin dashboard
-        exams = Exam.objects.all().order_by('-created_at')
+        exams = Exam.objects.select_related('examiner')
         context = {
-            'exams': exams,
+            'exams': paginate(request, exams, 'created_at'),
+            # Summed from the examiners' summaries rather than counted over every exam
+            'exam_counts': get_exam_totals(),
             'user_role': 'admin'
         }
     elif user.is_examiner():
-        # Examiner dashboard
-        exams = Exam.objects.filter(examiner=user).order_by('-created_at')
+        # Examiner dashboard: counts come from the user summary and each exam's statistics row
+        exams = Exam.objects.filter(examiner=user).select_related('statistics')
         context = {
-            'exams': exams,
+            'exams': paginate(request, exams, 'created_at'),
+            'summary': get_user_summary(user),
             'user_role': 'examiner'
         }
     else:
         # Examinee dashboard
-        sessions = ExamSession.objects.filter(examinee=user).order_by('-started_at')
+        sessions = ExamSession.objects.filter(examinee=user).select_related('exam')
         context = {
-            'sessions': sessions,
+            'sessions': paginate(request, sessions, 'started_at'),
+            'summary': get_user_summary(user),
             'user_role': 'examinee'
         }
     
@@ -60,6 +114,7 @@ def create_exam(request):
             exam = form.save(commit=False)
             exam.examiner = request.user
             exam.save()
+            update_user_summaries([request.user.pk], exams_created=1)
             messages.success(request, f'Exam "{exam.title}" created successfully!')
             return redirect('exams:exam_detail', exam_id=exam.id)
     else:
@@ -77,13 +132,17 @@ def exam_detail(request, exam_id):
     if not (request.user.is_admin() or exam.examiner == request.user):
         raise PermissionDenied("You don't have permission to view this exam.")
     
-    questions = exam.questions.all().order_by('order')
-    sessions = exam.sessions.all().order_by('-started_at')
+    questions = get_exam_paper(exam)
+    sessions = exam.sessions.select_related('examinee')
+    stats = get_exam_statistics(exam)
     
     context = {
         'exam': exam,
         'questions': questions,
-        'sessions': sessions,
+        'sessions': paginate(request, sessions, 'started_at', page_size=10),
+        'session_count': stats.session_count,
+        'stats': stats,
+        'sampling_rules': exam.sampling_rules.select_related('bank', 'tag').defer('candidate_ids') if exam.draws_from_bank else [],
     }
     return render(request, 'exams/exam_detail.html', context)
 
@@ -100,6 +159,9 @@ def edit_exam(request, exam_id):
         form = ExamForm(request.POST, instance=exam)
         if form.is_valid():
             form.save()
+            exam.bump_version()
+            if {'duration_minutes', 'start_time'} & set(form.changed_data):
+                exam.update_session_expiry()
             messages.success(request, 'Exam updated successfully!')
             return redirect('exams:exam_detail', exam_id=exam.id)
     else:
@@ -116,52 +178,35 @@ def upload_questions(request, exam_id):
     if not (request.user.is_admin() or exam.examiner == request.user):
         raise PermissionDenied("You don't have permission to upload questions for this exam.")
     
+    report = None
     if request.method == 'POST':
         form = QuestionUploadForm(request.POST, request.FILES)
         if form.is_valid():
             csv_file = request.FILES['csv_file']
             
-            # Read CSV file
+            # Stream the CSV file in batches
             try:
-                decoded_file = csv_file.read().decode('utf-8')
-                io_string = io.StringIO(decoded_file)
-                reader = csv.DictReader(io_string)
-                
-                questions_created = 0
-                with transaction.atomic():
-                    for row in reader:
-                        # Create question
-                        question = Question.objects.create(
-                            exam=exam,
-                            text=row['question'],
-                            order=questions_created + 1
-                        )
+                if 'preview' in request.POST:
+                    # Report duplicates of the examiner's questions, without importing
+                    report = find_duplicates(iter_csv_rows(csv_file), exam.examiner)
+                    form = QuestionUploadForm()
+                else:
+                    with transaction.atomic():
+                        questions_created = import_questions(exam, iter_csv_rows(csv_file))
                         
-                        # Create choices
-                        for i in range(1, 6):  # 5 choices (A, B, C, D, E)
-                            choice_text = row.get(f'option_{i}', '')
-                            if choice_text:
-                                is_correct = row.get('correct_answer', '').strip() == str(i)
-                                Choice.objects.create(
-                                    question=question,
-                                    text=choice_text,
-                                    is_correct=is_correct
-                                )
-                        
-                        questions_created += 1
-                
-                exam.num_questions = questions_created
-                exam.save()
-                
-                messages.success(request, f'Successfully uploaded {questions_created} questions!')
-                return redirect('exams:exam_detail', exam_id=exam.id)
+                        exam.num_questions = questions_created
+                        exam.bump_version()
+                        exam.save()
+                    
+                    messages.success(request, f'Successfully uploaded {questions_created} questions!')
+                    return redirect('exams:exam_detail', exam_id=exam.id)
                 
             except Exception as e:
                 messages.error(request, f'Error processing CSV file: {str(e)}')
     else:
         form = QuestionUploadForm()
     
-    return render(request, 'exams/upload_questions.html', {'form': form, 'exam': exam})
+    return render(request, 'exams/upload_questions.html', {'form': form, 'exam': exam, 'report': report})
 
 
 def join_exam(request):
@@ -187,6 +232,8 @@ def join_exam(request):
                 return redirect('exams:join_exam')
             
             if exam.start_time and now < exam.start_time:
+                # Known examinees get a session pre-provisioned before the exam starts
+                ExamRegistration.objects.get_or_create(exam=exam, examinee=request.user)
                 # Store exam info in session for display
                 request.session['pending_exam'] = {
                     'title': exam.title,
@@ -269,29 +316,53 @@ def take_exam(request, exam_code):
         messages.info(request, 'You have already submitted this exam.')
         return redirect('exams:view_result', exam_code=exam_code)
     
+    if session.provisioned:
+        # First visit to a session created ahead of the start
+        created = open_provisioned_session(session, now)
+    
     if not session.is_active():
         messages.error(request, 'Your exam session has expired.')
         return redirect('exams:join_exam')
     
-    questions = exam.questions.all().order_by('order')
+    if created:
+        record_session_opened(session)
     
+    ensure_sweeper()
     context = {
         'exam': exam,
         'session': session,
-        'questions': questions,
+        # The page is a shell; the script fetches the paper from exam_paper.
+        'exam_config': {
+            'code': exam.code,
+            'started_at': session.started_at.isoformat(),
+            'duration_seconds': exam.duration_minutes * 60,
+            # Versioned so a browser never reuses the paper of an edited exam
+            'paper_url': f"{reverse('exams:exam_paper', args=[exam.code])}?v={exam.version}",
+            'autosave_url': reverse('exams:autosave_answers', args=[exam.code]),
+            'submit_url': reverse('exams:submit_exam', args=[exam.code]),
+            'heartbeat_url': reverse('exams:exam_heartbeat', args=[exam.code]),
+            'result_url': reverse('exams:view_result', args=[exam.code]),
+            'order': paper_order(get_session_paper(exam, session.pk), exam, session.pk),
+        },
+        'saved_answers': get_saved_answers(session, get_session_answer_key(exam, session.pk)),
     }
     return render(request, 'exams/take_exam.html', context)
 
 
-@login_required
-def start_exam(request, exam_code):
+# The examinee hot path below is async: under ASGI (PRODUCTION_DEPLOYMENT.md) an
+# examinee waiting on the cache or database no longer holds a worker.
+
+@alogin_required
+async def start_exam(request, exam_code):
     """Start the exam (AJAX endpoint)"""
-    exam = get_object_or_404(Exam, code=exam_code)
-    session, created = ExamSession.objects.get_or_create(
+    exam = await aget_object_or_404(Exam, code=exam_code)
+    session, created = await ExamSession.objects.aget_or_create(
         exam=exam,
         examinee=request.user,
         defaults={'started_at': timezone.now()}
     )
+    if created:
+        await sync_to_async(record_session_opened)(session)
     
     return JsonResponse({
         'success': True,
@@ -301,14 +372,73 @@ def start_exam(request, exam_code):
     })
 
 
-@login_required
-def submit_exam(request, exam_code):
+@alogin_required
+async def exam_paper(request, exam_code):
+    """The examinee-facing paper as JSON, revalidated by ETag (AJAX endpoint)"""
+    # Only examinees who opened the exam through take_exam, which checks the schedule
+    session = await aget_object_or_404(
+        ExamSession.objects.select_related('exam'), exam__code=exam_code, examinee=request.user, provisioned=False
+    )
+    exam = session.exam
+    # The same checks as take_exam: no paper once the exam is closed or the session is over
+    now = timezone.now()
+    if not exam.is_published or (exam.end_time and now > exam.end_time) or (exam.start_time and now < exam.start_time):
+        return JsonResponse({'success': False, 'error': 'This exam is not open'}, status=403)
+    if session.is_submitted:
+        return JsonResponse({'success': False, 'error': 'Exam already submitted'}, status=403)
+    if not session.is_active():
+        return JsonResponse({'success': False, 'error': 'Exam session expired'}, status=403)
+
+    etag = session_paper_etag(exam, session.pk)
+    # A revalidation that matches costs this one query and no paper at all
+    response = get_conditional_response(request, etag=etag)
+    if response is None:
+        response = HttpResponse(await aget_session_paper_json(exam, session.pk), content_type='application/json')
+    response['ETag'] = etag
+    # Usually the same bytes for every examinee, but browsers must check access before reusing them
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+async def _aget_session(request, exam_code):
+    """The user's session for an exam, with the exam, in one query."""
+    return await aget_object_or_404(
+        ExamSession.objects.select_related('exam'), exam__code=exam_code, examinee=request.user
+    )
+
+
+@alogin_required
+async def autosave_answers(request, exam_code):
+    """Save answer deltas while the exam is in progress (AJAX endpoint)"""
+    if request.method != 'POST':
+        return JsonResponse({'success': False, 'error': 'Invalid request method'})
+    
+    session = await _aget_session(request, exam_code)
+    
+    if session.is_submitted:
+        return JsonResponse({'success': False, 'error': 'Exam already submitted'})
+    
+    if not session.is_active():
+        return JsonResponse({'success': False, 'error': 'Exam session expired'})
+    
+    try:
+        answers = json.loads(request.POST.get('answers', '{}'))
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid answers format'})
+    if not isinstance(answers, dict):
+        return JsonResponse({'success': False, 'error': 'Invalid answers format'})
+    
+    saved = await abuffer_answers(session, answers, await aget_session_answer_key(session.exam, session.pk))
+    return JsonResponse({'success': True, 'saved': saved})
+
+
+@alogin_required
+async def submit_exam(request, exam_code):
     """Submit exam answers"""
     if request.method != 'POST':
         return JsonResponse({'success': False, 'error': 'Invalid request method'})
     
-    exam = get_object_or_404(Exam, code=exam_code)
-    session = get_object_or_404(ExamSession, exam=exam, examinee=request.user)
+    session = await _aget_session(request, exam_code)
     
     if session.is_submitted:
         return JsonResponse({'success': False, 'error': 'Exam already submitted'})
@@ -318,54 +448,70 @@ def submit_exam(request, exam_code):
     
     # Process answers
     answers_data = request.POST.get('answers', '{}')
-    import json
     try:
         answers = json.loads(answers_data)
-    except:
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Invalid answers format'})
+    if not isinstance(answers, dict):
         return JsonResponse({'success': False, 'error': 'Invalid answers format'})
     
-    total_correct = 0
-    total_questions = 0
+    # Grading from the buffer merged over the database forces a flush of this session;
+    # answers posted now win over anything autosaved earlier
+    answer_key = await aget_session_answer_key(session.exam, session.pk)
+    saved_answers = await aget_saved_answers(session, answer_key)
+    saved_answers.update(answers)
     
-    with transaction.atomic():
-        for question_id, choice_id in answers.items():
-            try:
-                question = Question.objects.get(id=question_id, exam=exam)
-                choice = Choice.objects.get(id=choice_id, question=question)
-                
-                is_correct = choice.is_correct
-                if is_correct:
-                    total_correct += 1
-                
-                Answer.objects.update_or_create(
-                    session=session,
-                    question=question,
-                    defaults={
-                        'chosen_choice': choice,
-                        'is_correct': is_correct
-                    }
-                )
-                total_questions += 1
-                
-            except (Question.DoesNotExist, Choice.DoesNotExist):
-                continue
-        
-        # Update session
-        session.is_submitted = True
-        session.completed_at = timezone.now()
-        session.total_questions = total_questions
-        session.total_correct = total_correct
-        session.score = (total_correct / total_questions * 100) if total_questions > 0 else 0
-        session.save()
+    # Django has no async transactions; the grading transaction runs in a thread
+    if not await sync_to_async(submit_session)(session, saved_answers, answer_key=answer_key):
+        return JsonResponse({'success': False, 'error': 'Exam already submitted'})
+    await adiscard(session.pk, answer_key)
     
     return JsonResponse({
         'success': True,
         'score': session.score,
-        'total_correct': total_correct,
-        'total_questions': total_questions
+        'total_correct': session.total_correct,
+        'total_questions': session.total_questions
     })
 
 
+@alogin_required
+async def exam_heartbeat(request, exam_code):
+    """Server-side time left for the exam timer (AJAX endpoint)"""
+    session = await aget_object_or_404(
+        ExamSession.objects.only('is_submitted', 'expires_at'), exam__code=exam_code, examinee=request.user
+    )
+    remaining = None
+    if session.expires_at:
+        remaining = max(0, int((session.expires_at - timezone.now()).total_seconds()))
+    
+    return JsonResponse({
+        'success': True,
+        'is_submitted': session.is_submitted,
+        'is_active': session.is_active(),
+        'remaining_seconds': remaining,
+        'server_time': timezone.now().isoformat()
+    })
+
+
+def _answer_review(exam, session):
+    """Pair a session's answers with the cached paper, in the order the session saw it."""
+    answers = {
+        question_id: (chosen_choice_id, is_correct)
+        for question_id, chosen_choice_id, is_correct
+        in session.answers.values_list('question_id', 'chosen_choice_id', 'is_correct')
+    }
+    review = []
+    for question in shuffle_paper(get_session_paper(exam, session.pk), exam, session.pk):
+        if question['id'] in answers:
+            chosen_choice_id, is_correct = answers[question['id']]
+            review.append({
+                'question': question,
+                'chosen_choice_id': chosen_choice_id,
+                'is_correct': is_correct,
+            })
+    return review
+
+
 @login_required
 def view_result(request, exam_code):
     """View exam result"""
@@ -381,12 +527,10 @@ def view_result(request, exam_code):
         messages.info(request, 'Results are not yet published by the examiner. Please wait for the examiner to publish the results.')
         return redirect('exams:exam_history')
     
-    answers = session.answers.all().select_related('question', 'chosen_choice')
-    
     context = {
         'exam': exam,
         'session': session,
-        'answers': answers,
+        'answers': _answer_review(exam, session),
     }
     return render(request, 'exams/view_result.html', context)
 
@@ -397,8 +541,18 @@ def exam_history(request):
     if not request.user.is_examinee() and not request.user.is_admin():
         raise PermissionDenied("Only examinees can view exam history.")
     
-    sessions = ExamSession.objects.filter(examinee=request.user, is_submitted=True).select_related('exam').order_by('-completed_at')
-    return render(request, 'exams/exam_history.html', {'sessions': sessions})
+    sessions = ExamSession.objects.filter(examinee=request.user)
+    summary = sessions.aggregate(
+        total=Count('id'),
+        completed=Count('id', filter=Q(is_submitted=True)),
+        average=Avg('score', filter=Q(is_submitted=True)),
+        passed=Count('id', filter=Q(is_submitted=True, score__gte=ExamStatistics.pass_mark())),
+    )
+    sessions = sessions.filter(is_submitted=True, completed_at__isnull=False).select_related('exam__examiner')
+    return render(request, 'exams/exam_history.html', {
+        'sessions': paginate(request, sessions, 'completed_at'),
+        'summary': summary,
+    })
 
 
 @login_required
@@ -409,7 +563,7 @@ def manage_questions(request, exam_id):
     if not (request.user.is_admin() or exam.examiner == request.user):
         raise PermissionDenied("You don't have permission to manage questions for this exam.")
     
-    questions = exam.questions.all().order_by('order')
+    questions = exam.questions.all().order_by('order').prefetch_related('choices')
     
     if request.method == 'POST':
         # Handle question reordering or deletion
@@ -436,6 +590,7 @@ def delete_all_questions(request, exam_id):
             
             # Update exam question count
             exam.num_questions = 0
+            exam.bump_version()
             exam.save()
         
         messages.success(request, f'Successfully deleted {questions_count} questions from "{exam.title}".')
@@ -492,6 +647,7 @@ def delete_question(request, exam_id, question_id):
         
         # Update exam question count
         exam.num_questions = exam.questions.count()
+        exam.bump_version()
         exam.save()
         
         messages.success(request, f'Question {question_order} deleted successfully.')
@@ -504,6 +660,179 @@ def delete_question(request, exam_id, question_id):
     })
 
 
+@login_required
+def question_banks(request):
+    """List and create question banks (Examiner only)"""
+    if not request.user.is_examiner() and not request.user.is_admin():
+        raise PermissionDenied("Only examiners can manage question banks.")
+    
+    if request.method == 'POST':
+        form = QuestionBankForm(request.POST)
+        if form.is_valid():
+            bank = form.save(commit=False)
+            bank.owner = request.user
+            bank.save()
+            messages.success(request, f'Question bank "{bank.name}" created successfully!')
+            return redirect('exams:bank_detail', bank_id=bank.id)
+    else:
+        form = QuestionBankForm()
+    
+    banks = QuestionBank.objects.all() if request.user.is_admin() else QuestionBank.objects.filter(owner=request.user)
+    banks = banks.select_related('owner').annotate(question_count=Count('questions')).order_by('-created_at', '-id')
+    return render(request, 'exams/question_banks.html', {'form': form, 'banks': banks})
+
+
+@login_required
+def bank_detail(request, bank_id):
+    """Question bank contents by difficulty and tag, and CSV upload"""
+    bank = get_object_or_404(QuestionBank, id=bank_id)
+    
+    if not (request.user.is_admin() or bank.owner == request.user):
+        raise PermissionDenied("You don't have permission to view this question bank.")
+    
+    report = None
+    if request.method == 'POST':
+        form = BankUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            try:
+                if 'preview' in request.POST:
+                    # Report duplicates of the owner's questions, without importing
+                    report = find_duplicates(iter_csv_rows(request.FILES['csv_file']), bank.owner)
+                    form = BankUploadForm()
+                else:
+                    with transaction.atomic():
+                        questions_created = import_bank_questions(bank, iter_csv_rows(request.FILES['csv_file']))
+                        exams_updated = refresh_bank_rules(bank)
+                    
+                    messages.success(request, f'Successfully uploaded {questions_created} questions!')
+                    if exams_updated:
+                        messages.info(request, f'{exams_updated} exam(s) not taken yet will draw from the new questions.')
+                    return redirect('exams:bank_detail', bank_id=bank.id)
+                
+            except Exception as e:
+                messages.error(request, f'Error processing CSV file: {str(e)}')
+    else:
+        form = BankUploadForm()
+    
+    difficulties = dict(bank.questions.values_list('difficulty').annotate(count=Count('id')).order_by())
+    context = {
+        'bank': bank,
+        'form': form,
+        'report': report,
+        'question_count': sum(difficulties.values()),
+        'difficulties': [(label, difficulties.get(value, 0)) for value, label in Question.DIFFICULTY_CHOICES],
+        'tags': Tag.objects.filter(questions__bank=bank).annotate(count=Count('questions')).order_by('-count', 'name'),
+    }
+    return render(request, 'exams/bank_detail.html', context)
+
+
+@login_required
+def search_questions(request):
+    """Full-text search over the questions of the user's exams and banks (Examiner only)"""
+    if not request.user.is_examiner() and not request.user.is_admin():
+        raise PermissionDenied("Only examiners can search questions.")
+    
+    # Optionally within one exam or bank
+    exam = bank = None
+    if request.GET.get('exam', '').isdigit():
+        exam = get_object_or_404(Exam, id=request.GET['exam'])
+        if not (request.user.is_admin() or exam.examiner == request.user):
+            raise PermissionDenied("You don't have permission to search this exam.")
+    if request.GET.get('bank', '').isdigit():
+        bank = get_object_or_404(QuestionBank, id=request.GET['bank'])
+        if not (request.user.is_admin() or bank.owner == request.user):
+            raise PermissionDenied("You don't have permission to search this question bank.")
+    
+    query = request.GET.get('q', '').strip()
+    page = int(request.GET['page']) if request.GET.get('page', '').isdigit() else 1
+    owner = None if request.user.is_admin() else request.user
+    results, has_next = search.search_questions(query, owner=owner, exam=exam, bank=bank, page=page)
+    
+    def page_url(number):
+        params = request.GET.copy()
+        params['page'] = number
+        return f'?{params.urlencode()}'
+    
+    context = {
+        'query': query,
+        'exam': exam,
+        'bank': bank,
+        'results': results,
+        'page': page,
+        'first_rank': (page - 1) * search.SEARCH_PAGE_SIZE,
+        'previous_url': page_url(page - 1) if page > 1 else None,
+        'next_url': page_url(page + 1) if has_next else None,
+    }
+    return render(request, 'exams/search_questions.html', context)
+
+
+@login_required
+def exam_sampling(request, exam_id):
+    """Draw each examinee's questions from question banks"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    
+    if not (request.user.is_admin() or exam.examiner == request.user):
+        raise PermissionDenied("You don't have permission to manage questions for this exam.")
+    
+    banks = QuestionBank.objects.all() if request.user.is_admin() else QuestionBank.objects.filter(owner=request.user)
+    if request.method == 'POST' and request.POST.get('action') == 'refresh':
+        try:
+            refresh_rules(exam.sampling_rules.all())
+            messages.success(request, 'Sampling rules now draw from the current contents of their banks.')
+        except RulesLocked as e:
+            messages.error(request, str(e))
+        return redirect('exams:exam_sampling', exam_id=exam.id)
+    
+    if request.method == 'POST':
+        form = SamplingRuleForm(request.POST, banks=banks)
+        if form.is_valid():
+            try:
+                with transaction.atomic():
+                    rule = form.save(commit=False)
+                    rule.exam = exam
+                    rule.save()
+                    update_exam_rules(exam)
+            except RulesLocked as e:
+                messages.error(request, str(e))
+                return redirect('exams:exam_sampling', exam_id=exam.id)
+            messages.success(request, f'Each examinee now also draws {rule}.')
+            if len(rule.candidate_ids) < rule.count:
+                messages.warning(request, f'Only {len(rule.candidate_ids)} questions match this rule.')
+            return redirect('exams:exam_sampling', exam_id=exam.id)
+    else:
+        form = SamplingRuleForm(banks=banks)
+    
+    context = {
+        'exam': exam,
+        'form': form,
+        'rules': exam.sampling_rules.select_related('bank', 'tag'),
+        'has_banks': banks.exists(),
+        'taken': is_taken(exam),
+    }
+    return render(request, 'exams/exam_sampling.html', context)
+
+
+@login_required
+def delete_sampling_rule(request, exam_id, rule_id):
+    """Delete a sampling rule"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    rule = get_object_or_404(SamplingRule, id=rule_id, exam=exam)
+    
+    if not (request.user.is_admin() or exam.examiner == request.user):
+        raise PermissionDenied("You don't have permission to manage questions for this exam.")
+    
+    if request.method == 'POST':
+        try:
+            with transaction.atomic():
+                rule.delete()
+                update_exam_rules(exam)
+            messages.success(request, 'Sampling rule deleted successfully.')
+        except RulesLocked as e:
+            messages.error(request, str(e))
+    
+    return redirect('exams:exam_sampling', exam_id=exam.id)
+
+
 @login_required
 def publish_exam(request, exam_id):
     """Publish/unpublish an exam"""
@@ -514,6 +843,9 @@ def publish_exam(request, exam_id):
     
     exam.is_published = not exam.is_published
     exam.save()
+    update_user_summaries(
+        [exam.examiner_id], touch=exam.examiner_id == request.user.pk, exams_published=1 if exam.is_published else -1
+    )
     
     status = "published" if exam.is_published else "unpublished"
     messages.success(request, f'Exam {status} successfully!')
@@ -529,9 +861,63 @@ def exam_results(request, exam_id):
     if not (request.user.is_admin() or exam.examiner == request.user):
         raise PermissionDenied("You don't have permission to view results for this exam.")
     
-    sessions = exam.sessions.filter(is_submitted=True).order_by('-completed_at')
+    sessions = exam.sessions.filter(is_submitted=True, completed_at__isnull=False).select_related('examinee')
+    
+    return render(request, 'exams/exam_results.html', {
+        'exam': exam,
+        'sessions': paginate(request, sessions, 'completed_at'),
+        'stats': get_exam_statistics(exam),
+    })
+
+
+@login_required
+def export_results(request, exam_id):
+    """Download the submitted results of an exam as CSV or XLSX (Examiner)"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    
+    if not (request.user.is_admin() or exam.examiner == request.user):
+        raise PermissionDenied("You don't have permission to export results for this exam.")
+    
+    file_format = request.GET.get('format', 'csv')
+    include_answers = request.GET.get('answers') == '1'
+    filename = f"{exam.code or exam.id}_results.{file_format}"
+    rows = export.iter_result_rows(exam, include_answers=include_answers)
+    
+    if file_format == 'xlsx':
+        if not export.XLSX_AVAILABLE:
+            messages.error(request, 'Excel export requires openpyxl to be installed on the server.')
+            return redirect('exams:exam_results', exam_id=exam.id)
+        # openpyxl needs a seekable file to build the zip; FileResponse closes it when done.
+        tmp = tempfile.TemporaryFile()
+        export.write_xlsx(rows, tmp)
+        tmp.seek(0)
+        return FileResponse(tmp, as_attachment=True, filename=filename)
+    
+    if file_format != 'csv':
+        messages.error(request, 'Unsupported export format.')
+        return redirect('exams:exam_results', exam_id=exam.id)
+    
+    response = StreamingHttpResponse(export.iter_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@login_required
+def item_analysis(request, exam_id):
+    """Per-question difficulty, discrimination and distractor analysis (Examiner)"""
+    exam = get_object_or_404(Exam, id=exam_id)
+    
+    if not (request.user.is_admin() or exam.examiner == request.user):
+        raise PermissionDenied("You don't have permission to view results for this exam.")
+    
+    if not analysis.AVAILABLE:
+        messages.error(request, 'Item analysis requires NumPy to be installed on the server.')
+        return redirect('exams:exam_results', exam_id=exam.id)
     
-    return render(request, 'exams/exam_results.html', {'exam': exam, 'sessions': sessions})
+    return render(request, 'exams/item_analysis.html', {
+        'exam': exam,
+        'analysis': analysis.get_item_analysis(exam),
+    })
 
 
 @login_required
@@ -560,11 +946,9 @@ def session_detail(request, session_id):
             session.exam.examiner == request.user):
         raise PermissionDenied("You don't have permission to view this session.")
     
-    answers = session.answers.all().select_related('question', 'chosen_choice')
-    
     context = {
         'session': session,
-        'answers': answers,
+        'answers': _answer_review(session.exam, session),
     }
     return render(request, 'exams/session_detail.html', context)
 
@@ -575,5 +959,5 @@ def my_exams(request):
     if not request.user.is_examiner() and not request.user.is_admin():
         raise PermissionDenied("Only examiners can view their exams.")
     
-    exams = Exam.objects.filter(examiner=request.user).order_by('-created_at')
+    exams = paginate(request, Exam.objects.filter(examiner=request.user), 'created_at')
     return render(request, 'exams/my_exams.html', {'exams': exams})
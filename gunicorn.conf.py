@@ -1,12 +1,15 @@
 # Gunicorn configuration for MCQ Exam System
+import os
 
 # Server socket
 bind = "127.0.0.1:8000"
 backlog = 2048
 
 # Worker processes
-workers = 3
-worker_class = "sync"
+# GUNICORN_WORKER_CLASS=uvicorn_worker.UvicornWorker serves config.asgi:application
+# with the async exam-taking views; see "ASGI Mode" in PRODUCTION_DEPLOYMENT.md.
+workers = int(os.getenv('GUNICORN_WORKERS', 3))
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', "sync")
 worker_connections = 1000
 timeout = 30
 keepalive = 2
@@ -42,3 +45,10 @@ preload_app = True
 raw_env = [
     'DJANGO_SETTINGS_MODULE=config.settings_production',
 ]
+
+
+def post_worker_init(worker):
+    # Threads do not survive the fork from the preloaded master, so each worker
+    # starts its own exam pre-warm scheduler (warms its cache before start_time).
+    from exams.prewarm import ensure_prewarmer
+    ensure_prewarmer()
@@ -0,0 +1,349 @@
+// Exam page: fetches the paper as JSON (revalidated by ETag, so a reload costs
+// a 304), renders it, and handles the timer, autosave and submission.
+const config = JSON.parse(document.getElementById('exam-config').textContent);
+const storageKey = `exam_${config.code}_answers`;
+
+let examDuration = config.duration_seconds;
+let startTime = new Date(config.started_at);
+let endTime = new Date(startTime.getTime() + (examDuration * 1000));
+let timeRemaining = Math.max(0, Math.floor((endTime - new Date()) / 1000));
+let timerInterval;
+let questionCount = 0;
+let answers = {};
+let pendingAnswers = {};
+let autosaveTimeout = null;
+
+function csrfToken() {
+    return document.querySelector('[name=csrfmiddlewaretoken]').value;
+}
+
+// Initialize timer
+function initTimer() {
+    updateTimer();
+    timerInterval = setInterval(updateTimer, 1000);
+    syncTimer();
+    setInterval(syncTimer, 60000);
+}
+
+// Re-align the timer with the server clock; the local clock may be off
+function syncTimer() {
+    fetch(config.heartbeat_url)
+    .then(response => response.json())
+    .then(data => {
+        if (!data.success) {
+            return;
+        }
+        if (data.is_submitted) {
+            localStorage.removeItem(storageKey);
+            window.location.href = config.result_url;
+            return;
+        }
+        if (data.remaining_seconds !== null) {
+            endTime = new Date(Date.now() + data.remaining_seconds * 1000);
+        }
+    })
+    .catch(() => {
+        // Keep counting locally until the next heartbeat
+    });
+}
+
+function updateTimer() {
+    timeRemaining = Math.max(0, Math.floor((endTime - new Date()) / 1000));
+
+    if (timeRemaining <= 0) {
+        clearInterval(timerInterval);
+        submitExam();
+        return;
+    }
+
+    const hours = Math.floor(timeRemaining / 3600);
+    const minutes = Math.floor((timeRemaining % 3600) / 60);
+    const seconds = timeRemaining % 60;
+
+    const timeString = `${hours.toString().padStart(2, '0')}:${minutes.toString().padStart(2, '0')}:${seconds.toString().padStart(2, '0')}`;
+    document.getElementById('exam-time-display').textContent = timeString;
+
+    // Change timer color based on remaining time
+    const timer = document.getElementById('timer');
+    if (timeRemaining <= 300) { // 5 minutes
+        timer.className = 'timer danger';
+    } else if (timeRemaining <= 900) { // 15 minutes
+        timer.className = 'timer warning';
+    }
+}
+
+// The browser revalidates its cached copy with If-None-Match; an unchanged paper is a 304
+function loadPaper() {
+    const container = document.getElementById('exam-paper');
+    fetch(config.paper_url, {credentials: 'same-origin'})
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(response.status);
+        }
+        return response.json();
+    })
+    .then(paper => {
+        renderPaper(container, applyOrder(paper.questions, config.order));
+        bindChoices(container);
+        loadSavedAnswers();
+        updateProgress();
+    })
+    .catch(() => {
+        container.querySelector('.paper-status')?.classList.add('d-none');
+        container.querySelector('.paper-error')?.classList.remove('d-none');
+    });
+}
+
+// The paper is shared by every examinee; this session's shuffled order comes with the page.
+// Anything the order does not mention (the exam was edited meanwhile) keeps paper order, last.
+function applyOrder(questions, order) {
+    if (!order) {
+        return questions;
+    }
+    const byId = new Map(questions.map(question => [question.id, question]));
+    const ordered = [];
+    order.forEach(([questionId, choiceIds]) => {
+        const question = byId.get(questionId);
+        if (!question) {
+            return;
+        }
+        byId.delete(questionId);
+        const choices = new Map(question.choices.map(choice => [choice[0], choice]));
+        const shuffled = choiceIds.filter(id => choices.has(id)).map(id => choices.get(id));
+        const rest = question.choices.filter(choice => !choiceIds.includes(choice[0]));
+        ordered.push({...question, choices: shuffled.concat(rest)});
+    });
+    return ordered.concat(Array.from(byId.values()));
+}
+
+// Text goes in through textContent, never as markup
+function renderPaper(container, questions) {
+    const questionTemplate = document.getElementById('question-template').content;
+    const choiceTemplate = document.getElementById('choice-template').content;
+    const fragment = document.createDocumentFragment();
+    questionCount = questions.length;
+
+    questions.forEach((question, index) => {
+        const card = questionTemplate.firstElementChild.cloneNode(true);
+        card.dataset.questionId = question.id;
+        card.querySelector('.question-number').textContent = `Question ${index + 1} of ${questions.length}`;
+        card.querySelector('.question-text').textContent = question.text;
+
+        const choices = card.querySelector('.choices');
+        question.choices.forEach(([choiceId, text], position) => {
+            const option = choiceTemplate.firstElementChild.cloneNode(true);
+            option.dataset.choiceId = choiceId;
+            const radio = option.querySelector('input');
+            radio.name = `question_${question.id}`;
+            radio.id = `choice_${choiceId}`;
+            radio.value = choiceId;
+            option.querySelector('label').htmlFor = radio.id;
+            // Option letters A, B, C, D, E
+            option.querySelector('.option-label').textContent = String.fromCharCode(65 + position);
+            option.querySelector('.choice-text').textContent = text;
+            choices.appendChild(option);
+        });
+        fragment.appendChild(card);
+    });
+
+    container.replaceChildren(fragment);
+    document.querySelectorAll('.question-count').forEach(el => {
+        el.textContent = questionCount;
+    });
+}
+
+// Handle choice selection
+function bindChoices(container) {
+    container.querySelectorAll('.choice-option').forEach(option => {
+        option.addEventListener('click', function() {
+            const radio = this.querySelector('input[type="radio"]');
+            radio.checked = true;
+
+            // Update visual selection
+            const questionCard = this.closest('.question-card');
+            questionCard.querySelectorAll('.choice-option').forEach(opt => {
+                opt.classList.remove('selected');
+            });
+            this.classList.add('selected');
+
+            // Update answers
+            const questionId = questionCard.dataset.questionId;
+            answers[questionId] = radio.value;
+            queueAutosave(questionId, radio.value);
+            updateUnsavedWorkFlag(); // Update unsaved work flag
+            updateProgress();
+        });
+    });
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    initTimer();
+    loadPaper();
+});
+
+function updateProgress() {
+    const answeredCount = Object.keys(answers).length;
+    const progress = questionCount ? (answeredCount / questionCount) * 100 : 0;
+
+    document.getElementById('progress-bar').style.width = progress + '%';
+    document.getElementById('progress-text').textContent = `${answeredCount} / ${questionCount}`;
+    document.getElementById('answered-count').textContent = answeredCount;
+    document.getElementById('modal-answered-count').textContent = answeredCount;
+}
+
+function queueAutosave(questionId, choiceId) {
+    pendingAnswers[questionId] = choiceId;
+    if (!autosaveTimeout) {
+        autosaveTimeout = setTimeout(flushAutosave, 2000);
+    }
+}
+
+function flushAutosave() {
+    clearTimeout(autosaveTimeout);
+    autosaveTimeout = null;
+
+    const delta = pendingAnswers;
+    if (Object.keys(delta).length === 0) {
+        return;
+    }
+    pendingAnswers = {};
+
+    // Send only the answers that changed since the last autosave
+    fetch(config.autosave_url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': csrfToken()
+        },
+        body: `answers=${encodeURIComponent(JSON.stringify(delta))}`
+    })
+    .then(response => {
+        if (!response.ok) {
+            throw new Error(response.status);
+        }
+    })
+    .catch(() => {
+        // Keep the delta for the next attempt unless it was superseded
+        pendingAnswers = Object.assign(delta, pendingAnswers);
+    });
+}
+
+function saveProgress() {
+    // Save answers to localStorage and push unsaved changes to the server
+    localStorage.setItem(storageKey, JSON.stringify(answers));
+    flushAutosave();
+
+    if (typeof event === 'undefined' || !event || !event.target.closest) {
+        return;
+    }
+
+    // Show success message
+    const btn = event.target.closest('button');
+    const originalText = btn.innerHTML;
+    btn.innerHTML = '<i class="fas fa-check"></i> Saved!';
+    btn.classList.remove('btn-warning');
+    btn.classList.add('btn-success');
+
+    setTimeout(() => {
+        btn.innerHTML = originalText;
+        btn.classList.remove('btn-success');
+        btn.classList.add('btn-warning');
+    }, 2000);
+}
+
+function loadSavedAnswers() {
+    // Answers already stored on the server survive a browser crash
+    const serverAnswers = JSON.parse(document.getElementById('saved-answers').textContent);
+    answers = {};
+    Object.entries(serverAnswers).forEach(([questionId, choiceId]) => {
+        answers[questionId] = String(choiceId);
+    });
+
+    const saved = localStorage.getItem(storageKey);
+    if (saved) {
+        Object.entries(JSON.parse(saved)).forEach(([questionId, choiceId]) => {
+            if (answers[questionId] !== String(choiceId)) {
+                queueAutosave(questionId, choiceId);
+            }
+            answers[questionId] = String(choiceId);
+        });
+    }
+
+    // Restore visual selections
+    Object.entries(answers).forEach(([questionId, choiceId]) => {
+        const radio = document.getElementById(`choice_${choiceId}`);
+        if (radio) {
+            radio.checked = true;
+            radio.closest('.choice-option').classList.add('selected');
+        }
+    });
+    updateUnsavedWorkFlag();
+}
+
+function submitExam() {
+    document.getElementById('modal-answered-count').textContent = Object.keys(answers).length;
+    new bootstrap.Modal(document.getElementById('submitModal')).show();
+}
+
+function confirmSubmit() {
+    // Clear unsaved work flag
+    clearUnsavedWork();
+
+    // Disable form
+    document.getElementById('exam-form').style.pointerEvents = 'none';
+
+    // Show loading
+    const submitBtn = document.querySelector('[onclick="confirmSubmit()"]');
+    submitBtn.innerHTML = '<i class="fas fa-spinner fa-spin"></i> Submitting...';
+    submitBtn.disabled = true;
+
+    // Submit answers
+    fetch(config.submit_url, {
+        method: 'POST',
+        headers: {
+            'Content-Type': 'application/x-www-form-urlencoded',
+            'X-CSRFToken': csrfToken()
+        },
+        body: `answers=${encodeURIComponent(JSON.stringify(answers))}`
+    })
+    .then(response => response.json())
+    .then(data => {
+        if (data.success) {
+            // Clear saved answers
+            localStorage.removeItem(storageKey);
+
+            // Redirect to results
+            window.location.href = config.result_url;
+        } else {
+            alert('Error submitting exam: ' + data.error);
+            submitBtn.innerHTML = 'Submit Exam';
+            submitBtn.disabled = false;
+        }
+    })
+    .catch(error => {
+        console.error('Error:', error);
+        alert('Error submitting exam. Please try again.');
+        submitBtn.innerHTML = 'Submit Exam';
+        submitBtn.disabled = false;
+    });
+}
+
+// Auto-save every 30 seconds
+setInterval(saveProgress, 30000);
+
+// Set unsaved work flag when answers are present
+function updateUnsavedWorkFlag() {
+    if (typeof answers !== 'undefined' && Object.keys(answers).length > 0) {
+        window.hasUnsavedWork = true;
+    } else {
+        window.hasUnsavedWork = false;
+    }
+}
+
+// Update flag when answers change
+updateUnsavedWorkFlag();
+
+// Clear unsaved work flag when exam is submitted
+function clearUnsavedWork() {
+    window.hasUnsavedWork = false;
+}